@@ -0,0 +1,96 @@
+"""Запуск движка слоев и память процессов: декодирование PNG в каждом
+процессе против общего атласа слоев, отображенного в память (write_atlas и
+read_atlas из lidum/utils/layers.py).
+
+Каждый процесс загружает слои, накладывает все изображения всех слоев и
+сообщает время загрузки, а также свою долю памяти (Pss) и собственную
+память (Private) из /proc/self/smaps_rollup.
+
+    python benchmarks/layer_atlas.py [процессов] [путь к слоям]
+"""
+
+import os
+import sys
+import tempfile
+import importlib.util
+import multiprocessing
+from time import perf_counter
+from pathlib import Path
+
+ROOT = Path(__file__).parents[1]
+
+# layers.py загружается напрямую, без инициализации пакета lidum
+spec = importlib.util.spec_from_file_location("layers", ROOT / "lidum" / "utils" / "layers.py")
+layers = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(layers)
+
+WORKERS = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+NFT_LAYERS_PATH = sys.argv[2] if len(sys.argv) > 2 else str(ROOT / "nft_layers")
+
+
+def memory_mb():
+    fields = {}
+
+    with open("/proc/self/smaps_rollup") as file:
+        for line in file:
+            name, _, value = line.partition(":")
+
+            if value.strip().endswith("kB"):
+                fields[name] = int(value.split()[0]) / 1024
+
+    return fields["Pss"], fields["Private_Clean"] + fields["Private_Dirty"]
+
+
+def worker(atlas_path, ready, results):
+    start = perf_counter()
+    engine = layers.LayerEngine(NFT_LAYERS_PATH, atlas_path=atlas_path)
+    tree = engine.tree
+    load_ms = (perf_counter() - start) * 1000
+
+    # Каждое изображение каждого слоя хотя бы раз участвует в наложении
+    for nft_type in tree.types.values():
+        for choice in range(max(len(layer) for layer in nft_type.layers)):
+            tree.render(nft_type.name, tuple(min(choice, len(layer) - 1) for layer in nft_type.layers))
+
+    # Память измеряется, когда все процессы загрузили слои
+    ready.wait()
+    results.put((load_ms, *memory_mb()))
+
+
+def run(atlas_path):
+    context = multiprocessing.get_context("spawn")
+    ready = context.Barrier(WORKERS)
+    results = context.Queue()
+
+    processes = [context.Process(target=worker, args=(atlas_path, ready, results)) for _ in range(WORKERS)]
+
+    for process in processes:
+        process.start()
+
+    measurements = [results.get() for _ in processes]
+
+    for process in processes:
+        process.join()
+
+    load_ms = max(load for load, _, _ in measurements)
+    pss = sum(pss for _, pss, _ in measurements)
+    private = sum(private for _, _, private in measurements)
+
+    return load_ms, pss, private
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp:
+        atlas_path = os.path.join(tmp, "nft_layers.atlas")
+
+        start = perf_counter()
+        layers.write_atlas(atlas_path, layers.LayerEngine(NFT_LAYERS_PATH).tree)
+        build_s = perf_counter() - start
+
+        print(f"Atlas: {os.path.getsize(atlas_path) / 2**20:.1f} MB, built in {build_s:.1f} s")
+        print(f"{WORKERS} processes\n")
+        print(f"{'mode':<10}{'load, ms':>12}{'Pss total, MB':>16}{'Private total, MB':>20}")
+
+        for mode, path in (("decode", None), ("atlas", atlas_path)):
+            load_ms, pss, private = run(path)
+            print(f"{mode:<10}{load_ms:>12.1f}{pss:>16.1f}{private:>20.1f}")
@@ -0,0 +1,125 @@
+"""Сравнение пропускной способности /api/random_nft/: прежняя генерация
+(listdir, чтение и декодирование PNG, Image.alpha_composite на каждый запрос)
+против LayerEngine из lidum/utils/layers.py. Замеряется работа обработчика:
+генерация изображения, кодирование ответа и чтение из кэша по номеру
+комбинации (EncodedCache из lidum/utils/render_cache.py).
+
+    python benchmarks/random_nft.py [путь к слоям]
+"""
+
+import sys
+import random
+import importlib.util
+from io import BytesIO
+from os import listdir
+from time import perf_counter
+from os.path import join
+from pathlib import Path
+
+from PIL import Image
+
+ROOT = Path(__file__).parents[1]
+
+
+def load_module(name: str):
+    """Загружает модуль из lidum/utils напрямую, без инициализации пакета lidum."""
+
+    spec = importlib.util.spec_from_file_location(name, ROOT / "lidum" / "utils" / f"{name}.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    return module
+
+
+layers = load_module("layers")
+render_cache = load_module("render_cache")
+
+NFT_LAYERS_PATH = sys.argv[1] if len(sys.argv) > 1 else str(ROOT / "nft_layers")
+
+
+def old_random_nft():
+    """Прежняя get_random_nft из utils/nft_generation.py."""
+
+    nft_type_dir = join(NFT_LAYERS_PATH, random.choice(listdir(NFT_LAYERS_PATH)))
+    layers_dir = sorted([join(nft_type_dir, layer_dir) for layer_dir in listdir(nft_type_dir)])
+
+    nft = None
+
+    for layer_dir in layers_dir:
+
+        images = [join(layer_dir, image) for image in listdir(layer_dir)]
+        layer = Image.open(random.choice(images)).convert("RGBA")
+
+        if nft is None:
+            nft = layer
+
+        else:
+            nft = Image.alpha_composite(nft, layer)
+
+    return nft
+
+
+engine = layers.LayerEngine(NFT_LAYERS_PATH)
+
+
+def new_random_nft():
+    return engine.render(*engine.random_traits())
+
+
+def as_png(generate, **params):
+    nft_io = BytesIO()
+    generate().save(nft_io, "PNG", **params)
+    return nft_io.getvalue()
+
+
+def as_webp(generate):
+    nft_io = BytesIO()
+    generate().save(nft_io, "WEBP", quality=90, method=0)
+    return nft_io.getvalue()
+
+
+# Кэш только в памяти
+cache = render_cache.EncodedCache(None, 64 * 1024 * 1024, 0)
+
+
+def throughput(func, seconds: float = 3):
+    """Количество вызовов в секунду в одном потоке."""
+
+    calls = 0
+    start = perf_counter()
+
+    while perf_counter() - start < seconds:
+        func()
+        calls += 1
+
+    return calls / (perf_counter() - start)
+
+
+if __name__ == "__main__":
+    start = perf_counter()
+    engine.types
+    print(f"Engine warm-up (index and decode all layers): {(perf_counter() - start) * 1000:.0f} ms\n")
+
+    print(f"{'case':<22}{'before, rps':>14}{'after, rps':>14}{'speedup':>10}")
+
+    for name, before, after in (
+        ("composite", old_random_nft, new_random_nft),
+        ("composite + PNG", lambda: as_png(old_random_nft), lambda: as_png(new_random_nft)),
+        ("composite + fast PNG", lambda: as_png(old_random_nft), lambda: as_png(new_random_nft, compress_level=1)),
+        ("composite + WebP", lambda: as_png(old_random_nft), lambda: as_webp(new_random_nft)),
+    ):
+        before_rps = throughput(before)
+        after_rps = throughput(after)
+
+        print(f"{name:<22}{before_rps:>14.1f}{after_rps:>14.1f}{after_rps / before_rps:>9.1f}x")
+
+    # Повторные запросы уже закодированных номеров (как после редиректа на
+    # постоянный адрес): кодирование выполняется только при первом запросе
+    tree = engine.tree
+    seeds = random.sample(range(tree.size), 100)
+
+    for seed in seeds:
+        cache.put(f"{tree.version}-{seed}.png", as_png(lambda: tree.render(*tree.traits(seed)), compress_level=1))
+
+    cached_rps = throughput(lambda: cache.get(f"{tree.version}-{random.choice(seeds)}.png"))
+    print(f"\n{'cached seed':<22}{'':>14}{cached_rps:>14.0f}")
@@ -0,0 +1,153 @@
+"""Сравнение затрат CPU на разбор и проверку тела запроса и сериализацию
+ответа: прежняя схема (json + validate_params + json.dumps) против схем
+msgspec из lidum/schemas.py.
+
+    python benchmarks/request_codec.py
+"""
+
+import json
+import timeit
+import importlib.util
+from pathlib import Path
+
+import msgspec
+
+# schemas.py загружается напрямую, без инициализации пакета lidum (конфигурации,
+# Redis и БД для замера не нужны)
+spec = importlib.util.spec_from_file_location("schemas", Path(__file__).parents[1] / "lidum" / "schemas.py")
+schemas = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(schemas)
+
+CREATE_EVENT_PARAMS = {
+    "telegram_id": int | str,
+    "wallet_address": str,
+    "event_name": str,
+    "event_description": str,
+    "collection_name": str,
+    "nfts_cnt": int,
+    "image_name": str,
+    "image": str,
+    "start_date": str,
+    "end_date": str,
+    "password": str,
+    "subscriptions": str,
+    "price": float | int,
+    "user_timezone": int,
+}
+
+SEND_NFT_PARAMS = {
+    "telegram_id": int | str,
+    "wallet_address": str,
+    "event_id": str,
+}
+
+CREATE_EVENT_BODY = json.dumps(
+    {
+        "telegram_id": 123456789,
+        "wallet_address": "UQ" + "A" * 46,
+        "event_name": "Event",
+        "event_description": "Description " * 20,
+        "collection_name": "Collection",
+        "nfts_cnt": 100,
+        "image_name": "image.png",
+        "image": "data:image/png;base64," + "A" * 2048,
+        "start_date": "2026-10-18 12:00",
+        "end_date": "2026-10-25 12:00",
+        "password": "",
+        "subscriptions": "@lidumapp,@channel",
+        "price": 1.5,
+        "user_timezone": 3,
+    }
+).encode()
+
+SEND_NFT_BODY = json.dumps(
+    {
+        "telegram_id": "123456789",
+        "wallet_address": "UQ" + "A" * 46,
+        "event_id": "gAAAAA" + "x" * 94,
+    }
+).encode()
+
+EVENT_INFO = {
+    "start_date": "2026-10-18 12:00",
+    "end_date": "2026-10-25 12:00",
+    "invites": 0,
+    "subscriptions": "@lidumapp,@channel",
+    "minted_nfts": 42,
+    "nfts_cnt": 100,
+    "image_name": "image.png",
+    "logo_url": "https://lidum.app/collections/123456789/image.png",
+    "collection_name": "Collection",
+    "event_name": "Event",
+    "description": "Description " * 20,
+    "transaction_id": 17,
+    "empty_password": True,
+    "user_timezone": 3,
+}
+
+
+def validate_params(data, required_params: dict):
+    """Прежняя проверка параметров из api.py (без записи в лог)."""
+
+    missing_params = [param for param in required_params.keys() if data.get(param) is None]
+
+    if missing_params:
+        return {"status": "error", "description": f"Missing required parameters: {', '.join(missing_params)}"}, 400
+
+    wrong_types_params = [param for param, type in required_params.items() if not isinstance(data.get(param), type)]
+
+    if wrong_types_params:
+        return {"status": "error", "description": f"Invalid parameter type: {', '.join(wrong_types_params)}"}, 400
+
+    return None
+
+
+def old_request(body: bytes, required_params: dict):
+    data = json.loads(body)
+    assert validate_params(data, required_params) is None
+    return data
+
+
+def old_response(payload):
+    # jsonify в Flask 2.2 вызывает json.dumps с теми же параметрами
+    return json.dumps(payload, separators=(",", ":")).encode()
+
+
+encoder = msgspec.json.Encoder()
+create_event_decoder = msgspec.json.Decoder(schemas.Create_Event_Request)
+send_nft_decoder = msgspec.json.Decoder(schemas.Send_Nft_Request)
+event_info = schemas.Event_Info(**EVENT_INFO)
+
+CASES = [
+    (
+        "create_event request",
+        lambda: old_request(CREATE_EVENT_BODY, CREATE_EVENT_PARAMS),
+        lambda: create_event_decoder.decode(CREATE_EVENT_BODY),
+    ),
+    (
+        "send_nft request",
+        lambda: old_request(SEND_NFT_BODY, SEND_NFT_PARAMS),
+        lambda: send_nft_decoder.decode(SEND_NFT_BODY),
+    ),
+    (
+        "event_info response",
+        lambda: old_response({"status": "success", "event_info": EVENT_INFO}),
+        lambda: encoder.encode({"status": "success", "event_info": event_info}),
+    ),
+]
+
+
+def measure(func, number: int = 20000, repeat: int = 5):
+    """Лучшее время одного вызова в микросекундах."""
+
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number * 1e6
+
+
+if __name__ == "__main__":
+    print(f"{'case':<24}{'before, us':>12}{'after, us':>12}{'speedup':>10}")
+
+    for name, before, after in CASES:
+        before_us = measure(before)
+        after_us = measure(after)
+
+        print(f"{name:<24}{before_us:>12.2f}{after_us:>12.2f}{before_us / after_us:>9.1f}x")
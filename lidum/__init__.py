@@ -2,30 +2,39 @@ import logging
 from os import makedirs
 from typing import Any
 from os.path import join
+from datetime import timedelta
 from collections.abc import Callable, Awaitable
 
 from flask import Flask, has_app_context
+from quart import Quart
+from redis import Redis
 from celery import Celery
 from aiogram import Bot, Dispatcher, BaseMiddleware
 from aiogram.types import Update
 from flask_limiter import Limiter
 from sqlalchemy.orm import sessionmaker, scoped_session
+from sqlalchemy.pool import NullPool
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from flask_sqlalchemy import SQLAlchemy
+from quart_rate_limiter import RateLimit, RateLimiter
 from flask_limiter.util import get_remote_address
 from cryptography.fernet import Fernet
 from aiogram.dispatcher.router import Router
 from aiogram.fsm.storage.redis import RedisStorage
+from quart_rate_limiter.redis_store import RedisStore
 
 from .config import BOT_TOKEN, LOGS_PATH, REDIS_ADDRESS
-from .config import FERNET_PRIVATE_KEY, Flask_Config
+from .config import FERNET_PRIVATE_KEY, Quart_Config, Flask_Config
 from .utils.ton_client import TonClient
 
 _app = None
 _session_factory = None
 _Session = None
+_async_session_factory = None
 
 db = SQLAlchemy()
 fernet = Fernet(FERNET_PRIVATE_KEY)
+redis_client = Redis.from_url(REDIS_ADDRESS, decode_responses=True)
 limiter = Limiter(get_remote_address, storage_uri=REDIS_ADDRESS, default_limits=["5 per second"])
 
 client = TonClient(is_testnet=Flask_Config.TESTNET)
@@ -50,6 +59,28 @@ def get_session(app: Flask):
     return _session_factory, _Session
 
 
+def create_async_session(app: Flask | Quart):
+    """Создает фабрику асинхронных сессий (asyncpg) для обработчиков запросов."""
+
+    engine_options = {"pool_pre_ping": True}
+
+    if not app.config["ASYNC_DB_POOL"]:
+        engine_options = {"poolclass": NullPool}
+
+    engine = create_async_engine(app.config["SQLALCHEMY_ASYNC_DATABASE_URI"], **engine_options)
+
+    return async_sessionmaker(engine, expire_on_commit=False)
+
+
+def get_async_session(app: Flask | Quart):
+    global _async_session_factory
+
+    if _async_session_factory is None:
+        _async_session_factory = create_async_session(app)
+
+    return _async_session_factory
+
+
 def create_bot(app: Flask):
     """Создает экземпляр Telegram-бота, работающий в контексте app."""
 
@@ -114,8 +145,8 @@ def get_app():
     return _app
 
 
-def create_app():
-    """Создает экземпляр Flask и инициализирует необходимые части приложения."""
+def configure_logging():
+    """Настраивает запись логов в файл и в консоль."""
 
     makedirs(LOGS_PATH, exist_ok=True)
 
@@ -128,13 +159,34 @@ def create_app():
         ],
     )
 
+
+def create_app():
+    """Создает экземпляр Flask и инициализирует необходимые части приложения."""
+
+    configure_logging()
+
     app = Flask(__name__)
     app.config.from_object(Flask_Config)
 
     limiter.init_app(app)
     db.init_app(app)
 
-    with app.app_context():
-        db.create_all()
+    # Схемой базы данных управляют миграции: alembic upgrade head
+    return app
+
+
+def create_asgi_app():
+    """Создает экземпляр Quart для работы API под ASGI-сервером."""
+
+    configure_logging()
+
+    app = Quart(__name__)
+    app.config.from_object(Quart_Config)
+
+    RateLimiter(
+        app,
+        default_limits=[RateLimit(5, timedelta(seconds=1))],
+        store=RedisStore(REDIS_ADDRESS),
+    )
 
     return app
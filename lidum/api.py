@@ -0,0 +1,1391 @@
+import os
+import json
+import asyncio
+import logging
+import mimetypes
+from io import BytesIO
+from uuid import uuid4
+from os.path import join
+
+import httpx
+import msgspec
+
+from .tasks import collection_mint, process_event_image
+from .tasks import remove_unused_blobs, prewarm_collection_metadata
+from .tasks import process_transaction, record_last_enter
+from .tasks import schedule_claims_flush, schedule_uploads_cleanup
+from .utils import return_codes, tasks_statuses
+from .config import BOT_TOKEN, HTTP_TIMEOUT, Flask_Config
+from .config import TICKET_STREAM_TIMEOUT, MAX_UPLOAD_BYTES
+from .config import METADATA_PATH, BLOBS_PATH
+from .config import S3_PRESIGNED_TTL
+from .routing import ApiResponse, route, conditional_response
+from .schemas import Event_Info, User_Info, Author_Info
+from .schemas import Bootstrap_Request, Get_Price_Request
+from .schemas import Send_Nft_Request, Make_Post_Request
+from .schemas import User_Info_Request, Event_Info_Request
+from .schemas import Author_Info_Request, Create_Drop_Request
+from .schemas import Create_Event_Request, Dropper_Price_Request
+from .schemas import Channel_Avatar_Request, Check_Password_Request
+from .schemas import Add_Transaction_Request, Add_Visited_Channel_Request
+from .schemas import Transaction_Status_Request
+from .utils.db import Drop, Event, Author, Transaction
+from .utils.async_db import event_by_id, author_by_tg_id
+from .utils.async_db import transaction_by_id, subcriber_by_tg_id
+from .utils.async_db import upsert_tg_user, upsert_subscriber
+from .utils.async_db import add_database_entries, set_image_reference
+from .utils.async_db import register_blob
+from .utils.async_db import metadata_by_path
+from .utils.async_db import is_participant, record_visited_channel
+from .utils.async_db import event_participants, visited_channels_by_tg_id
+from .utils.hash import sha256_hash
+from .utils.path import get_blob_url, get_blob_key
+from .utils.path import get_event_image_url
+from .utils.path import get_image_variant_urls
+from .utils.path import get_collection_metadata_path
+from .utils.image import save_upload, find_upload, remove_upload
+from .utils.image import image_blob_name, decode_base64_image
+from .utils.price import get_drop_price, get_event_price
+from .utils.crypto import decode_event_id, encode_event_id
+from .utils.cache import read_event_info, write_event_info
+from .utils.cache import read_author_info, write_author_info
+from .utils.cache import invalidate_event_info, invalidate_author_info
+from .utils.cache import read_metadata, write_metadata, invalidate_metadata
+from .utils.claims import admit_claim, load_claim_state
+from .utils.tickets import listen_ticket, ticket_state
+from .utils.tickets import set_ticket_state
+from .utils.wallet import LIDUM_WALLET_ADDRESS
+from .utils.channel import get_channel_avatar
+from .utils.convert import link_to_username
+from .utils.metadata import create_metadata, read_metadata_file
+from .utils.blobs import BLOB_NAME_PATTERN, read_blob
+from .utils.blobs import put_blob_upload, put_blob_bytes
+from .utils.storage import storage
+from .utils.blobs import event_image_owner, metadata_image_owner
+from .utils.password import compare_passwords
+from .utils.mint_bodies import collection_mint_body
+from .utils.nft_generation import NFT_FORMATS, layer_engine
+from .utils.pregeneration import load_nft_bytes
+
+# Обработчики запросов API. Не зависят от веб-фреймворка: подключаются к Flask
+# в wsgi.py и к Quart в asgi.py. Логгер совпадает с app.logger обоих приложений.
+logger = logging.getLogger("lidum")
+
+# Cache-Control ответов с ETag. no-cache не запрещает хранение ответа, а
+# требует проверки: повторный запрос с If-None-Match получает 304 без тела
+EVENT_CACHE_CONTROL = "private, no-cache"
+AUTHOR_CACHE_CONTROL = "private, no-cache"
+TRANSACTION_CACHE_CONTROL = "private, no-cache"
+FINAL_TRANSACTION_CACHE_CONTROL = "private, max-age=86400"
+WALLET_CACHE_CONTROL = "public, max-age=3600"
+NFT_CACHE_CONTROL = "public, max-age=31536000, immutable"
+BLOB_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Метаданные меняются при редактировании события, поэтому маркетплейсы
+# проверяют их по ETag
+METADATA_CACHE_CONTROL = "public, no-cache"
+
+
+@route("/api/dropper_price/", methods=["POST"], schema=Dropper_Price_Request)
+async def dropper_price(request):
+    """Возвращает цену за перевод указанного количества NFT на нулевой адрес."""
+
+    data = request.params
+
+    nfts_cnt = data.nfts_cnt
+
+    # Вычисление комиссии
+    try:
+        price = get_drop_price(nfts_cnt)
+
+    except Exception as e:
+        description = f"Error when trying to calculate the price: {e}"
+        logger.error(description)
+        return {"status": return_codes.PRICE_ERROR, "description": description}, 500
+
+    return {"status": return_codes.SUCCESS, "price": price}, 200
+
+
+@route("/api/create_drop/", methods=["POST"], session=True, schema=Create_Drop_Request)
+async def create_drop(request, session):
+    """Создание нового события на сжигание NFT."""
+
+    data = request.params
+
+    telegram_id = int(data.telegram_id)
+    start_date = data.start_date
+    end_date = data.end_date
+    prizes = data.prizes
+    price = data.price
+
+    # Подготовка записи о новом дропе
+    try:
+        new_drop = Drop(
+            telegram_id=telegram_id,
+            start_date=start_date,
+            end_date=end_date,
+            prizes=prizes,
+            price=price,
+        )
+
+        await add_database_entries(entries=new_drop, session=session)
+        await session.commit()
+
+    except Exception as e:
+        await session.rollback()
+
+        description = f"Error when trying to prepare an entry about a new drop: {e}"
+        logger.error(description)
+        return {"status": return_codes.DB_WRITING_ERROR, "description": description}, 500
+
+    return {"status": return_codes.SUCCESS, "drop_id": new_drop.id}, 200
+
+
+@route("/api/channel_avatar/", methods=["POST"], schema=Channel_Avatar_Request)
+async def channel_avatar(request):
+    """Обработчик запроса на получение аватара телеграм-канала."""
+
+    data = request.params
+
+    url = data.channel_url
+
+    try:
+        avatar = await get_channel_avatar(url)
+
+        if avatar is None:
+            description = f"The channel {url} not found"
+            logger.error(description)
+            return {"status": return_codes.NOT_FOUND, "description": description}, 500
+
+    except Exception as e:
+        description = f"An error occurred while trying to get the channel's avatar: {e}"
+        logger.error(description)
+        return {"status": return_codes.AVATAR_READING_ERROR, "description": description}, 500
+
+    return {"status": return_codes.SUCCESS, "url": avatar}, 200
+
+
+@route("/api/check_password/", methods=["POST"], session=True, schema=Check_Password_Request)
+async def check_password(request, session):
+    """Проверка введенного пользователем пароля."""
+
+    data = request.params
+
+    event_id = data.event_id
+    password = data.password
+
+    # Поиск события в базе данных
+    try:
+        event_id = decode_event_id(event_id)
+        event = await event_by_id(event_id=event_id, session=session)
+
+        if event is None:
+            description = f"Event with id = {event_id} was not found"
+            logger.error(description)
+            return {"status": return_codes.NOT_FOUND, "description": description}, 404
+
+    except Exception as e:
+        description = f"Error when trying to get data from the database: {e}"
+        logger.error(description)
+        return {"status": return_codes.DB_READING_ERROR, "description": description}, 500
+
+    # Сравнение паролей
+    try:
+        res = compare_passwords(cur_password=password, event_password=event.password)
+
+    except Exception as e:
+        description = f"Error when trying to compare passwords: {e}"
+        logger.error(description)
+        return {"status": return_codes.PASSWORD_ERROR, "description": description}, 500
+
+    return {"status": return_codes.SUCCESS, "is_equal": res}, 200
+
+
+@route("/api/event_info/", methods=["POST"], session=True, schema=Event_Info_Request)
+async def old_event_info(request, session):
+    """Возвращает данные о событии с указанным id."""
+
+    data = request.params
+
+    event_id = data.event_id
+
+    # Попытка получить данные события из кэша или БД
+    try:
+        event_id = decode_event_id(event_id)
+        event_info = await load_event_info(event_id=event_id, session=session)
+
+        if event_info is None:
+            description = f"Event with id = {event_id} was not found"
+            logger.error(description)
+            return {"status": return_codes.NOT_FOUND, "description": description}, 404
+
+    except Exception as e:
+        description = f"An error occurred while getting information about the event: {e}"
+        logger.error(description)
+        return {"status": return_codes.DB_READING_ERROR, "description": description}, 500
+
+    return conditional_response(request, {"status": return_codes.SUCCESS, "event_info": event_info}, EVENT_CACHE_CONTROL)
+
+
+@route("/api/add_visited_channel/", methods=["POST"], session=True, schema=Add_Visited_Channel_Request)
+async def add_visited_channel(request, session):
+    """Добавляет в список посещенных каналов пользователя указанный канал."""
+
+    data = request.params
+
+    telegram_id = int(data.telegram_id)
+    channel = data.channel
+
+    # Попытка записать данные в БД
+    try:
+        user = await subcriber_by_tg_id(telegram_id=telegram_id, session=session)
+
+        if user is None:
+            description = f"User with id = {telegram_id} was not found"
+            logger.error(description)
+            return (
+                {
+                    "status": return_codes.DB_READING_ERROR,
+                    "description": description,
+                },
+                404,
+            )
+
+        await record_visited_channel(telegram_id=telegram_id, channel=link_to_username(channel), session=session)
+        await session.commit()
+
+    except Exception as e:
+        description = f"Error when trying to record a visited channel to a user with id {telegram_id}: {e}"
+        logger.error(description)
+        return {"status": return_codes.DB_WRITING_ERROR, "description": description}, 500
+
+    return {"status": return_codes.SUCCESS}, 200
+
+
+@route("/api/user_info/", methods=["POST"], session=True, schema=User_Info_Request)
+async def user_info(request, session):
+    """Возвращает данные из базы данных о пользователе."""
+
+    data = request.params
+
+    telegram_id = int(data.telegram_id)
+    username = data.username
+    event_id = data.event_id
+
+    # Создание или обновление пользователя и подписчика одним запросом
+    try:
+        await touch_subscriber(telegram_id=telegram_id, username=username, session=session)
+
+    except Exception as e:
+        await session.rollback()
+
+        description = f"Error when trying to add a new user with id {telegram_id} to the database"
+        logger.error(f"{description}: {e}")
+        return {"status": return_codes.DB_WRITING_ERROR, "description": description}, 500
+
+    try:
+        event_id = decode_event_id(event_id)
+        user_info = await load_user_info(telegram_id=telegram_id, event_id=event_id, session=session)
+
+    except Exception as e:
+        description = f"An error occurred while getting information about the user with id {telegram_id}"
+        logger.error(f"{description}: {e}")
+        return {"status": return_codes.DB_READING_ERROR, "description": description}, 500
+
+    return {"status": return_codes.SUCCESS, "user_info": user_info}, 200
+
+
+@route("/api/bootstrap/", methods=["POST"], session=True, schema=Bootstrap_Request)
+async def bootstrap(request, session):
+    """Возвращает одним ответом все данные для открытия события в мини-приложении:
+    данные события, пользователя, адрес кошелька приложения и аватары каналов
+    подписки."""
+
+    data = request.params
+
+    telegram_id = int(data.telegram_id)
+    username = data.username
+    event_id = data.event_id
+
+    # Попытка получить данные события из кэша или БД
+    try:
+        event_id = decode_event_id(event_id)
+        event_info = await load_event_info(event_id=event_id, session=session)
+
+        if event_info is None:
+            description = f"Event with id = {event_id} was not found"
+            logger.error(description)
+            return {"status": return_codes.NOT_FOUND, "description": description}, 404
+
+    except Exception as e:
+        description = f"An error occurred while getting information about the event: {e}"
+        logger.error(description)
+        return {"status": return_codes.DB_READING_ERROR, "description": description}, 500
+
+    # Аватары каналов запрашиваются параллельно друг с другом и с запросами к БД
+    channels = subscription_channels(event_info.subscriptions)
+    avatars = asyncio.gather(*(get_channel_avatar(channel) for channel in channels), return_exceptions=True)
+
+    # Создание или обновление пользователя и подписчика одним запросом
+    try:
+        await touch_subscriber(telegram_id=telegram_id, username=username, session=session)
+
+    except Exception as e:
+        avatars.cancel()
+        await session.rollback()
+
+        description = f"Error when trying to add a new user with id {telegram_id} to the database"
+        logger.error(f"{description}: {e}")
+        return {"status": return_codes.DB_WRITING_ERROR, "description": description}, 500
+
+    try:
+        user_info = await load_user_info(telegram_id=telegram_id, event_id=event_id, session=session)
+
+    except Exception as e:
+        avatars.cancel()
+
+        description = f"An error occurred while getting information about the user with id {telegram_id}"
+        logger.error(f"{description}: {e}")
+        return {"status": return_codes.DB_READING_ERROR, "description": description}, 500
+
+    # Ненайденный аватар не мешает открытию события
+    channel_avatars = {}
+
+    for channel, avatar in zip(channels, await avatars):
+        if isinstance(avatar, Exception):
+            logger.error(f"An error occurred while trying to get the avatar of the channel {channel}: {avatar}")
+            avatar = None
+
+        channel_avatars[channel] = avatar
+
+    return (
+        {
+            "status": return_codes.SUCCESS,
+            "event_info": event_info,
+            "user_info": user_info,
+            "wallet": LIDUM_WALLET_ADDRESS,
+            "channel_avatars": channel_avatars,
+        },
+        200,
+    )
+
+
+@route("/api/get_price/", methods=["POST"], session=True, schema=Get_Price_Request)
+async def get_minter_price(request, session):
+    """Возвращает рассчитанную стоимость минта коллекции."""
+
+    data = request.params
+
+    telegram_id = int(data.telegram_id)
+    collection_images_cnt = data.collection_images_cnt
+
+    try:
+        author = await author_by_tg_id(telegram_id=telegram_id, session=session)
+
+        price = get_event_price(
+            nfts_cnt=int(collection_images_cnt),
+            is_new=author is None,
+        )
+
+    except Exception as e:
+        description = "Error when trying to calculate the price"
+        logger.error(f"{description}: {e}")
+        return {"status": return_codes.PRICE_ERROR, "description": description}, 500
+
+    return {"status": return_codes.SUCCESS, "price": price}, 200
+
+
+@route("/api/random_nft/", methods=["GET"])
+async def get_rnd_image(request):
+    """Перенаправляет на постоянный адрес NFT из случайной комбинации слоёв."""
+
+    try:
+        tree = await asyncio.to_thread(lambda: layer_engine.tree)
+        seed = tree.seed(*tree.random_traits())
+
+    except Exception as e:
+        description = f"Error when trying to mix layers: {e}"
+        logger.error(description)
+        return (
+            {
+                "status": return_codes.NFT_GENERATING_ERROR,
+                "description": description,
+            },
+            500,
+        )
+
+    headers = {"Location": nft_image_url(tree.version, seed), "Cache-Control": "no-store"}
+    return ApiResponse(status=302, headers=headers)
+
+
+@route("/api/random_nft/<version>/<int:seed>/", methods=["GET"])
+async def get_nft_image(request, version: str, seed: int):
+    """Возвращает NFT с номером комбинации слоёв seed в формате PNG или WebP
+    в зависимости от заголовка Accept. Содержимое по адресу не меняется,
+    поэтому ответ кэшируется без проверки."""
+
+    nft_format = preferred_nft_format(request.headers.get("Accept"))
+
+    try:
+        tree = await asyncio.to_thread(lambda: layer_engine.tree)
+
+        if not 0 <= seed < tree.size:
+            description = f"NFT {seed} does not exist"
+            logger.error(description)
+            return {"status": return_codes.NOT_FOUND, "description": description}, 404
+
+        # Слои изменились: номер указывает уже на другую комбинацию
+        if version != tree.version:
+            return ApiResponse(status=302, headers={"Location": nft_image_url(tree.version, seed)})
+
+        nft = await asyncio.to_thread(load_nft_bytes, tree, seed, nft_format)
+
+    except Exception as e:
+        description = f"Error when trying to mix layers: {e}"
+        logger.error(description)
+        return (
+            {
+                "status": return_codes.NFT_GENERATING_ERROR,
+                "description": description,
+            },
+            500,
+        )
+
+    headers = {"Cache-Control": NFT_CACHE_CONTROL, "Vary": "Accept"}
+    return ApiResponse(nft, mimetype=NFT_FORMATS[nft_format][0], headers=headers)
+
+
+@route(f"/{BLOBS_PATH}/<shard>/<blob_name>", methods=["GET"])
+async def get_blob(request, shard: str, blob_name: str):
+    """Возвращает изображение из хранилища по содержимому. Имя файла - хэш
+    содержимого, поэтому ответ кэшируется без проверки. Файлы закрытого
+    бакета отдаются перенаправлением на временный подписанный адрес."""
+
+    if shard != blob_name[:2] or not BLOB_NAME_PATTERN.fullmatch(blob_name):
+        description = f"Image {blob_name} does not exist"
+        logger.error(description)
+        return {"status": return_codes.NOT_FOUND, "description": description}, 404
+
+    try:
+        presigned_url = await asyncio.to_thread(storage.presigned_url, get_blob_key(blob_name))
+
+        # Перенаправление кэшируется меньше срока действия адреса
+        if presigned_url is not None:
+            headers = {"Location": presigned_url, "Cache-Control": f"private, max-age={S3_PRESIGNED_TTL // 2}"}
+            return ApiResponse(status=302, headers=headers)
+
+        blob = await asyncio.to_thread(read_blob, blob_name)
+
+    except FileNotFoundError:
+        description = f"Image {blob_name} does not exist"
+        logger.error(description)
+        return {"status": return_codes.NOT_FOUND, "description": description}, 404
+
+    except Exception as e:
+        description = "Error when trying to read the image"
+        logger.error(f"{description}: {e}")
+        return {"status": return_codes.SERVER_ERROR, "description": description}, 500
+
+    headers = {"Cache-Control": BLOB_CACHE_CONTROL}
+    return ApiResponse(blob, mimetype=mimetypes.guess_type(blob_name)[0], headers=headers)
+
+
+@route(f"/collections/<collection_name>/{METADATA_PATH}/<file_name>", methods=["GET"], session=True)
+async def get_metadata(request, session, collection_name: str, file_name: str):
+    """Возвращает метаданные коллекции или NFT по адресу, записанному в
+    контракте коллекции."""
+
+    if collection_name.startswith(".") or not file_name.endswith(".json"):
+        description = f"Metadata {file_name} does not exist"
+        logger.error(description)
+        return {"status": return_codes.NOT_FOUND, "description": description}, 404
+
+    try:
+        metadata = await load_metadata(f"collections/{collection_name}/{METADATA_PATH}/{file_name}", session)
+
+    except Exception as e:
+        description = "Error when trying to read the metadata"
+        logger.error(f"{description}: {e}")
+        return {"status": return_codes.DB_READING_ERROR, "description": description}, 500
+
+    if metadata is None:
+        description = f"Metadata {file_name} does not exist"
+        logger.error(description)
+        return {"status": return_codes.NOT_FOUND, "description": description}, 404
+
+    return conditional_response(request, msgspec.Raw(metadata), METADATA_CACHE_CONTROL)
+
+
+@route("/api/add_transaction/", methods=["POST"], session=True, schema=Add_Transaction_Request)
+async def minter_transaction(request, session):
+    """Записывает новую транзакцию после создания события в базу данных."""
+
+    data = request.params
+
+    transaction_hash = data.transaction_hash
+    # wallet_address = data.wallet_address
+    # amount = data.amount
+    event_id = data.event_id
+
+    try:
+        event_id = decode_event_id(event_id)
+        event = await event_by_id(event_id=event_id, session=session)
+
+        if event is None:
+            description = f"The event with id {event_id} was not found"
+            logger.error(description)
+            return {"status": return_codes.NOT_FOUND, "description": description}, 404
+
+        transaction_id = event.transaction_id
+
+    except Exception as e:
+        description = f"Error when trying to write a transaction to the database: {e}"
+        logger.error(description)
+        return {"status": return_codes.DB_WRITING_ERROR, "description": description}, 500
+
+    try:
+        transaction = await transaction_by_id(transaction_id=transaction_id, session=session)
+
+        if transaction is None:
+            description = f"The transaction with id {transaction_id} was not found"
+            logger.error(description)
+            return {"status": return_codes.NOT_FOUND, "description": description}, 404
+
+        transaction.hash = transaction_hash
+        await session.commit()
+
+    except Exception as e:
+        description = "Error when trying to write a transaction to the database"
+        logger.error(f"{description}: {e}")
+        return {"status": return_codes.DB_WRITING_ERROR, "description": description}, 500
+
+    ticket_id = uuid4().hex
+
+    try:
+        await asyncio.to_thread(set_ticket_state, ticket_id, tasks_statuses.QUEUED, transaction_id=transaction_id)
+        await asyncio.to_thread(process_transaction.delay, transaction_id, ticket_id)
+
+    except Exception as e:
+        description = "Error when trying to add a transaction to the processing queue"
+        logger.error(f"{description}: {e}")
+        return {"status": return_codes.QUEUE_ERROR, "description": description}, 500
+
+    return {"status": return_codes.SUCCESS, "transaction_id": transaction_id, "ticket_id": ticket_id}, 202
+
+
+@route("/api/transaction_status/", methods=["POST"], session=True, schema=Transaction_Status_Request)
+async def status(request, session):
+    """Возвращает статус транзации из базы данных."""
+
+    data = request.params
+
+    transaction_id = data.transaction_id
+
+    # Попытка поиска в базе данных
+    try:
+        transaction = await transaction_by_id(transaction_id=transaction_id, session=session)
+
+        if transaction is None:
+            description = f"No transaction with id {transaction_id} was found"
+            logger.error(description)
+            return {"status": return_codes.NOT_FOUND, "description": description}, 404
+
+        status = transaction.status
+
+    except Exception as e:
+        description = f"Error when trying to find a transaction with id {transaction_id}"
+        logger.error(f"{description}: {e}")
+        return {"status": return_codes.DB_READING_ERROR, "description": description}, 404
+
+    # Завершенная транзакция больше не меняет статус
+    if status in tasks_statuses.FINAL_TRANSACTION_STATES:
+        cache_control = FINAL_TRANSACTION_CACHE_CONTROL
+
+    else:
+        cache_control = TRANSACTION_CACHE_CONTROL
+
+    return conditional_response(request, {"status": return_codes.SUCCESS, "transaction_status": status}, cache_control)
+
+
+@route("/api/author_info/", methods=["POST"], session=True, schema=Author_Info_Request)
+async def author_info(request, session):
+    """Возвращает информацию об авторе."""
+
+    data = request.params
+
+    telegram_id = int(data.telegram_id)
+    username = data.username
+
+    # Попытка получить данные автора из кэша
+    author_info, generation = None, None
+
+    try:
+        author_info, generation = await asyncio.to_thread(read_author_info, telegram_id)
+
+    except Exception as e:
+        logger.error(f"Error when trying to read the author cache: {e}")
+
+    # Запись в кэше есть только у существующего автора, поэтому вход
+    # отмечается в Redis без записи в БД. Имя пользователя обновится при
+    # следующем промахе
+    if author_info is not None:
+        await asyncio.to_thread(record_last_enter, telegram_id)
+        return conditional_response(request, {"status": return_codes.SUCCESS, "author_info": author_info}, AUTHOR_CACHE_CONTROL)
+
+    # Создание или обновление пользователя одним запросом
+    try:
+        if not await upsert_tg_user(telegram_id=telegram_id, username=username, session=session):
+            await asyncio.to_thread(record_last_enter, telegram_id)
+
+        await session.commit()
+
+    except Exception as e:
+        await session.rollback()
+
+        description = f"Error when trying to add a new user with id {telegram_id} to the database"
+        logger.error(f"{description}: {e}")
+        return {"status": return_codes.DB_WRITING_ERROR, "description": description}, 500
+
+    # Поиск пользователя в базе данных
+    try:
+        author = await author_by_tg_id(telegram_id=telegram_id, session=session)
+
+        if author is None:
+            description = f"Author with id {telegram_id} was not found"
+            logger.error(description)
+            return {"status": return_codes.NOT_FOUND, "description": description}, 404
+
+        author_info = Author_Info(
+            collection_name=author.collection_name,
+            collection_address=author.collection_address,
+        )
+
+    except Exception as e:
+        description = "An error occurred while getting information about the author"
+        logger.error(f"{description}: {e}")
+        return {"status": return_codes.DB_READING_ERROR, "description": description}, 500
+
+    if generation is not None:
+        try:
+            await asyncio.to_thread(write_author_info, telegram_id, author_info, generation)
+
+        except Exception as e:
+            logger.error(f"Error when trying to write the author cache: {e}")
+
+    return conditional_response(request, {"status": return_codes.SUCCESS, "author_info": author_info}, AUTHOR_CACHE_CONTROL)
+
+
+@route("/api/make_post/", methods=["POST"], schema=Make_Post_Request)
+async def make_post(request):
+    """Отправялет QR-код и сообщение поста на телеграм-бота."""
+
+    data = request.params
+
+    qrcode = data.qrcode
+    description = data.description
+    button = data.button
+    button_url = data.button_url
+    telegram_id = int(data.telegram_id)
+
+    try:
+        qrcode = decode_base64_image(qrcode)
+
+        keyboard = {"inline_keyboard": [[{"text": button, "url": button_url}]]}
+
+    except Exception as e:
+        description = "An error occurred when sending a message to the bot"
+        logger.error(f"{description}: {e}")
+        return {"status": return_codes.VALIDATE_ERROR, "description": description}, 500
+
+    async with httpx.AsyncClient(timeout=HTTP_TIMEOUT) as client:
+        try:
+            await client.post(
+                url=f"https://api.telegram.org/bot{BOT_TOKEN}/sendPhoto",
+                params={"chat_id": telegram_id},
+                files={"photo": BytesIO(qrcode)},
+            )
+
+        except Exception as e:
+            description = "An error occurred when sending a QR-code to the bot"
+            logger.error(f"{description}: {e}")
+            return {"status": return_codes.VALIDATE_ERROR, "description": description}, 500
+
+        try:
+            await client.post(
+                url=f"https://api.telegram.org/bot{BOT_TOKEN}/sendMessage",
+                params={
+                    "chat_id": telegram_id,
+                    "text": description,
+                    "reply_markup": json.dumps(keyboard),
+                },
+            )
+
+        except Exception as e:
+            description = "An error occurred when sending a message to the bot"
+            logger.error(f"{description}: {e}")
+            return {"status": return_codes.VALIDATE_ERROR, "description": description}, 500
+
+    return {"status": return_codes.SUCCESS}, 200
+
+
+@route("/api/get_wallet/", methods=["GET"])
+async def get_wallet(request):
+    """Возвращает адрес кошелька приложения."""
+
+    return conditional_response(request, {"status": return_codes.SUCCESS, "wallet": LIDUM_WALLET_ADDRESS}, WALLET_CACHE_CONTROL)
+
+
+@route("/api/upload_image/", methods=["POST"], stream=True)
+async def upload_image(request):
+    """Принимает изображение события в теле запроса (без base64) и сохраняет
+    его во временный файл. Возвращает id загрузки для create_event."""
+
+    content_length = request.headers.get("Content-Length")
+
+    if content_length and content_length.isdigit() and int(content_length) > MAX_UPLOAD_BYTES:
+        description = f"The image must not exceed {MAX_UPLOAD_BYTES} bytes"
+        logger.info(description)
+        return {"status": return_codes.VALIDATE_ERROR, "description": description}, 413
+
+    try:
+        upload_id = await save_upload(request.stream)
+
+    except ValueError as e:
+        description = f"Invalid event image: {e}"
+        logger.info(description)
+        return {"status": return_codes.VALIDATE_ERROR, "description": description}, 400
+
+    except Exception as e:
+        description = "An error occurred when uploading an image to the server"
+        logger.error(f"{description}: {e}")
+        return {"status": return_codes.SERVER_WRITING_ERROR, "description": description}, 500
+
+    if upload_id is None:
+        description = f"The image must not exceed {MAX_UPLOAD_BYTES} bytes"
+        logger.info(description)
+        return {"status": return_codes.VALIDATE_ERROR, "description": description}, 413
+
+    await asyncio.to_thread(schedule_uploads_cleanup)
+
+    return {"status": return_codes.SUCCESS, "upload_id": upload_id}, 200
+
+
+@route("/api/create_event/", methods=["POST"], session=True, schema=Create_Event_Request)
+async def create_event(request, session):
+    """Запись данных о новом событии и минт пустой коллекции."""
+
+    data = request.params
+
+    telegram_id = int(data.telegram_id)
+    wallet_address = data.wallet_address
+    event_name = data.event_name
+    event_description = data.event_description
+    collection_name = data.collection_name
+    nfts_cnt = data.nfts_cnt
+    image_name = data.image_name
+    image = data.image
+    upload_id = data.upload_id
+    start_date = data.start_date
+    end_date = data.end_date
+    password = data.password
+    subscriptions = data.subscriptions
+    price = data.price
+    user_timezone = data.user_timezone
+    event_id = data.event_id
+    invite = data.invite
+    is_testnet = data.is_testnet if data.is_testnet is not None else Flask_Config.TESTNET
+    generative = data.generative
+
+    if image is None and upload_id is None:
+        description = "Either image or upload_id is required"
+        logger.error(description)
+        return {"status": return_codes.VALIDATE_ERROR, "description": description}, 400
+
+    # Генеративное событие не может выдать больше NFT, чем есть комбинаций
+    # слоев. Режим и дерево слоев закрепляются только при создании события
+    layers_tree = None
+
+    if generative and event_id is None:
+        try:
+            layers_tree = await asyncio.to_thread(lambda: layer_engine.tree)
+            layers_cnt = layers_tree.size
+
+        except Exception as e:
+            description = "Error when trying to load NFT layers"
+            logger.error(f"{description}: {e}")
+            return {"status": return_codes.NFT_GENERATING_ERROR, "description": description}, 500
+
+        if nfts_cnt > layers_cnt:
+            description = f"A generative event can have at most {layers_cnt} NFTs"
+            logger.error(description)
+            return {"status": return_codes.VALIDATE_ERROR, "description": description}, 400
+
+    # Имя изображения в хранилище по содержимому. Строка файла фиксируется до
+    # записи события, поэтому файл, оставшийся после ошибки записи, удалит
+    # очистка. Сам файл записывается позже, под блокировкой этой строки
+    try:
+        if upload_id is not None:
+            upload_key, image_blob = await asyncio.to_thread(find_upload, upload_id)
+
+        else:
+            upload_key, image_bytes = None, decode_base64_image(image)
+            image_blob = await asyncio.to_thread(image_blob_name, image_bytes)
+
+    except ValueError as e:
+        description = f"Invalid event image: {e}"
+        logger.error(description)
+        return {"status": return_codes.VALIDATE_ERROR, "description": description}, 400
+
+    except Exception as e:
+        description = "An error occurred when uploading an image to the server"
+        logger.error(f"{description}: {e}")
+        return {"status": return_codes.SERVER_WRITING_ERROR, "description": description}, 500
+
+    try:
+        await register_blob(image_blob, session)
+        await session.commit()
+
+    except Exception as e:
+        await session.rollback()
+
+        description = "Error when trying to register the event image"
+        logger.error(f"{description}: {e}")
+        return {"status": return_codes.DB_WRITING_ERROR, "description": description}, 500
+
+    # Проверка на наличие автора в БД
+    try:
+        author = await author_by_tg_id(telegram_id=telegram_id, session=session)
+
+        # Проверка соответствия сохраненного названия коллекции с полученным,
+        # если автор уже есть в базе данных
+        if author is not None and author.collection_name != collection_name:
+
+            description = "The saved name of the author's collection does not match the received one"
+            logger.error(description)
+            return {"status": return_codes.VALIDATE_ERROR, "description": description}, 400
+
+    except Exception as e:
+        description = f"Error when trying to find the author with id {telegram_id} in the database"
+        logger.error(f"{description}: {e}")
+        return {"status": return_codes.DB_READING_ERROR, "description": description}, 500
+
+    # Создание записи о новом авторе в БД
+    try:
+        if author is None:
+
+            collection_meta_path = get_collection_metadata_path(collection_name, telegram_id, True)
+            nft_item_content_base_uri = join(os.path.split(collection_meta_path)[0], "")
+
+            # Создание тела коллекции
+            collection = collection_mint_body(
+                collection_content_uri=collection_meta_path,
+                nft_item_content_base_uri=nft_item_content_base_uri,
+            )
+
+            new_author = Author(
+                telegram_id=telegram_id,
+                collection_address=collection.address.to_string(),
+                collection_name=collection_name,
+                is_testnet=is_testnet,
+            )
+
+            await add_database_entries(entries=new_author, session=session)
+
+    except Exception as e:
+        description = f"Error when trying to prepare an entry about a new author with id {telegram_id}"
+        logger.error(f"{description}: {e}")
+        return {"status": return_codes.DB_WRITING_ERROR, "description": description}, 500
+
+    # Обработка транзакции за данное событие
+    if event_id is not None:
+        event_id = decode_event_id(str(event_id))
+        event = await event_by_id(event_id=event_id, session=session)
+
+        if event is None:
+            description = f"The event with id {event_id} was not found"
+            logger.error(description)
+            return {"status": return_codes.NOT_FOUND, "description": description}, 404
+
+        transaction = await transaction_by_id(transaction_id=event.transaction_id, session=session)
+
+        if transaction is None:
+            description = f"The transaction of event with id {event_id} was not found."
+            logger.error(description)
+            return {"status": return_codes.NOT_FOUND, "description": description}, 404
+
+        if telegram_id != event.telegram_id:
+            description = f"This event does not belong to the user with id {telegram_id}"
+            logger.error(description)
+            return {"status": return_codes.VALIDATE_ERROR, "description": description}, 403
+
+        # if transaction.status != 'success':
+        #     description = f"Payment for this event was not successful"
+        #     logger.error(description)
+        #     return {"status": return_codes.VALIDATE_ERROR, "description": description}, 400
+
+        # Обновление полей события
+        event.event_name = event_name
+        event.event_description = event_description
+        event.image_name = image_name
+        event.start_date = start_date
+        event.end_date = end_date
+        event.password = password
+        event.invites = invite
+        event.subscriptions = subscriptions
+        event.user_timezone = user_timezone
+
+        new_event = event
+
+    # Создание записи о новой транзакции
+    else:
+        try:
+            new_transaction = Transaction(
+                source_address=wallet_address,
+                destination_address=LIDUM_WALLET_ADDRESS,
+                amount=price,
+                is_testnet=is_testnet,
+            )
+
+            await add_database_entries(entries=new_transaction, session=session)
+
+        except Exception as e:
+            description = "Error when trying to prepare an entry about a new transaction"
+            logger.error(f"{description}: {e}")
+            return (
+                {
+                    "status": return_codes.DB_WRITING_ERROR,
+                    "description": description,
+                },
+                500,
+            )
+
+        # Создание записи о новом событии в БД
+        try:
+            new_event = Event(
+                telegram_id=telegram_id,
+                event_name=event_name,
+                transaction_id=new_transaction.id,
+                image_name=image_name,
+                nfts_cnt=nfts_cnt,
+                start_date=start_date,
+                end_date=end_date,
+                password=password,
+                invites=invite,
+                subscriptions=subscriptions,
+                event_description=event_description,
+                user_timezone=user_timezone,
+                generative=generative,
+                layers_size=layers_tree.size if layers_tree is not None else None,
+                layers_version=layers_tree.version if layers_tree is not None else None,
+            )
+
+            await add_database_entries(entries=new_event, session=session)
+
+        except Exception as e:
+            description = "Error when trying to prepare an entry about a new event"
+            logger.error(f"{description}: {e}")
+            return (
+                {
+                    "status": return_codes.DB_WRITING_ERROR,
+                    "description": description,
+                },
+                500,
+            )
+
+    # Создание метадаты для новых NFT. Перезапись метадаты отредактированного
+    # события фиксируется вместе с событием
+    try:
+        metadata_paths = await create_metadata(
+            telegram_id,
+            collection_name,
+            event_description,
+            image_name,
+            get_blob_url(image_blob),
+            session=session,
+        )
+
+    except Exception as e:
+        await session.rollback()
+
+        description = "An error occurred when writing metadata"
+        logger.error(f"{description}: {e}")
+        return {"status": return_codes.DB_WRITING_ERROR, "description": description}, 500
+
+    # Учет ссылок события и документов метаданных на изображение. Прежнее
+    # изображение отредактированного события остается, пока на него ссылается
+    # метадата уже выпущенных NFT
+    try:
+        owners = [event_image_owner(new_event.id)] + [metadata_image_owner(path) for path in metadata_paths]
+        released_blobs = [await set_image_reference(owner, image_blob, session) for owner in owners]
+
+        if new_event.image_blob != image_blob:
+            new_event.image_blob = image_blob
+            new_event.image_variants = None
+
+    except Exception as e:
+        await session.rollback()
+
+        description = "Error when trying to write the event image references"
+        logger.error(f"{description}: {e}")
+        return {"status": return_codes.DB_WRITING_ERROR, "description": description}, 500
+
+    # Запись изображения в хранилище по содержимому без перекодирования под
+    # блокировкой строки файла, взятой при учете ссылок, чтобы очистка не
+    # удалила его до фиксации. Загрузка удаляется только после фиксации,
+    # чтобы запрос можно было повторить
+    try:
+        if upload_key is not None:
+            await asyncio.to_thread(put_blob_upload, upload_key, image_blob)
+
+        else:
+            await asyncio.to_thread(put_blob_bytes, image_bytes, image_blob)
+
+    except FileNotFoundError:
+        await session.rollback()
+
+        description = f"Invalid event image: upload {upload_id} was not found"
+        logger.error(description)
+        return {"status": return_codes.VALIDATE_ERROR, "description": description}, 400
+
+    except Exception as e:
+        await session.rollback()
+
+        description = "An error occurred when uploading an image to the server"
+        logger.error(f"{description}: {e}")
+        return {"status": return_codes.SERVER_WRITING_ERROR, "description": description}, 500
+
+    # Фиксация автора, транзакции и события одной транзакцией, только после
+    # успешной записи файлов коллекции. Записанный файл без ссылок удаляет
+    # очистка
+    try:
+        await session.commit()
+
+    except Exception as e:
+        await session.rollback()
+
+        description = "Error when trying to write the event to the database"
+        logger.error(f"{description}: {e}")
+
+        try:
+            await asyncio.to_thread(remove_unused_blobs.delay)
+
+        except Exception as e:
+            logger.error(f"Error when trying to add the image cleanup to the processing queue: {e}")
+
+        return {"status": return_codes.DB_WRITING_ERROR, "description": description}, 500
+
+    # Загрузка уже скопирована в хранилище по содержимому. Если ее не удалось
+    # удалить, ее удалит очистка устаревших загрузок
+    try:
+        if upload_key is not None:
+            await asyncio.to_thread(remove_upload, upload_key)
+
+    except Exception as e:
+        logger.error(f"Error when trying to remove the upload {upload_key}: {e}")
+
+    # Сброс кэша измененного события и нового автора. Без сброса устаревшие
+    # данные отдавались бы до истечения INFO_CACHE_TTL
+    try:
+        if event_id is not None:
+            await asyncio.to_thread(invalidate_event_info, event_id)
+
+        if author is None:
+            await asyncio.to_thread(invalidate_author_info, telegram_id)
+
+        for metadata_path in metadata_paths:
+            await asyncio.to_thread(invalidate_metadata, metadata_path)
+
+    except Exception as e:
+        logger.error(f"Error when trying to invalidate the event cache: {e}")
+
+    # Метаданные коллекции загружаются в кэш до минта NFT события. Без этого
+    # они загрузятся при первых запросах маркетплейсов
+    try:
+        await asyncio.to_thread(prewarm_collection_metadata.delay, telegram_id)
+
+    except Exception as e:
+        logger.error(f"Error when trying to add the metadata prewarm to the processing queue: {e}")
+
+    # Изображение уже проверено и доступно, поэтому ошибка постановки задачи
+    # только оставляет его без уменьшенных вариантов
+    try:
+        await asyncio.to_thread(process_event_image.delay, new_event.id, image_blob)
+
+    except Exception as e:
+        logger.error(f"Error when trying to add the event image to the processing queue: {e}")
+
+    # Файлы без ссылок удаляются в фоне, ошибка только оставляет их на диске
+    # до следующей очистки
+    try:
+        if any(released_blobs):
+            await asyncio.to_thread(remove_unused_blobs.delay)
+
+    except Exception as e:
+        logger.error(f"Error when trying to add the image cleanup to the processing queue: {e}")
+
+    # Добавление задачи на минт пустой коллекции
+    # TODO: ЗАПУСКАТЬ ПОСЛЕ ОПЛАТЫ
+    try:
+        if author is None:
+            await asyncio.to_thread(
+                collection_mint.delay,
+                telegram_id,
+                collection_meta_path,
+                nft_item_content_base_uri,
+                is_testnet,
+            )
+
+    except Exception as e:
+        description = "Error when trying to add a collection to the processing queue"
+        logger.error(f"{description}: {e}")
+        return {"status": return_codes.QUEUE_ERROR, "description": description}, 500
+
+    return {"status": return_codes.SUCCESS, "event_id": encode_event_id(new_event.id)}, 200
+
+
+@route("/api/send_nft/", methods=["POST"], session=True, schema=Send_Nft_Request)
+async def send_nft(request, session):
+    """Минтит NFT из события на кошелек приложения, а затем отправляет его
+    пользователю."""
+
+    data = request.params
+
+    telegram_id = int(data.telegram_id)
+    wallet_address = data.wallet_address
+    event_id = data.event_id
+
+    ticket_id = uuid4().hex
+
+    # Прием заявки в Redis без обращения к БД
+    try:
+        event_id = decode_event_id(str(event_id))
+        result = await asyncio.to_thread(admit_claim, event_id, telegram_id, wallet_address, ticket_id)
+
+        # Загрузка состояния события при первой заявке
+        if result is None:
+            event = await event_by_id(event_id=event_id, session=session)
+
+            if event is None:
+                description = f"Event with id {event_id} was not found"
+                logger.error(description)
+                return {"status": return_codes.NOT_FOUND, "description": description}, 404
+
+            await asyncio.to_thread(
+                load_claim_state,
+                event_id=event_id,
+                nfts_left=event.nfts_cnt - event.minted_nfts,
+                participants=await event_participants(event_id=event_id, session=session),
+            )
+
+            result = await asyncio.to_thread(admit_claim, event_id, telegram_id, wallet_address, ticket_id)
+
+    except Exception as e:
+        description = "Error when trying to admit the claim"
+        logger.error(f"{description}: {e}")
+        return {"status": return_codes.SERVER_ERROR, "description": description}, 500
+
+    if result == return_codes.REPEAT_USER:
+        description = "The user has already received the NFT from this event"
+        logger.error(description)
+        return {"status": return_codes.REPEAT_USER, "description": description}, 400
+
+    if result == return_codes.EVENT_NFTS_LEFT:
+        description = "All NFTs from this event have already been received"
+        logger.error(description)
+        return {"status": return_codes.EVENT_NFTS_LEFT, "description": description}, 400
+
+    # Состояние события могло истечь между загрузкой и повторным приемом
+    if result != return_codes.SUCCESS:
+        description = "The claim was not admitted, try again"
+        logger.error(f"{description}: admission result {result} for event {event_id}")
+        return {"status": return_codes.SERVER_ERROR, "description": description}, 500
+
+    # Заявка уже в очереди, поэтому ошибка здесь только откладывает её запись
+    # до следующей заявки
+    try:
+        await asyncio.to_thread(schedule_claims_flush)
+
+    except Exception as e:
+        logger.error(f"Error when trying to schedule the claims flush: {e}")
+
+    return {"status": return_codes.SUCCESS, "ticket_id": ticket_id}, 202
+
+
+@route("/api/ticket_events/<ticket_id>/", methods=["GET"])
+async def ticket_events(request, ticket_id: str):
+    """Поток Server-Sent Events с изменениями состояния тикета заявки или
+    транзакции: queued, pending, minted, transferred, success, failed."""
+
+    try:
+        if await asyncio.to_thread(ticket_state, ticket_id) is None:
+            description = f"Ticket {ticket_id} was not found"
+            return {"status": return_codes.NOT_FOUND, "description": description}, 404
+
+    except Exception as e:
+        description = "Error when trying to get the ticket state"
+        logger.error(f"{description}: {e}")
+        return {"status": return_codes.SERVER_ERROR, "description": description}, 500
+
+    async def stream():
+        async for ticket in listen_ticket(ticket_id, TICKET_STREAM_TIMEOUT):
+
+            # Комментарий поддерживает соединение через прокси
+            if ticket is None:
+                yield ": keep-alive\n\n"
+
+            else:
+                yield f"data: {json.dumps(ticket)}\n\n"
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return ApiResponse(stream(), mimetype="text/event-stream", headers=headers)
+
+
+def nft_image_url(version: str, seed: int):
+    return f"/api/random_nft/{version}/{seed}/"
+
+
+def preferred_nft_format(accept: str | None):
+    """Выбирает формат NFT по заголовку Accept: WebP, если клиент его
+    принимает, иначе PNG."""
+
+    for item in (accept or "").split(","):
+        media_type, *params = [part.strip() for part in item.split(";")]
+
+        if media_type.lower() != "image/webp":
+            continue
+
+        try:
+            quality = float(next((param[2:] for param in params if param.startswith("q=")), 1))
+
+        except ValueError:
+            quality = 1
+
+        return "webp" if quality > 0 else "png"
+
+    return "png"
+
+
+async def load_event_info(event_id: int, session):
+    """Возвращает данные события из кэша, либо из БД с сохранением в кэш.
+    Если событие не найдено, возвращает None.
+
+    Кэш не обязателен для ответа, поэтому ошибки Redis только логируются."""
+
+    generation = None
+
+    try:
+        event_info, generation = await asyncio.to_thread(read_event_info, event_id)
+
+        if event_info is not None:
+            return event_info
+
+    except Exception as e:
+        logger.error(f"Error when trying to read the event cache: {e}")
+
+    event = await event_by_id(event_id=event_id, session=session)
+
+    if event is None:
+        return None
+
+    telegram_id = event.telegram_id
+    collection_name = (await author_by_tg_id(telegram_id=telegram_id, session=session)).collection_name
+
+    image_variants = get_image_variant_urls(collection_name, telegram_id, event.image_blob, event.image_variants)
+
+    # Пока варианты не созданы, отдается исходное изображение
+    logo_url = image_variants.get("medium", {}).get("webp") or get_event_image_url(
+        collection_name, telegram_id, event.image_name, event.image_blob
+    )
+
+    event_info = Event_Info(
+        start_date=event.start_date,
+        end_date=event.end_date,
+        invites=event.invites,
+        subscriptions=event.subscriptions,
+        minted_nfts=event.minted_nfts,
+        nfts_cnt=event.nfts_cnt,
+        image_name=event.image_name,
+        logo_url=logo_url,
+        collection_name=collection_name,
+        event_name=event.event_name,
+        description=event.event_description,
+        transaction_id=event.transaction_id,
+        empty_password=event.password == sha256_hash(""),
+        user_timezone=event.user_timezone,
+        image_variants=image_variants or None,
+    )
+
+    if generation is not None:
+        try:
+            await asyncio.to_thread(write_event_info, event_id, event_info, generation)
+
+        except Exception as e:
+            logger.error(f"Error when trying to write the event cache: {e}")
+
+    return event_info
+
+
+async def load_metadata(path: str, session):
+    """Возвращает JSON метаданных из кэша, либо из БД или файла, записанного
+    до переноса метаданных в БД, с сохранением в кэш. Если метаданных нет,
+    возвращает None."""
+
+    generation = None
+
+    try:
+        metadata, generation = await asyncio.to_thread(read_metadata, path)
+
+        if metadata is not None:
+            return metadata
+
+    except Exception as e:
+        logger.error(f"Error when trying to read the metadata cache: {e}")
+
+    document = await metadata_by_path(path, session)
+
+    if document is not None:
+        metadata = msgspec.json.encode(document.document)
+
+    else:
+        metadata = await asyncio.to_thread(read_metadata_file, path)
+
+        if metadata is None:
+            return None
+
+    if generation is not None:
+        try:
+            await asyncio.to_thread(write_metadata, path, metadata, generation)
+
+        except Exception as e:
+            logger.error(f"Error when trying to write the metadata cache: {e}")
+
+    return metadata
+
+
+async def touch_subscriber(telegram_id: int, username: str, session):
+    """Создает или обновляет пользователя и подписчика одним запросом. Если
+    данные не изменились, вход отмечается без записи в БД."""
+
+    if not await upsert_subscriber(telegram_id=telegram_id, username=username, session=session):
+        await asyncio.to_thread(record_last_enter, telegram_id)
+
+    await session.commit()
+
+
+async def load_user_info(telegram_id: int, event_id: int, session):
+    """Возвращает посещенные пользователем каналы и его участие в событии."""
+
+    return User_Info(
+        visited_channels=await visited_channels_by_tg_id(telegram_id=telegram_id, session=session),
+        participated=await is_participant(telegram_id=telegram_id, event_id=event_id, session=session),
+    )
+
+
+def subscription_channels(subscriptions):
+    """Возвращает список каналов подписки события. Список хранится строкой
+    через запятую, либо массивом."""
+
+    if isinstance(subscriptions, str):
+        subscriptions = subscriptions.split(",")
+
+    return [channel.strip() for channel in subscriptions or [] if channel.strip()]
+
@@ -0,0 +1,40 @@
+from functools import partial
+
+from quart import Response, request
+
+from . import create_asgi_app, get_async_session
+from . import api  # noqa: F401 (регистрация обработчиков)
+from .routing import ROUTES, ApiRequest, ApiResponse, dispatch
+
+# Запуск: hypercorn lidum.asgi:app
+app = create_asgi_app()
+AsyncSession = get_async_session(app)
+
+
+def to_quart_response(result: ApiResponse):
+    response = Response(result.body, status=result.status, mimetype=result.mimetype, headers=result.headers)
+
+    # Потоковые ответы (SSE) ограничены собственным таймаутом, а не RESPONSE_TIMEOUT
+    if result.is_stream:
+        response.timeout = None
+
+    return response
+
+
+async def view(route, **view_args):
+    api_request = ApiRequest(
+        body=b"" if route.stream else await request.get_data(),
+        args=request.args,
+        headers=request.headers,
+        stream=aiter(request.body) if route.stream else None,
+    )
+
+    return to_quart_response(await dispatch(route, api_request, AsyncSession, **view_args))
+
+
+for route in ROUTES:
+    app.add_url_rule(route.rule, endpoint=route.endpoint, view_func=partial(view, route), methods=route.methods)
+
+
+if __name__ == "__main__":
+    app.run(port=8001, debug=True)
@@ -1,5 +1,3 @@
-from datetime import datetime, timezone
-
 from aiogram import types
 from aiogram.types import BotCommand, CallbackQuery
 from aiogram.filters import Command
@@ -7,12 +5,12 @@ from aiogram.fsm.context import FSMContext
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
 from .. import get_app, create_bot, get_session
+from ..tasks import record_last_enter
 from ..config import APP_NAME, ADMIN_IDS, BOT_USERNAME
-from ..utils.db import Telegram_User, tg_users, event_by_id
+from ..utils.db import tg_users, event_by_id, upsert_tg_user
 from ..utils.db import tg_user_by_id, event_ids_by_tg_id
-from ..utils.db import add_database_entries
 from .newsletter import Newsletter, Newsletter_Form
-from ..utils.crypto import encrypt
+from ..utils.crypto import encode_event_id
 
 app = get_app()
 Session = get_session(app)[1]
@@ -41,7 +39,7 @@ async def events_handler(callback: CallbackQuery):
         for id in event_ids:
             event = event_by_id(event_id=id, session=session)
 
-            markup.button(text=event.event_name, url=f"https://t.me/{BOT_USERNAME}/{APP_NAME}?startapp=minter-{encrypt(id)}")
+            markup.button(text=event.event_name, url=f"https://t.me/{BOT_USERNAME}/{APP_NAME}?startapp=minter-{encode_event_id(id)}")
 
         markup.button(text="Back", callback_data="back_to_start")
         markup.adjust(1)
@@ -129,29 +127,27 @@ async def admin_message(message: types.Message, edit: bool = False):
 
 async def start_message(message: types.Message, edit: bool = False):
 
-    session = Session()
-
     user_id = message.chat.id
-    user = tg_user_by_id(telegram_id=user_id, session=session)
-
-    # Запись id пользователя в БД
-    if user is None:
 
-        new_tg_user = Telegram_User(
-            id=user_id,
-            username=message.from_user.username,
-        )
-
-        add_database_entries(entries=new_tg_user, session=session)
+    # При редактировании message отправлено ботом, и его from_user - сам бот,
+    # поэтому пользователь уже записан и нужна только отметка о входе.
+    # Пользователь без имени не может быть записан (username NOT NULL),
+    # поэтому для него также только отмечается вход
+    if edit or message.from_user.username is None:
+        record_last_enter(user_id)
 
+    # Запись id пользователя в БД, либо отметка о входе
     else:
-        if user.username is None:
-            user.username = message.from_user.username
+        session = Session()
 
-        user.last_enter = datetime.now(timezone.utc)
-        session.commit()
+        try:
+            if not upsert_tg_user(telegram_id=user_id, username=message.from_user.username, session=session):
+                record_last_enter(user_id)
 
-    session.close()
+            session.commit()
+
+        finally:
+            session.close()
 
     markup = InlineKeyboardBuilder()
 
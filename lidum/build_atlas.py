@@ -0,0 +1,20 @@
+import os
+from time import perf_counter
+
+from .config import NFT_LAYERS_PATH, NFT_LAYERS_ATLAS_PATH
+from .utils.layers import LayerEngine, write_atlas
+
+# Собирает атлас подготовленных слоев из NFT_LAYERS_PATH:
+#   python -m lidum.build_atlas
+#
+# Запускается после изменения слоев. Пока атлас не пересобран, процессы
+# замечают, что он устарел, и декодируют слои из PNG.
+
+if __name__ == "__main__":
+    start = perf_counter()
+
+    tree = LayerEngine(NFT_LAYERS_PATH).tree
+    write_atlas(NFT_LAYERS_ATLAS_PATH, tree)
+
+    size = os.path.getsize(NFT_LAYERS_ATLAS_PATH) / 2**20
+    print(f"Atlas {NFT_LAYERS_ATLAS_PATH} ({size:.1f} MB, version {tree.version}) built in {perf_counter() - start:.1f} s")
@@ -0,0 +1,149 @@
+import sys
+import json
+from datetime import datetime, timezone
+
+from sqlalchemy import text
+
+from . import get_app, get_session
+from .utils.db import event_ids_by_tg_id_query
+from .utils.db import reserve_event_nft_query, release_event_nft_query
+from .utils.db import is_participant_query, visited_channels_query
+from .utils.db import event_participants_query, event_participants_cnt_query
+from .utils.db import remove_participation_query, assign_nft_seed_query
+from .utils.db import update_last_enters_query
+from .utils.db import image_reference_query, release_blob_query
+
+# Проверка планов запросов горячего пути на локальной базе после миграций:
+#   python -m lidum.check_plans
+#
+# Те же проверки выполняет тест tests/test_query_plans.py.
+#
+# Последовательное сканирование запрещается (enable_seqscan = off), чтобы на
+# маленькой базе планировщик выбирал индекс, если тот вообще применим. Если
+# запрос или индекс изменятся так, что индекс перестанет использоваться,
+# проверка завершится с ненулевым кодом.
+PLAN_CHECKS = [
+    (
+        "event_ids_by_tg_id",
+        event_ids_by_tg_id_query(telegram_id=1),
+        "ix_events_telegram_id",
+    ),
+    (
+        "reserve_event_nft",
+        reserve_event_nft_query(event_id=1),
+        "events_pkey",
+    ),
+    (
+        "release_event_nft",
+        release_event_nft_query(event_id=1),
+        "events_pkey",
+    ),
+    (
+        "event_participants",
+        event_participants_query(event_id=1),
+        "ix_participations_event_id_created_at",
+    ),
+    (
+        "event_participants_cnt",
+        event_participants_cnt_query(event_id=1),
+        "ix_participations_event_id_created_at",
+    ),
+    (
+        "is_participant",
+        is_participant_query(telegram_id=1, event_id=1),
+        "participations_pkey",
+    ),
+    (
+        "remove_participation",
+        remove_participation_query(telegram_id=1, event_id=1),
+        "participations_pkey",
+    ),
+    (
+        "assign_nft_seed",
+        assign_nft_seed_query(telegram_id=1, event_id=1, nft_seed=1, nft_number=1),
+        "participations_pkey",
+    ),
+    (
+        "visited_channels",
+        visited_channels_query(telegram_id=1),
+        "channel_visits_pkey",
+    ),
+    (
+        "update_last_enters",
+        update_last_enters_query({1: datetime(2026, 1, 1, tzinfo=timezone.utc)}),
+        "telegram_users_pkey",
+    ),
+    (
+        "image_reference",
+        image_reference_query(owner="event:1"),
+        "image_references_pkey",
+    ),
+    (
+        "release_blob",
+        release_blob_query(blob_name="blob"),
+        "image_blobs_pkey",
+    ),
+]
+
+
+def plan_indexes(plan: dict):
+    """Возвращает имена индексов, используемых в узлах плана."""
+
+    indexes = {plan["Index Name"]} if "Index Name" in plan else set()
+
+    for subplan in plan.get("Plans", []):
+        indexes |= plan_indexes(subplan)
+
+    return indexes
+
+
+def explain(session, statement):
+    """Возвращает план запроса в формате JSON."""
+
+    connection = session.connection()
+    compiled = statement.compile(dialect=connection.dialect)
+
+    result = connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}", compiled.params)
+    plan = result.scalar()
+
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+
+    return plan[0]["Plan"]
+
+
+def check_plans(session):
+    """Проверяет, что каждый запрос из PLAN_CHECKS использует ожидаемый индекс.
+    Возвращает количество проваленных проверок."""
+
+    session.execute(text("SET LOCAL enable_seqscan = off"))
+
+    failures = 0
+
+    for name, statement, expected_index in PLAN_CHECKS:
+        indexes = plan_indexes(explain(session, statement))
+
+        if expected_index in indexes:
+            print(f"OK    {name}: {expected_index}")
+
+        else:
+            failures += 1
+            print(f"FAIL  {name}: expected {expected_index}, got {sorted(indexes) or 'no index'}")
+
+    return failures
+
+
+if __name__ == "__main__":
+    app = get_app()
+
+    with app.app_context():
+        session = get_session(app)[0]()
+
+        try:
+            failures = check_plans(session)
+
+        finally:
+            session.rollback()
+            session.close()
+
+    sys.exit(1 if failures else 0)
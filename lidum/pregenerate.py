@@ -0,0 +1,34 @@
+import argparse
+from time import perf_counter
+
+from .config import NFT_PREGENERATED_PATH
+from .utils.nft_generation import NFT_FORMATS
+from .utils.pregeneration import pregenerate, prune_images
+
+# Заранее генерирует NFT всех комбинаций слоев:
+#   python -m lidum.pregenerate [--workers N] [--formats png,webp] [--prune]
+#
+# Повторный запуск генерирует только отсутствующие комбинации, поэтому его
+# можно прервать и продолжить, а после добавления слоев - запустить снова.
+# Веб-процессы подхватывают новый манифест без перезапуска.
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pre-generate NFTs for every layer combination")
+    parser.add_argument("--output", default=NFT_PREGENERATED_PATH, help="output directory")
+    parser.add_argument("--workers", type=int, default=None, help="number of render processes")
+    parser.add_argument("--formats", default=",".join(NFT_FORMATS), help="comma separated image formats")
+    parser.add_argument("--prune", action="store_true", help="remove images no longer in the manifest")
+    args = parser.parse_args()
+
+    formats = args.formats.split(",")
+
+    if unknown := set(formats) - NFT_FORMATS.keys():
+        parser.error(f"unknown formats: {', '.join(sorted(unknown))}")
+
+    start = perf_counter()
+    rendered = pregenerate(args.output, formats, workers=args.workers)
+
+    print(f"{rendered} combinations rendered in {perf_counter() - start:.1f} s")
+
+    if args.prune:
+        print(f"{prune_images(args.output)} unused images removed")
@@ -0,0 +1,17 @@
+import argparse
+
+from .tasks import prewarm_collection_metadata
+
+# Загружает метаданные коллекций в Redis перед массовым минтом:
+#   python -m lidum.prewarm_metadata TELEGRAM_ID [TELEGRAM_ID ...]
+#
+# Коллекция определяется по id автора. Записи, сброшенные во время загрузки,
+# не перезаписываются, поэтому запуск безопасен при работающем API.
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load collection metadata into the cache")
+    parser.add_argument("telegram_ids", nargs="+", type=int, help="telegram ids of the collection authors")
+    args = parser.parse_args()
+
+    for telegram_id in args.telegram_ids:
+        print(f"{telegram_id}: {prewarm_collection_metadata(telegram_id)} documents loaded")
@@ -0,0 +1,142 @@
+import hashlib
+import logging
+from typing import Any
+from dataclasses import field, dataclass
+from collections.abc import Callable, Mapping, Awaitable, AsyncIterator
+
+import msgspec
+
+# Маршруты API, не зависящие от веб-фреймворка. Обработчики из api.py
+# регистрируются здесь, а wsgi.py (Flask) и asgi.py (Quart) подключают их
+# к своему приложению. Обработчик возвращает (данные, код[, заголовки]) либо
+# ApiResponse для файлов, потоков и редиректов. Данные кодируются в JSON
+# через msgspec, поэтому могут содержать схемы из schemas.py.
+logger = logging.getLogger("lidum")
+
+json_encoder = msgspec.json.Encoder()
+
+
+@dataclass
+class ApiRequest:
+    """Данные запроса, необходимые обработчикам. params - тело запроса,
+    разобранное по схеме маршрута. У потоковых маршрутов тело не читается
+    заранее, а передается в stream частями."""
+
+    body: bytes = b""
+    params: Any = None
+    args: Mapping[str, str] = field(default_factory=dict)
+    headers: Mapping[str, str] = field(default_factory=dict)
+    stream: AsyncIterator[bytes] | None = None
+
+
+@dataclass
+class ApiResponse:
+    """Готовый ответ. body - байты, строка или асинхронный генератор."""
+
+    body: bytes | str | AsyncIterator[bytes | str] = b""
+    status: int = 200
+    mimetype: str | None = None
+    headers: dict[str, str] = field(default_factory=dict)
+
+    @property
+    def is_stream(self):
+        return not isinstance(self.body, (bytes, str))
+
+
+@dataclass
+class Route:
+    rule: str
+    methods: list[str]
+    handler: Callable[..., Awaitable[Any]]
+    session: bool = False
+    decoder: msgspec.json.Decoder | None = None
+    stream: bool = False
+
+    @property
+    def endpoint(self):
+        return self.handler.__name__
+
+
+ROUTES: list[Route] = []
+
+
+def route(rule: str, methods: list[str], session: bool = False, schema: type | None = None, stream: bool = False):
+    """Регистрирует обработчик запроса.
+
+    При session=True на время обработки открывается асинхронная сессия БД и
+    передается в аргумент session. Если указана schema, тело запроса
+    разбирается по ней в request.params, а при несоответствии обработчик не
+    вызывается и клиент получает 400. При stream=True тело не читается в
+    память, а передается в request.stream (schema при этом не указывается)."""
+
+    def decorator(handler):
+        decoder = msgspec.json.Decoder(schema) if schema is not None else None
+        ROUTES.append(
+            Route(rule=rule, methods=methods, handler=handler, session=session, decoder=decoder, stream=stream)
+        )
+        return handler
+
+    return decorator
+
+
+async def dispatch(route: Route, request: ApiRequest, session_factory, **view_args):
+    """Разбирает тело запроса по схеме маршрута, вызывает обработчик с сессией
+    из session_factory, если она нужна, и возвращает готовый ApiResponse."""
+
+    if route.decoder is not None:
+        try:
+            request.params = route.decoder.decode(request.body)
+
+        # Ошибка клиента, а не сервера, поэтому не пишется в лог ошибок
+        except (msgspec.ValidationError, msgspec.DecodeError) as e:
+            description = f"Invalid request body: {e}"
+            logger.info(description)
+            return json_response({"status": "error", "description": description}, 400)
+
+    if not route.session:
+        return to_response(await route.handler(request, **view_args))
+
+    async with session_factory() as session:
+        return to_response(await route.handler(request, session=session, **view_args))
+
+
+def json_response(payload, status: int = 200, headers: dict | None = None):
+    return ApiResponse(json_encoder.encode(payload), status=status, mimetype="application/json", headers=headers or {})
+
+
+def to_response(result):
+    """Превращает результат обработчика в ApiResponse."""
+
+    if isinstance(result, ApiResponse):
+        return result
+
+    return json_response(*result)
+
+
+def etag_matches(etag: str, if_none_match: str | None):
+    """Проверяет ETag по заголовку If-None-Match (слабое сравнение, RFC 9110)."""
+
+    if not if_none_match:
+        return False
+
+    if if_none_match.strip() == "*":
+        return True
+
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+
+    return etag.removeprefix("W/") in tags
+
+
+def conditional_response(request: ApiRequest, payload, cache_control: str, code: int = 200):
+    """JSON-ответ со строгим ETag по содержимому и Cache-Control. Если у
+    клиента уже есть эта версия ответа, возвращает 304 без тела."""
+
+    body = json_encoder.encode(payload)
+
+    etag = f'"{hashlib.blake2b(body, digest_size=12).hexdigest()}"'
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+
+    if etag_matches(etag, request.headers.get("If-None-Match")):
+        return ApiResponse(status=304, headers=headers)
+
+    return ApiResponse(body, status=code, mimetype="application/json", headers=headers)
@@ -0,0 +1,133 @@
+from msgspec import Struct
+
+# Схемы тел запросов и данных ответов API. Декодеры схем запросов собираются
+# один раз при регистрации маршрута (routing.route), тело запроса разбирается
+# и проверяется за один проход. Неизвестные поля игнорируются.
+
+
+class Dropper_Price_Request(Struct):
+    nfts_cnt: int
+
+
+class Create_Drop_Request(Struct):
+    telegram_id: int | str
+    start_date: str
+    end_date: str
+    prizes: str
+    price: int | float
+
+
+class Channel_Avatar_Request(Struct):
+    channel_url: str
+
+
+class Check_Password_Request(Struct):
+    event_id: str
+    password: str
+
+
+class Event_Info_Request(Struct):
+    event_id: str
+
+
+class Add_Visited_Channel_Request(Struct):
+    telegram_id: int | str
+    channel: str
+
+
+class User_Info_Request(Struct):
+    telegram_id: int | str
+    username: str
+    event_id: str
+
+
+class Bootstrap_Request(Struct):
+    telegram_id: int | str
+    username: str
+    event_id: str
+
+
+class Get_Price_Request(Struct):
+    telegram_id: int | str
+    collection_images_cnt: int
+
+
+class Add_Transaction_Request(Struct):
+    transaction_hash: str  # Хэш транзакции
+    wallet_address: str  # Адрес отправителя
+    amount: float | int  # Оплаченная сумма
+    event_id: str  # ID созданного события
+
+
+class Transaction_Status_Request(Struct):
+    transaction_id: int
+
+
+class Author_Info_Request(Struct):
+    telegram_id: int | str
+    username: str
+
+
+class Make_Post_Request(Struct):
+    qrcode: str
+    description: str
+    button: str
+    telegram_id: int | str
+    button_url: str
+
+
+class Create_Event_Request(Struct):
+    telegram_id: int | str  # ID телеграма автора
+    wallet_address: str  # Адрес кошелька пользователя
+    event_name: str  # Название нового события
+    event_description: str  # Описание нового события
+    collection_name: str  # Название коллекции автора
+    nfts_cnt: int  # Количество NFT для события
+    image_name: str  # Название изображения события
+    start_date: str  # Дата начала события
+    end_date: str  # Дата окончания события
+    password: str  # Пароль события
+    subscriptions: str  # Список каналов на тг-каналы
+    price: float | int  # Цена за создание коллекции
+    user_timezone: int  # Часовой пояс события
+    event_id: str | int | None = None  # ID редактируемого события
+    invite: int = 0  # Количество пользователей для приглашения
+    is_testnet: bool | None = None  # По умолчанию Flask_Config.TESTNET
+    generative: bool = False  # Уникальная комбинация слоев каждому участнику
+    image: str | None = None  # Изображение в формате base64
+    upload_id: str | None = None  # Либо id изображения из /api/upload_image/
+
+
+class Send_Nft_Request(Struct):
+    telegram_id: int | str
+    wallet_address: str
+    event_id: str
+
+
+class Event_Info(Struct):
+    start_date: str
+    end_date: str
+    invites: int
+    subscriptions: str | list[str]
+    minted_nfts: int
+    nfts_cnt: int
+    image_name: str
+    logo_url: str
+    collection_name: str
+    event_name: str
+    description: str
+    transaction_id: int
+    empty_password: bool
+    user_timezone: int
+    # Адреса уменьшенных вариантов изображения: {вариант: {расширение: адрес}}
+    image_variants: dict[str, dict[str, str]] | None = None
+
+
+class User_Info(Struct):
+    visited_channels: list[str]
+    participated: bool
+
+
+class Author_Info(Struct):
+    collection_name: str
+    collection_address: str
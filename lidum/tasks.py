@@ -1,22 +1,56 @@
 import asyncio
+from collections import Counter
 
+import msgspec
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from celery.exceptions import MaxRetriesExceededError
 
-from . import get_app, create_celery
-from .utils import tasks_statuses
+from . import get_app, redis_client, create_celery
+from .utils import return_codes, tasks_statuses
 from .config import LS_INDEX, MINT_ATTEMPS_CNT
 from .config import MINT_RETRY_DELAY, TRANSFER_ATTEMPS_CNT
 from .config import TRANSFER_RETRY_DELAY
 from .config import TRANSACTION_ATTEMPS_CNT
 from .config import TRANSACTION_RETRY_DELAY
+from .config import CLAIM_FLUSH_BATCH, CLAIM_FLUSH_DELAY
+from .config import CLAIM_FLUSH_LOCK_TTL
+from .config import LAST_ENTER_FLUSH_INTERVAL, BLOB_GC_DELAY
+from .config import UPLOAD_TTL
 from .utils.db import author_by_tg_id, transaction_by_id
+from .utils.db import reserve_event_nft, release_event_nft
+from .utils.db import Subscriber, add_participation, bulk_insert
+from .utils.db import ensure_subscriber
+from .utils.db import remove_participation, update_last_enters
+from .utils.db import assign_nft_seed, set_image_variants
+from .utils.db import claimed_nft, freeze_event_layers
+from .utils.db import unused_blobs_query, remove_blob_entry
+from .utils.db import save_metadata, metadata_paths_by_prefix
+from .utils.db import metadata_by_prefix
+from .utils.db import unit_of_work
+from .utils.cache import add_event_minted, invalidate_event_info
+from .utils.cache import invalidate_metadata, prewarm_metadata
+from .utils.cache import metadata_generations
+from .utils.claims import CLAIMS_FLUSH_KEY, pop_claims
+from .utils.claims import ack_claims, requeue_claims, flush_lock
+from .utils.claims import close_claims, release_claim
+from .utils.tickets import set_ticket_state, ticket_states
+from .utils.last_seen import LAST_ENTER_FLUSH_KEY, touch_user
+from .utils.last_seen import pop_last_enters
+from .utils.convert import to_json_ext
 from .utils.deploy import deploy_one_item, deploy_collection
 from .utils.convert import address_to_friendly
 from .utils.ton_client import get_transaction_data
 from .utils.mint_bodies import collection_mint_body
 from .utils.transfer_nft import transfer_nft
+from .utils.image import create_image_variants
+from .utils.image import find_image_variants
+from .utils.image import UPLOADS_CLEANUP_KEY, remove_stale_uploads
+from .utils.metadata import collection_metadata_prefix
+from .utils.path import get_blob_key
+from .utils.blobs import remove_blob
+from .utils.nft_generation import layer_engine, shuffled_seed
+from .utils.nft_generation import create_generated_nft
 
 app = get_app()
 celery = create_celery(app)
@@ -33,7 +67,7 @@ session_factory = sessionmaker(bind=engine)
 
 
 @celery.task(queue="queue_test", bind=True, max_retries=TRANSACTION_ATTEMPS_CNT, default_retry_delay=TRANSACTION_RETRY_DELAY)
-def process_transaction(self, transaction_id: int):
+def process_transaction(self, transaction_id: int, ticket_id: str | None = None):
     """Фоновая задача на проверку статуса транзакции."""
 
     print(f"Processing transaction {transaction_id}...")
@@ -64,6 +98,8 @@ def process_transaction(self, transaction_id: int):
         transaction.status = tasks_statuses.PENDING
         session.commit()
 
+        set_ticket_state(ticket_id, tasks_statuses.PENDING)
+
         transaction_data = get_transaction_data(hash=hash, is_testnet=is_testnet)
 
         if transaction_data.success:
@@ -73,6 +109,8 @@ def process_transaction(self, transaction_id: int):
             transaction.status = tasks_statuses.FAILED
 
         session.commit()
+
+        set_ticket_state(ticket_id, transaction.status)
         return
 
     except Exception as e:
@@ -86,6 +124,8 @@ def process_transaction(self, transaction_id: int):
             transaction.status = tasks_statuses.CRUSHED
             session.commit()
 
+            set_ticket_state(ticket_id, tasks_statuses.CRUSHED)
+
     finally:
         session.close()
 
@@ -156,7 +196,13 @@ def collection_mint(
 
 @celery.task(queue="queue_test", bind=True, max_retries=MINT_ATTEMPS_CNT, default_retry_delay=MINT_RETRY_DELAY)
 def nft_mint(
-    self, author_telegram_id: str | int, dest_wallet_address: str, collection_address: str, nft_meta: str, is_testnet: bool
+    self,
+    author_telegram_id: str | int,
+    dest_wallet_address: str,
+    collection_address: str,
+    nft_meta: str,
+    is_testnet: bool,
+    ticket_id: str | None = None,
 ):
 
     print(f"Launching the task of minting the nft into collection {collection_address}...")
@@ -169,6 +215,7 @@ def nft_mint(
         if author is None:
             print(f"Author with id {author_telegram_id} was not found")
             session.close()
+            set_ticket_state(ticket_id, tasks_statuses.FAILED, description=return_codes.NOT_FOUND)
             return
 
         collection_status = author.collection_status
@@ -176,11 +223,13 @@ def nft_mint(
     except Exception as e:
         print(f"Error when trying to find an author with id {author_telegram_id}: {e}")
         session.close()
+        set_ticket_state(ticket_id, tasks_statuses.FAILED, description=return_codes.DB_READING_ERROR)
         return
 
     if collection_status == tasks_statuses.FAILED:
         print(f"The collection with the address {collection_address} has not been minted. Canceling this task...")
         session.close()
+        set_ticket_state(ticket_id, tasks_statuses.FAILED, description=return_codes.MINT_ERROR)
         return
 
     # Откладывание задачи, если коллекция ещё не заминчена
@@ -208,8 +257,10 @@ def nft_mint(
             print("The minting of the NFT was successful!")
             success = True
 
+            set_ticket_state(ticket_id, tasks_statuses.MINTED, nft_address=nft_address)
+
             try:
-                sending_nft.delay(nft_address, dest_wallet_address, is_testnet)
+                sending_nft.delay(nft_address, dest_wallet_address, is_testnet, ticket_id)
 
             except Exception as e:
                 print(
@@ -217,6 +268,7 @@ def nft_mint(
                     f"to the queue for sending nft from collection {collection_address}: {e}"
                 )
                 session.close()
+                set_ticket_state(ticket_id, tasks_statuses.FAILED, description=return_codes.QUEUE_ERROR)
                 return
 
     except Exception as e:
@@ -231,10 +283,11 @@ def nft_mint(
         except MaxRetriesExceededError:
             session.close()
             print(f"The attempt to mint NFT to the collection {collection_address} was unsuccessful")
+            set_ticket_state(ticket_id, tasks_statuses.FAILED, description=return_codes.MINT_ERROR)
 
 
 @celery.task(queue="queue_test", bind=True, max_retries=TRANSFER_ATTEMPS_CNT, default_retry_delay=TRANSFER_RETRY_DELAY)
-def sending_nft(self, nft_address: str, dest_wallet_address: str, is_testnet: bool):
+def sending_nft(self, nft_address: str, dest_wallet_address: str, is_testnet: bool, ticket_id: str | None = None):
 
     nft_address = address_to_friendly(nft_address)
     dest_wallet_address = address_to_friendly(dest_wallet_address)
@@ -258,6 +311,7 @@ def sending_nft(self, nft_address: str, dest_wallet_address: str, is_testnet: bo
 
         if success:
             print(f"The transfer of the NFT {nft_address} was successful!")
+            set_ticket_state(ticket_id, tasks_statuses.TRANSFERRED, nft_address=nft_address)
 
     except Exception as e:
         print(e)
@@ -269,3 +323,514 @@ def sending_nft(self, nft_address: str, dest_wallet_address: str, is_testnet: bo
 
         except MaxRetriesExceededError:
             print(f"The attempt to send NFT {nft_address} to the user {dest_wallet_address} was unsuccessful")
+            set_ticket_state(ticket_id, tasks_statuses.FAILED, description=return_codes.NFT_TRANSFER_ERROR)
+
+
+def schedule_claims_flush():
+    """Ставит задачу на запись заявок в очередь, если она ещё не поставлена.
+
+    Все заявки, принятые за CLAIM_FLUSH_DELAY секунд, записываются одной
+    задачей."""
+
+    # Флаг снимается по таймауту, если задача была потеряна брокером
+    if redis_client.set(CLAIMS_FLUSH_KEY, 1, nx=True, ex=60):
+
+        try:
+            flush_claims.apply_async(countdown=CLAIM_FLUSH_DELAY)
+
+        except Exception:
+            redis_client.delete(CLAIMS_FLUSH_KEY)
+            raise
+
+
+@celery.task(queue="queue_test")
+def flush_claims():
+    """Фоновая задача на запись принятых в Redis заявок в БД и постановку
+    минта NFT в очередь.
+
+    Пачка заявок лежит в списке обрабатываемых, пока все ее минты не будут
+    поставлены в очередь. Если воркер упал, не подтвердив пачку, следующая
+    задача возвращает ее в очередь, и _write_claims повторяет только
+    необработанные заявки."""
+
+    # Заявки, пришедшие после этого момента, поставят новую задачу
+    redis_client.delete(CLAIMS_FLUSH_KEY)
+
+    lock = flush_lock(CLAIM_FLUSH_LOCK_TTL)
+
+    # Заявки запишет выполняющаяся задача, но она может закончить работу до
+    # их прихода, поэтому задача переносится
+    if not lock.acquire():
+        schedule_claims_flush()
+        return
+
+    try:
+        requeued = requeue_claims()
+
+        if requeued:
+            print(f"{requeued} unacknowledged claims were returned to the queue")
+
+        while True:
+            claims = pop_claims(CLAIM_FLUSH_BATCH)
+
+            if not claims:
+                return
+
+            print(f"Flushing {len(claims)} claims...")
+            accepted = _write_claims(claims)
+
+            _update_cached_minted(Counter(claim["event_id"] for claim, *_, replayed in accepted if not replayed))
+
+            # Резервирование повторенной заявки могло уже попасть в кэш
+            for event_id in {claim["event_id"] for claim, *_, replayed in accepted if replayed}:
+                invalidate_event_info(event_id)
+
+            for claim, reserved, nft_seed, layers_version, _ in accepted:
+                _queue_claim_mint(claim, reserved, nft_seed, layers_version)
+
+            ack_claims()
+
+    finally:
+        lock.release()
+
+
+def _write_claims(claims: list[dict]):
+    """Записывает пачку заявок в БД одной транзакцией. Каждая заявка
+    выполняется в своей точке сохранения, чтобы отказ по одной не отменял
+    остальные.
+
+    Участнику генеративного события закрепляется комбинация слоев по
+    порядковому номеру резервирования среди комбинаций дерева слоев,
+    закрепленного за событием. Возвращает список из заявки, данных
+    резервирования, номера комбинации и версии дерева слоев (None для обычных
+    событий) и признака повторной записи.
+
+    Пачка, возвращенная в очередь после падения воркера, записывается
+    повторно: заявки, тикет которых уже вышел из состояния QUEUED, были
+    обработаны и пропускаются, а участие, уже записанное по той же заявке,
+    считается принятым, и ее минт ставится в очередь заново."""
+
+    accepted = []
+    states = ticket_states([claim["ticket_id"] for claim in claims])
+    claims = [claim for claim in claims if states[claim["ticket_id"]] in (None, tasks_statuses.QUEUED)]
+
+    if not claims:
+        return accepted
+
+    session = session_factory()
+
+    try:
+        subscribers_created = _create_subscribers(claims, session)
+
+        for claim in claims:
+            event_id = claim["event_id"]
+            telegram_id = claim["telegram_id"]
+
+            savepoint = session.begin_nested()
+
+            try:
+                if not subscribers_created:
+                    ensure_subscriber(telegram_id=telegram_id, session=session)
+
+                if not add_participation(
+                    telegram_id=telegram_id, event_id=event_id, ticket_id=claim["ticket_id"], session=session
+                ):
+                    savepoint.rollback()
+                    claimed = claimed_nft(telegram_id=telegram_id, event_id=event_id, session=session)
+
+                    if claimed is not None and claimed.ticket_id == claim["ticket_id"]:
+                        print(f"Claim {claim['ticket_id']} was already written, requeueing its nft")
+                        accepted.append((claim, claimed, claimed.nft_seed, claimed.layers_version, True))
+                        continue
+
+                    print(f"Claim {claim['ticket_id']} was rejected: {return_codes.REPEAT_USER}")
+                    set_ticket_state(claim["ticket_id"], tasks_statuses.FAILED, description=return_codes.REPEAT_USER)
+                    continue
+
+                reserved = reserve_event_nft(event_id=event_id, session=session)
+
+                if reserved is None:
+                    print(f"Claim {claim['ticket_id']} was rejected: {return_codes.EVENT_NFTS_LEFT}")
+                    savepoint.rollback()
+                    close_claims(event_id)
+                    set_ticket_state(claim["ticket_id"], tasks_statuses.FAILED, description=return_codes.EVENT_NFTS_LEFT)
+                    continue
+
+                nft_seed, layers_version = None, None
+
+                if reserved.generative:
+                    layers_cnt, layers_version = reserved.layers_size, reserved.layers_version
+
+                    # Событие создано до закрепления дерева слоев
+                    if layers_cnt is None:
+                        tree = layer_engine.tree
+                        layers_cnt, layers_version = freeze_event_layers(
+                            event_id=event_id, layers_size=tree.size, layers_version=tree.version, session=session
+                        )
+
+                    # Номера освобожденных NFT не используются повторно,
+                    # поэтому комбинации могут закончиться раньше NFT
+                    if reserved.generated_nfts > layers_cnt:
+                        print(f"Claim {claim['ticket_id']} was rejected: all {layers_cnt} layer combinations were used")
+                        savepoint.rollback()
+                        close_claims(event_id)
+                        set_ticket_state(claim["ticket_id"], tasks_statuses.FAILED, description=return_codes.EVENT_NFTS_LEFT)
+                        continue
+
+                    nft_seed = shuffled_seed(event_id, reserved.generated_nfts - 1, layers_cnt)
+                    assign_nft_seed(
+                        telegram_id=telegram_id,
+                        event_id=event_id,
+                        nft_seed=nft_seed,
+                        nft_number=reserved.generated_nfts,
+                        session=session,
+                    )
+
+                savepoint.commit()
+                accepted.append((claim, reserved, nft_seed, layers_version, False))
+
+            except Exception as e:
+                print(f"Error when trying to write the claim {claim['ticket_id']}: {e}")
+                savepoint.rollback()
+                release_claim(event_id, telegram_id)
+                set_ticket_state(claim["ticket_id"], tasks_statuses.FAILED, description=return_codes.DB_WRITING_ERROR)
+
+        session.commit()
+
+    except Exception as e:
+        print(f"Error when trying to write {len(claims)} claims: {e}")
+        session.rollback()
+
+        for claim in claims:
+            release_claim(claim["event_id"], claim["telegram_id"])
+            set_ticket_state(claim["ticket_id"], tasks_statuses.FAILED, description=return_codes.DB_WRITING_ERROR)
+
+        return []
+
+    finally:
+        session.close()
+
+    return accepted
+
+
+def _create_subscribers(claims: list[dict], session):
+    """Создает подписчиков всей пачки заявок одним запросом. Если запрос не
+    прошел (например, одного из пользователей нет в БД), возвращает False, и
+    подписчики создаются по одному в точках сохранения заявок."""
+
+    savepoint = session.begin_nested()
+
+    try:
+        rows = [{"telegram_id": telegram_id} for telegram_id in {claim["telegram_id"] for claim in claims}]
+        bulk_insert(Subscriber, rows, session, skip_existing=True)
+        savepoint.commit()
+
+        return True
+
+    except Exception as e:
+        print(f"Error when trying to create subscribers of {len(claims)} claims: {e}")
+        savepoint.rollback()
+
+        return False
+
+
+def _update_cached_minted(minted: dict[int, int]):
+    """Изменяет счетчики выпущенных NFT в кэше event_info без сброса записей."""
+
+    for event_id, delta in minted.items():
+        try:
+            add_event_minted(event_id, delta)
+
+        except Exception as e:
+            print(f"Error when trying to update the cached minted counter of event {event_id}: {e}")
+
+
+def _queue_claim_mint(claim: dict, reserved, nft_seed: int | None, layers_version: str | None):
+    """Ставит минт NFT по записанной заявке в очередь, либо отменяет заявку.
+    NFT генеративного события сначала генерируется задачей render_claim_nft.
+
+    Тикет переводится в PENDING до постановки, чтобы повторная запись пачки
+    не поставила минт дважды. Если воркер упадет между этими шагами, минт
+    заявки будет потерян: это предпочтительнее двойного минта."""
+
+    try:
+        set_ticket_state(claim["ticket_id"], tasks_statuses.PENDING)
+
+        if nft_seed is not None:
+            render_claim_nft.delay(
+                claim,
+                reserved.telegram_id,
+                reserved.collection_name,
+                reserved.collection_address,
+                reserved.event_description,
+                reserved.generated_nfts,
+                nft_seed,
+                bool(reserved.is_testnet),
+                layers_version,
+            )
+
+        else:
+            nft_mint.delay(
+                reserved.telegram_id,
+                claim["wallet_address"],
+                reserved.collection_address,
+                to_json_ext(reserved.image_name),
+                bool(reserved.is_testnet),
+                claim["ticket_id"],
+            )
+
+    except Exception as e:
+        set_ticket_state(claim["ticket_id"], tasks_statuses.FAILED, description=return_codes.QUEUE_ERROR)
+        print(f"Error when trying to add a nft of the claim {claim['ticket_id']} to the processing queue: {e}")
+        _cancel_claim(claim)
+
+
+def _cancel_claim(claim: dict):
+    """Возвращает NFT заявки в остаток события и удаляет участие."""
+
+    try:
+        with unit_of_work(session_factory) as session:
+            release_event_nft(event_id=claim["event_id"], session=session)
+            remove_participation(telegram_id=claim["telegram_id"], event_id=claim["event_id"], session=session)
+
+        release_claim(claim["event_id"], claim["telegram_id"])
+        _update_cached_minted({claim["event_id"]: -1})
+
+    except Exception as e:
+        print(f"Error when trying to release the claim {claim['ticket_id']}: {e}")
+
+
+@celery.task(queue="queue_test", bind=True, max_retries=MINT_ATTEMPS_CNT, default_retry_delay=MINT_RETRY_DELAY)
+def render_claim_nft(
+    self,
+    claim: dict,
+    author_telegram_id: str | int,
+    collection_name: str,
+    collection_address: str,
+    description: str,
+    number: int,
+    nft_seed: int,
+    is_testnet: bool,
+    layers_version: str | None = None,
+):
+    """Генерирует изображение и метадату NFT участника генеративного события
+    и ставит его минт в очередь. Выполняется процессами воркеров Celery,
+    поэтому генерация не задерживает ни прием заявок, ни их запись.
+
+    Пока дерево слоев воркера не совпадает с деревом события (например, во
+    время развертывания новых слоев), генерация повторяется."""
+
+    try:
+        image_name, metadata_path, metadata = create_generated_nft(
+            telegram_id=author_telegram_id,
+            collection_name=collection_name,
+            description=description,
+            event_id=claim["event_id"],
+            number=number,
+            seed=nft_seed,
+            layers_version=layers_version,
+        )
+
+        with unit_of_work(session_factory) as session:
+            save_metadata(metadata_path, metadata, session)
+
+        invalidate_metadata(metadata_path)
+
+    except Exception as e:
+        print(f"Error when trying to generate the NFT of the claim {claim['ticket_id']}: {e}")
+
+        try:
+            self.retry()
+
+        except MaxRetriesExceededError:
+            set_ticket_state(claim["ticket_id"], tasks_statuses.FAILED, description=return_codes.NFT_GENERATING_ERROR)
+            _cancel_claim(claim)
+
+        return
+
+    try:
+        nft_mint.delay(
+            author_telegram_id,
+            claim["wallet_address"],
+            collection_address,
+            to_json_ext(image_name),
+            is_testnet,
+            claim["ticket_id"],
+        )
+
+    except Exception as e:
+        set_ticket_state(claim["ticket_id"], tasks_statuses.FAILED, description=return_codes.QUEUE_ERROR)
+        print(f"Error when trying to add a nft of the claim {claim['ticket_id']} to the processing queue: {e}")
+        _cancel_claim(claim)
+
+
+@celery.task(queue="queue_test")
+def process_event_image(event_id: int, image_blob: str):
+    """Фоновая задача на создание уменьшенных вариантов загруженного
+    изображения события. Выполняется процессами воркеров Celery. Без
+    вариантов отдается исходное изображение, которое уже проверено при
+    загрузке. Изображение, уже загруженное для другого события, повторно не
+    обрабатывается.
+
+    Исходный файл не перекодируется: его имя - хэш содержимого, а адрес
+    кэшируется как неизменяемый. Варианты перекодируются и не содержат
+    метаданных исходного файла."""
+
+    image_key = get_blob_key(image_blob)
+    image_variants = find_image_variants(image_key)
+
+    try:
+        if image_variants is None:
+            image_variants = create_image_variants(image_key)
+
+        with unit_of_work(session_factory) as session:
+            set_image_variants(
+                event_id=event_id,
+                image_blob=image_blob,
+                image_variants=image_variants,
+                session=session,
+            )
+
+        invalidate_event_info(event_id)
+
+    except Exception as e:
+        print(f"Error when trying to create variants of the image {image_key}: {e}")
+
+
+@celery.task(queue="queue_test")
+def remove_unused_blobs():
+    """Фоновая задача на удаление файлов хранилища изображений без ссылок.
+
+    Файл удаляется под блокировкой своей строки image_blobs, а запросы
+    записывают файл только под ней же, поэтому проверка и удаление файла не
+    пересекаются с его записью. Файл, записанный недавно, остается до
+    повторной очистки через BLOB_GC_DELAY секунд."""
+
+    kept = 0
+
+    try:
+        with unit_of_work(session_factory) as session:
+            for blob_name in session.scalars(unused_blobs_query()).all():
+                if remove_blob(blob_name, min_age=BLOB_GC_DELAY):
+                    remove_blob_entry(blob_name, session)
+
+                else:
+                    kept += 1
+
+    except Exception as e:
+        print(f"Error when trying to remove unused images: {e}")
+        return
+
+    if kept:
+        remove_unused_blobs.apply_async(countdown=BLOB_GC_DELAY)
+
+
+def schedule_uploads_cleanup():
+    """Ставит задачу на удаление устаревших загрузок, если она ещё не
+    поставлена. Пока изображения загружаются, очистка выполняется раз в
+    UPLOAD_TTL секунд."""
+
+    # Очистка не критична для загрузки, поэтому ошибки только логируются
+    try:
+        # Флаг снимается по таймауту, если задача была потеряна брокером
+        if redis_client.set(UPLOADS_CLEANUP_KEY, 1, nx=True, ex=2 * UPLOAD_TTL):
+
+            try:
+                clean_uploads.apply_async(countdown=UPLOAD_TTL)
+
+            except Exception:
+                redis_client.delete(UPLOADS_CLEANUP_KEY)
+                raise
+
+    except Exception as e:
+        print(f"Error when trying to schedule the uploads cleanup: {e}")
+
+
+@celery.task(queue="queue_test")
+def clean_uploads():
+    """Фоновая задача на удаление загрузок, не использованных за UPLOAD_TTL
+    секунд. Если остались более новые загрузки, задача ставится повторно."""
+
+    # Загрузки после этого момента поставят новую задачу
+    redis_client.delete(UPLOADS_CLEANUP_KEY)
+
+    try:
+        kept = remove_stale_uploads()
+
+    except Exception as e:
+        print(f"Error when trying to remove stale uploads: {e}")
+        return
+
+    if kept:
+        schedule_uploads_cleanup()
+
+
+@celery.task(queue="queue_test")
+def prewarm_collection_metadata(telegram_id: str | int):
+    """Фоновая задача на загрузку метаданных коллекции автора в Redis перед
+    массовым минтом. Возвращает количество загруженных документов."""
+
+    try:
+        with unit_of_work(session_factory) as session:
+            author = author_by_tg_id(telegram_id=telegram_id, session=session)
+
+            if author is None:
+                print(f"Author with id {telegram_id} was not found")
+                return 0
+
+            prefix = collection_metadata_prefix(author.collection_name, telegram_id)
+
+            # Поколения читаются до документов, чтобы не вернуть в кэш
+            # документ, перезаписанный во время загрузки
+            generations = metadata_generations(metadata_paths_by_prefix(prefix, session))
+            documents = metadata_by_prefix(prefix, session)
+
+        payloads = {path: msgspec.json.encode(document) for path, document in documents.items()}
+        return prewarm_metadata(payloads, generations)
+
+    except Exception as e:
+        print(f"Error when trying to prewarm the metadata of the author {telegram_id}: {e}")
+        return 0
+
+
+def record_last_enter(telegram_id: str | int):
+    """Отмечает вход пользователя без записи в БД. Накопленные отметки
+    записываются задачей flush_last_enters раз в LAST_ENTER_FLUSH_INTERVAL
+    секунд."""
+
+    # Отметка не критична для запроса, поэтому ошибки только логируются
+    try:
+        if touch_user(telegram_id):
+
+            try:
+                flush_last_enters.apply_async(countdown=LAST_ENTER_FLUSH_INTERVAL)
+
+            except Exception:
+                redis_client.delete(LAST_ENTER_FLUSH_KEY)
+                raise
+
+    except Exception as e:
+        print(f"Error when trying to record the last enter of the user {telegram_id}: {e}")
+
+
+@celery.task(queue="queue_test")
+def flush_last_enters():
+    """Фоновая задача на запись накопленного времени последнего входа
+    пользователей в БД."""
+
+    # Отметки, пришедшие после этого момента, поставят новую задачу
+    redis_client.delete(LAST_ENTER_FLUSH_KEY)
+
+    last_enters = pop_last_enters()
+
+    if not last_enters:
+        return
+
+    print(f"Flushing last enter of {len(last_enters)} users...")
+
+    try:
+        with unit_of_work(session_factory) as session:
+            update_last_enters(last_enters=last_enters, session=session)
+
+    except Exception as e:
+        print(f"Error when trying to write the last enter of {len(last_enters)} users: {e}")
@@ -0,0 +1,191 @@
+from sqlalchemy import select
+
+from .db import Event, Author, Subscriber, Transaction
+from .db import Telegram_User, is_participant_query
+from .db import add_participation_query, upsert_tg_user_query
+from .db import release_event_nft_query, visited_channels_query
+from .db import reserve_event_nft_query, upsert_subscriber_query
+from .db import ensure_subscriber_query, event_participants_query
+from .db import remove_participation_query, event_participants_cnt_query
+from .db import assign_nft_seed_query, record_visited_channel_query
+from .db import image_reference_query, upsert_image_reference_query
+from .db import acquire_blob_query, release_blob_query
+from .db import register_blob_query
+from .db import Metadata_Document, save_metadata_query
+from .db import add_metadata_query
+
+# Асинхронные аналоги запросов из db.py для AsyncSession. Сложные запросы
+# собираются теми же функциями *_query, что и в синхронной версии.
+
+
+async def add_database_entries(entries, session):
+    """Добавляет записи в текущую транзакцию и получает их сгенерированные id.
+
+    Транзакция не фиксируется: commit выполняется один раз в конце запроса."""
+
+    if not isinstance(entries, list):
+        entries = [entries]
+
+    session.add_all(entries)
+    await session.flush()
+
+
+async def author_by_tg_id(telegram_id: str | int, session):
+    return await session.get(Author, int(telegram_id))
+
+
+async def subcriber_by_tg_id(telegram_id: str | int, session):
+    return await session.get(Subscriber, int(telegram_id))
+
+
+async def ensure_subscriber(telegram_id: str | int, session):
+    """Создает запись подписчика, если её ещё нет."""
+
+    await session.execute(ensure_subscriber_query(telegram_id))
+
+
+async def add_participation(telegram_id: str | int, event_id: int, ticket_id: str | None, session):
+    """Записывает участие пользователя в существующем событии по заявке
+    ticket_id.
+
+    Возвращает False, если событие не найдено или пользователь уже участвовал
+    в нем."""
+
+    result = await session.execute(add_participation_query(telegram_id, event_id, ticket_id))
+    return result.first() is not None
+
+
+async def remove_participation(telegram_id: str | int, event_id: int, session):
+    await session.execute(remove_participation_query(telegram_id, event_id))
+
+
+async def is_participant(telegram_id: str | int, event_id: int, session):
+    result = await session.execute(is_participant_query(telegram_id, event_id))
+    return result.first() is not None
+
+
+async def event_participants(event_id: int, session):
+    """Возвращает список id участников события."""
+
+    return list(await session.scalars(event_participants_query(event_id)))
+
+
+async def event_participants_cnt(event_id: int, session):
+    return await session.scalar(event_participants_cnt_query(event_id))
+
+
+async def record_visited_channel(telegram_id: str | int, channel: str, session):
+    """Записывает посещение канала пользователем, повторы игнорируются."""
+
+    await session.execute(record_visited_channel_query(telegram_id, channel))
+
+
+async def visited_channels_by_tg_id(telegram_id: str | int, session):
+    """Возвращает список каналов, посещенных пользователем."""
+
+    return list(await session.scalars(visited_channels_query(telegram_id)))
+
+
+async def event_by_id(event_id: int, session):
+    return await session.get(Event, event_id)
+
+
+async def event_ids_by_tg_id(telegram_id: str | int, session):
+    """Возвращает список id событий, привязанных к id пользователя."""
+
+    return list(await session.scalars(select(Event.id).filter_by(telegram_id=int(telegram_id))))
+
+
+async def reserve_event_nft(event_id: int, session):
+    """Атомарно резервирует один NFT события одним условным UPDATE.
+
+    Возвращает данные события и коллекции автора, необходимые для минта, либо
+    None, если событие не найдено или все NFT уже выданы."""
+
+    result = await session.execute(reserve_event_nft_query(event_id))
+    return result.first()
+
+
+async def assign_nft_seed(telegram_id: str | int, event_id: int, nft_seed: int, nft_number: int, session):
+    """Закрепляет за участником генеративного события комбинацию слоев и
+    номер NFT. Повтор комбинации в событии запрещен уникальным индексом."""
+
+    await session.execute(assign_nft_seed_query(telegram_id, event_id, nft_seed, nft_number))
+
+
+async def release_event_nft(event_id: int, session):
+    """Возвращает зарезервированный NFT в остаток события."""
+
+    await session.execute(release_event_nft_query(event_id))
+
+
+async def register_blob(blob_name: str, session):
+    """Создает строку файла хранилища без ссылок, если ее еще нет. Фиксируется
+    до записи файла, чтобы файл, ссылка на который не была записана, удалила
+    очистка."""
+
+    await session.execute(register_blob_query(blob_name))
+
+
+async def set_image_reference(owner: str, blob_name: str, session):
+    """Направляет ссылку owner на файл хранилища blob_name и пересчитывает
+    ссылки на новый и прежний файлы. Строка нового файла остается
+    заблокированной до конца транзакции. Возвращает имя прежнего файла, если
+    на него больше нет ссылок, иначе None."""
+
+    previous = await session.scalar(image_reference_query(owner))
+
+    if previous == blob_name:
+        return None
+
+    await session.execute(acquire_blob_query(blob_name))
+    await session.execute(upsert_image_reference_query(owner, blob_name))
+
+    if previous is not None and await session.scalar(release_blob_query(previous)) <= 0:
+        return previous
+
+    return None
+
+
+async def metadata_by_path(path: str, session):
+    return await session.get(Metadata_Document, path)
+
+
+async def save_metadata(path: str, document: dict, session):
+    """Записывает документ метаданных или заменяет его новой версией в
+    текущей транзакции."""
+
+    await session.execute(save_metadata_query(path, document))
+
+
+async def add_metadata(path: str, document: dict, session):
+    """Записывает документ метаданных, если его еще нет. Возвращает True,
+    если документ записан."""
+
+    return await session.scalar(add_metadata_query(path, document)) is not None
+
+
+async def transaction_by_id(transaction_id: int, session):
+    return await session.get(Transaction, transaction_id)
+
+
+async def tg_user_by_id(telegram_id: str | int, session):
+    return await session.get(Telegram_User, int(telegram_id))
+
+
+async def upsert_tg_user(telegram_id: str | int, username: str, session):
+    """Создает пользователя телеграма или обновляет его имя одним запросом.
+
+    Возвращает False, если запись уже была актуальной и не изменялась."""
+
+    result = await session.execute(upsert_tg_user_query(telegram_id, username))
+    return result.first() is not None
+
+
+async def upsert_subscriber(telegram_id: str | int, username: str, session):
+    """Создает пользователя телеграма и подписчика одним запросом.
+
+    Возвращает False, если запись пользователя уже была актуальной и не
+    изменялась."""
+
+    return await session.scalar(upsert_subscriber_query(telegram_id, username)) > 0
@@ -0,0 +1,84 @@
+import re
+from time import time
+from os.path import dirname
+
+from .path import get_blob_key
+from .storage import storage
+
+# Хранилище изображений по содержимому.
+#
+# Файл называется SHA-256 содержимого с расширением формата и лежит в
+# хранилище файлов по ключу get_blob_key. Одинаковые изображения хранятся
+# один раз, а содержимое по адресу не меняется, поэтому адрес кэшируется без
+# проверки. Рядом лежат уменьшенные варианты изображения
+# (<хэш>.<вариант>.<расширение>).
+#
+# Ссылки на файлы (события и документы метаданных) учитываются в БД, в таблицах
+# image_blobs и image_references. Файл без ссылок удаляет фоновая задача.
+#
+# Строка image_blobs создается отдельной транзакцией до записи файла, а сам
+# файл записывается только под блокировкой этой строки, которую берет запись
+# ссылки. Очистка удаляет файл под той же блокировкой, поэтому не может
+# удалить файл, на который прямо сейчас записывается ссылка, а файл,
+# оставшийся после неудачной транзакции, удаляется как файл без ссылок.
+BLOB_NAME_PATTERN = re.compile(r"([0-9a-f]{64})(\.[a-z]+)?\.[a-z0-9]+")
+
+
+def get_blob_name(digest: str, extension: str):
+    return f"{digest}.{extension.lower()}"
+
+
+def put_blob_upload(upload_key: str, blob_name: str):
+    """Копирует загрузку из хранилища файлов в хранилище по содержимому, если
+    такого содержимого еще нет. Загрузка остается, чтобы запрос можно было
+    повторить, если ссылка на файл не будет записана."""
+
+    blob_key = get_blob_key(blob_name)
+
+    if not storage.touch(blob_key):
+        storage.copy(upload_key, blob_key)
+
+
+def put_blob_bytes(data: bytes, blob_name: str):
+    """Сохраняет байты в хранилище, если такого содержимого еще нет.
+
+    Время записи сохраненного файла обновляется, чтобы его не удалила
+    очистка, пока на него записывается новая ссылка."""
+
+    blob_key = get_blob_key(blob_name)
+
+    if not storage.touch(blob_key):
+        storage.put(blob_key, data)
+
+
+def read_blob(blob_name: str):
+    return storage.get(get_blob_key(blob_name))
+
+
+def remove_blob(blob_name: str, min_age: float = 0):
+    """Удаляет файл хранилища и его варианты, если файл не изменялся min_age
+    секунд. Возвращает False, если файл слишком новый.
+
+    Вызывается под блокировкой строки image_blobs файла: иначе файл может
+    быть записан заново между проверкой и удалением."""
+
+    blob_key = get_blob_key(blob_name)
+    mtime = storage.stat(blob_key)
+
+    if mtime is not None and time() - mtime < min_age:
+        return False
+
+    digest = BLOB_NAME_PATTERN.fullmatch(blob_name)[1]
+
+    for key, _ in storage.list(f"{dirname(blob_key)}/{digest}."):
+        storage.delete(key)
+
+    return True
+
+
+def event_image_owner(event_id: int):
+    return f"event:{event_id}"
+
+
+def metadata_image_owner(metadata_path: str):
+    return f"metadata:{metadata_path}"
@@ -0,0 +1,279 @@
+import threading
+from time import monotonic
+from collections import OrderedDict
+
+import msgspec
+
+from .. import redis_client
+from ..config import INFO_CACHE_TTL, METADATA_CACHE_TTL
+from ..config import METADATA_MEMORY_ENTRIES, METADATA_MEMORY_TTL
+from ..schemas import Event_Info, Author_Info
+
+# Кэш ответов event_info и author_info со сквозным чтением.
+#
+# Запись хранится в хэше: payload - сериализованные данные, minted - счетчик
+# выпущенных NFT события. Счетчик меняется атомарно отдельно от payload,
+# поэтому частые выпуски NFT не сбрасывают кэш.
+#
+# Каждый ключ имеет поколение, которое увеличивается при сбросе. Запись из БД
+# сохраняется, только если поколение не изменилось с момента промаха, иначе
+# запрос, прочитавший БД до изменения, вернул бы в кэш устаревшие данные.
+
+# Метаданные коллекций и NFT кэшируются так же, но без счетчика, и
+# дополнительно в LRU процесса: всплеск запросов маркетплейсов после минта
+# обслуживается из памяти. Запись LRU живет METADATA_MEMORY_TTL секунд,
+# потому что сброс кэша очищает LRU только текущего процесса.
+
+# Версия формата записей. При изменении формата старые записи не читаются
+CACHE_VERSION = 3
+
+_event_info_decoder = msgspec.json.Decoder(Event_Info)
+_author_info_decoder = msgspec.json.Decoder(Author_Info)
+
+# Сохранение записи, если поколение ключа не изменилось
+# KEYS: запись, поколение
+# ARGV: ожидаемое поколение, TTL, поля записи
+_fill_entry = redis_client.register_script(
+    """
+    if (redis.call("GET", KEYS[2]) or "0") ~= ARGV[1] then
+        return 0
+    end
+
+    redis.call("DEL", KEYS[1])
+    redis.call("HSET", KEYS[1], unpack(ARGV, 3))
+    redis.call("EXPIRE", KEYS[1], ARGV[2])
+
+    return 1
+    """
+)
+
+# Изменение счетчика выпущенных NFT у существующей записи. Если записи нет,
+# увеличивается поколение: запрос, прочитавший БД до выпуска, не сохранит
+# устаревший счетчик
+# KEYS: запись, поколение
+# ARGV: изменение, TTL поколения
+_add_minted = redis_client.register_script(
+    """
+    if redis.call("HEXISTS", KEYS[1], "payload") == 0 then
+        redis.call("INCR", KEYS[2])
+        redis.call("EXPIRE", KEYS[2], ARGV[2])
+        return nil
+    end
+
+    return redis.call("HINCRBY", KEYS[1], "minted", ARGV[1])
+    """
+)
+
+
+class _MemoryCache:
+    """LRU процесса с ограниченным временем жизни записей."""
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+
+        self._entries: OrderedDict[str, tuple[float, bytes]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is None:
+                return None
+
+            if monotonic() - entry[0] >= self.ttl:
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key: str, value: bytes):
+        with self._lock:
+            self._entries[key] = (monotonic(), value)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def discard(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+_metadata_memory = _MemoryCache(METADATA_MEMORY_ENTRIES, METADATA_MEMORY_TTL)
+
+
+def _event_key(event_id: int):
+    return f"cache:v{CACHE_VERSION}:event:{event_id}"
+
+
+def _author_key(telegram_id: int):
+    return f"cache:v{CACHE_VERSION}:author:{telegram_id}"
+
+
+def _metadata_key(path: str):
+    return f"cache:v{CACHE_VERSION}:metadata:{path}"
+
+
+def _generation_key(key: str):
+    return f"{key}:gen"
+
+
+def _read_entry(key: str):
+    """Возвращает поля записи (пустой словарь при промахе) и поколение ключа."""
+
+    pipe = redis_client.pipeline(transaction=False)
+
+    pipe.hgetall(key)
+    pipe.get(_generation_key(key))
+
+    entry, generation = pipe.execute()
+
+    return entry, generation or "0"
+
+
+def _fill_entry_fields(key: str, generation: str, fields: dict, ttl: int = INFO_CACHE_TTL):
+    mapping = [item for field_value in fields.items() for item in field_value]
+
+    return bool(_fill_entry(keys=[key, _generation_key(key)], args=[generation, ttl, *mapping]))
+
+
+def _invalidate_entry(key: str, ttl: int = INFO_CACHE_TTL):
+    pipe = redis_client.pipeline()
+
+    pipe.incr(_generation_key(key))
+    pipe.expire(_generation_key(key), ttl)
+    pipe.delete(key)
+
+    pipe.execute()
+
+
+def read_event_info(event_id: int):
+    """Возвращает данные события из кэша (None при промахе) и поколение,
+    которое нужно передать в write_event_info."""
+
+    entry, generation = _read_entry(_event_key(event_id))
+
+    if "payload" not in entry:
+        return None, generation
+
+    event_info = _event_info_decoder.decode(entry["payload"])
+    event_info.minted_nfts = int(entry["minted"])
+
+    return event_info, generation
+
+
+def write_event_info(event_id: int, event_info: Event_Info, generation: str):
+    """Сохраняет данные события, прочитанные из БД после промаха. Значение
+    minted_nfts внутри payload при чтении заменяется счетчиком minted."""
+
+    return _fill_entry_fields(
+        _event_key(event_id),
+        generation,
+        {"payload": msgspec.json.encode(event_info), "minted": event_info.minted_nfts},
+    )
+
+
+def add_event_minted(event_id: int, delta: int):
+    """Изменяет счетчик выпущенных NFT события в кэше, если запись есть,
+    иначе не дает сохранить запись, прочитанную из БД до изменения."""
+
+    key = _event_key(event_id)
+    _add_minted(keys=[key, _generation_key(key)], args=[delta, INFO_CACHE_TTL])
+
+
+def invalidate_event_info(event_id: int):
+    """Сбрасывает кэш события после изменения его данных."""
+
+    _invalidate_entry(_event_key(event_id))
+
+
+def read_author_info(telegram_id: int):
+    """Возвращает данные автора из кэша (None при промахе) и поколение,
+    которое нужно передать в write_author_info."""
+
+    entry, generation = _read_entry(_author_key(telegram_id))
+
+    if "payload" not in entry:
+        return None, generation
+
+    return _author_info_decoder.decode(entry["payload"]), generation
+
+
+def write_author_info(telegram_id: int, author_info: Author_Info, generation: str):
+    """Сохраняет данные автора, прочитанные из БД после промаха."""
+
+    return _fill_entry_fields(_author_key(telegram_id), generation, {"payload": msgspec.json.encode(author_info)})
+
+
+def invalidate_author_info(telegram_id: int):
+    """Сбрасывает кэш автора после изменения его данных."""
+
+    _invalidate_entry(_author_key(telegram_id))
+
+
+def read_metadata(path: str):
+    """Возвращает JSON метаданных из LRU процесса или Redis (None при
+    промахе) и поколение, которое нужно передать в write_metadata."""
+
+    payload = _metadata_memory.get(path)
+
+    if payload is not None:
+        return payload, None
+
+    entry, generation = _read_entry(_metadata_key(path))
+    payload = entry.get("payload")
+
+    if payload is not None:
+        payload = payload.encode()
+        _metadata_memory.put(path, payload)
+
+    return payload, generation
+
+
+def write_metadata(path: str, payload: bytes, generation: str):
+    """Сохраняет JSON метаданных, прочитанный из БД после промаха."""
+
+    if not _fill_entry_fields(_metadata_key(path), generation, {"payload": payload}, METADATA_CACHE_TTL):
+        return False
+
+    _metadata_memory.put(path, payload)
+
+    return True
+
+
+def metadata_generations(paths: list[str]):
+    """Возвращает поколения записей метаданных одним запросом. Их нужно
+    прочитать до чтения документов из БД и передать в prewarm_metadata."""
+
+    pipe = redis_client.pipeline(transaction=False)
+
+    for path in paths:
+        pipe.get(_generation_key(_metadata_key(path)))
+
+    return {path: generation or "0" for path, generation in zip(paths, pipe.execute())}
+
+
+def prewarm_metadata(payloads: dict[str, bytes], generations: dict[str, str]):
+    """Заполняет Redis метаданными {путь: JSON} пачкой запросов. Записи,
+    сброшенные после чтения поколений, не перезаписываются. Возвращает
+    количество сохраненных записей."""
+
+    pipe = redis_client.pipeline(transaction=False)
+
+    for path, payload in payloads.items():
+        key = _metadata_key(path)
+        args = [generations.get(path, "0"), METADATA_CACHE_TTL, "payload", payload]
+
+        _fill_entry(keys=[key, _generation_key(key)], args=args, client=pipe)
+
+    return sum(pipe.execute())
+
+
+def invalidate_metadata(path: str):
+    """Сбрасывает кэш метаданных после их перезаписи."""
+
+    _invalidate_entry(_metadata_key(path), METADATA_CACHE_TTL)
+    _metadata_memory.discard(path)
@@ -1,15 +1,27 @@
-import requests
+import asyncio
+
+import httpx
 from bs4 import BeautifulSoup
 
 from .convert import username_to_link
+from ..config import HTTP_TIMEOUT
 
 
-def get_channel_avatar(url: str):
+async def get_channel_avatar(url: str):
     """Возвращает ссылку на автар телеграм-канала."""
 
-    response = requests.get(username_to_link(url))
+    async with httpx.AsyncClient(timeout=HTTP_TIMEOUT, follow_redirects=True) as client:
+        response = await client.get(username_to_link(url))
+
+    # Разбор страницы выполняется в отдельном потоке, чтобы не блокировать
+    # цикл событий
+    return await asyncio.to_thread(find_avatar, response.text)
+
+
+def find_avatar(html: str):
+    """Находит ссылку на аватар на странице телеграм-канала."""
 
-    soup = BeautifulSoup(response.text, "html.parser")
+    soup = BeautifulSoup(html, "html.parser")
 
     avatar_tag = soup.find("img", class_="tgme_page_photo_image")
 
@@ -0,0 +1,182 @@
+import json
+
+from . import return_codes, tasks_statuses
+from .tickets import ticket_key
+from .. import redis_client
+from ..config import CLAIM_STATE_TTL, TICKET_TTL
+
+CLAIMS_QUEUE_KEY = "claims:queue"
+CLAIMS_PROCESSING_KEY = "claims:processing"
+CLAIMS_FLUSH_KEY = "claims:flush"
+CLAIMS_FLUSH_LOCK_KEY = "claims:flush:lock"
+
+# Атомарный прием заявки: проверка повторного участия и остатка NFT,
+# резервирование и постановка заявки в очередь на запись в БД. Тикет
+# создается до постановки в очередь, чтобы запись заявки не могла изменить
+# его раньше.
+# KEYS: остаток NFT события, множество получивших, очередь заявок, тикет
+# ARGV: telegram_id, заявка в json, состояние тикета, время жизни тикета
+_admit_claim = redis_client.register_script(
+    """
+    local left = redis.call("GET", KEYS[1])
+
+    if not left then
+        return 0
+    end
+
+    if redis.call("SISMEMBER", KEYS[2], ARGV[1]) == 1 then
+        return 2
+    end
+
+    if tonumber(left) <= 0 then
+        return 3
+    end
+
+    redis.call("DECR", KEYS[1])
+    redis.call("SADD", KEYS[2], ARGV[1])
+    redis.call("HSET", KEYS[4], "state", ARGV[3])
+    redis.call("EXPIRE", KEYS[4], ARGV[4])
+    redis.call("RPUSH", KEYS[3], ARGV[2])
+
+    return 1
+    """
+)
+
+# Возврат зарезервированного NFT, если заявку не удалось выполнить
+# KEYS: остаток NFT события, множество получивших
+# ARGV: telegram_id
+_release_claim = redis_client.register_script(
+    """
+    if redis.call("SREM", KEYS[2], ARGV[1]) == 1 and redis.call("EXISTS", KEYS[1]) == 1 then
+        redis.call("INCR", KEYS[1])
+    end
+    """
+)
+
+# Перенос пачки заявок из очереди в список обрабатываемых. Заявки остаются
+# в нем до подтверждения записи в БД
+# KEYS: очередь заявок, список обрабатываемых заявок
+# ARGV: размер пачки
+_pop_claims = redis_client.register_script(
+    """
+    local claims = redis.call("LRANGE", KEYS[1], 0, tonumber(ARGV[1]) - 1)
+
+    if #claims > 0 then
+        redis.call("RPUSH", KEYS[2], unpack(claims))
+        redis.call("LTRIM", KEYS[1], #claims, -1)
+    end
+
+    return claims
+    """
+)
+
+# Возврат неподтвержденных заявок в начало очереди в прежнем порядке
+# KEYS: очередь заявок, список обрабатываемых заявок
+_requeue_claims = redis_client.register_script(
+    """
+    local claims = redis.call("LRANGE", KEYS[2], 0, -1)
+
+    for i = #claims, 1, -1 do
+        redis.call("LPUSH", KEYS[1], claims[i])
+    end
+
+    redis.call("DEL", KEYS[2])
+
+    return #claims
+    """
+)
+
+_ADMISSION_RESULTS = {
+    0: None,
+    1: return_codes.SUCCESS,
+    2: return_codes.REPEAT_USER,
+    3: return_codes.EVENT_NFTS_LEFT,
+}
+
+
+def _left_key(event_id: int):
+    return f"claims:{event_id}:left"
+
+
+def _users_key(event_id: int):
+    return f"claims:{event_id}:users"
+
+
+def admit_claim(event_id: int, telegram_id: int, wallet_address: str, ticket_id: str):
+    """Принимает заявку на NFT события без обращения к БД и создает тикет
+    заявки в состоянии queued.
+
+    Возвращает код ответа, либо None, если состояние события ещё не загружено
+    в Redis."""
+
+    claim = json.dumps(
+        {
+            "ticket_id": ticket_id,
+            "event_id": event_id,
+            "telegram_id": telegram_id,
+            "wallet_address": wallet_address,
+        }
+    )
+
+    result = _admit_claim(
+        keys=[_left_key(event_id), _users_key(event_id), CLAIMS_QUEUE_KEY, ticket_key(ticket_id)],
+        args=[telegram_id, claim, tasks_statuses.QUEUED, TICKET_TTL],
+    )
+
+    return _ADMISSION_RESULTS[int(result)]
+
+
+def load_claim_state(event_id: int, nfts_left: int, participants: list[int]):
+    """Загружает в Redis остаток NFT и получивших NFT пользователей события.
+
+    Участники записываются до остатка, чтобы заявка, пришедшая между двумя
+    командами, не прошла проверку на повторное участие."""
+
+    pipe = redis_client.pipeline()
+
+    if participants:
+        pipe.sadd(_users_key(event_id), *participants)
+
+    pipe.expire(_users_key(event_id), CLAIM_STATE_TTL)
+    pipe.set(_left_key(event_id), max(nfts_left, 0), ex=CLAIM_STATE_TTL, nx=True)
+
+    pipe.execute()
+
+
+def release_claim(event_id: int, telegram_id: int):
+    _release_claim(keys=[_left_key(event_id), _users_key(event_id)], args=[telegram_id])
+
+
+def close_claims(event_id: int):
+    """Обнуляет остаток NFT события, если БД сообщила, что они закончились."""
+
+    redis_client.set(_left_key(event_id), 0, xx=True, keepttl=True)
+
+
+def pop_claims(count: int):
+    """Переносит из очереди в список обрабатываемых до count принятых заявок
+    и возвращает их. После записи в БД заявки подтверждаются ack_claims."""
+
+    claims = _pop_claims(keys=[CLAIMS_QUEUE_KEY, CLAIMS_PROCESSING_KEY], args=[count])
+
+    return [json.loads(claim) for claim in claims]
+
+
+def ack_claims():
+    """Удаляет записанные в БД заявки из списка обрабатываемых."""
+
+    redis_client.delete(CLAIMS_PROCESSING_KEY)
+
+
+def requeue_claims():
+    """Возвращает в очередь заявки, обработка которых была прервана.
+    Возвращает их количество."""
+
+    return _requeue_claims(keys=[CLAIMS_QUEUE_KEY, CLAIMS_PROCESSING_KEY])
+
+
+def flush_lock(timeout: int):
+    """Блокировка записи заявок: список обрабатываемых заявок общий, поэтому
+    запись выполняет одна задача."""
+
+    return redis_client.lock(CLAIMS_FLUSH_LOCK_KEY, timeout=timeout, blocking=False)
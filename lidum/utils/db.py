@@ -1,6 +1,8 @@
 from datetime import datetime, timezone
+from contextlib import contextmanager
 
-from sqlalchemy.dialects.postgresql import JSON
+from sqlalchemy import DateTime, BigInteger, Text, and_, func, delete, column, select, update, values, literal
+from sqlalchemy.dialects.postgresql import JSON, insert
 
 from . import tasks_statuses
 from .. import db
@@ -8,15 +10,54 @@ from .hash import sha256_hash
 from .convert import address_to_raw, address_to_friendly
 
 
+@contextmanager
+def unit_of_work(session_factory):
+    """Открывает сессию с одной транзакцией на весь блок: commit при успешном
+    завершении, rollback при исключении."""
+
+    session = session_factory()
+
+    try:
+        yield session
+        session.commit()
+
+    except Exception:
+        session.rollback()
+        raise
+
+    finally:
+        session.close()
+
+
 def add_database_entries(entries, session):
-    "Загружает записи в базу данных"
+    """Добавляет записи в текущую транзакцию и получает их сгенерированные id.
+
+    Транзакция не фиксируется: commit выполняется один раз в конце запроса."""
 
     if not isinstance(entries, list):
         entries = [entries]
 
-    for entry in entries:
-        session.add(entry)
-        session.commit()
+    session.add_all(entries)
+    session.flush()
+
+
+def bulk_insert(model, rows: list[dict], session, skip_existing: bool = False):
+    """Вставляет список записей одним INSERT ... VALUES и возвращает их
+    первичные ключи. С skip_existing уже существующие записи пропускаются и
+    в результат не попадают."""
+
+    if not rows:
+        return []
+
+    primary_key = model.__table__.primary_key.columns
+    query = insert(model).values(rows)
+
+    if skip_existing:
+        query = query.on_conflict_do_nothing()
+
+    query = query.returning(*primary_key)
+
+    return session.execute(query).all()
 
 
 def author_by_tg_id(telegram_id: str | int, session):
@@ -27,19 +68,314 @@ def subcriber_by_tg_id(telegram_id: str | int, session):
     return session.query(Subscriber).filter_by(telegram_id=int(telegram_id)).first()
 
 
+def ensure_subscriber_query(telegram_id: str | int):
+    return insert(Subscriber).values(telegram_id=int(telegram_id)).on_conflict_do_nothing()
+
+
+def ensure_subscriber(telegram_id: str | int, session):
+    """Создает запись подписчика, если её ещё нет."""
+
+    session.execute(ensure_subscriber_query(telegram_id))
+
+
+def add_participation_query(telegram_id: str | int, event_id: int, ticket_id: str | None):
+    event = select(literal(int(telegram_id)), Event.id, literal(ticket_id, Text)).where(Event.id == event_id)
+
+    return (
+        insert(Participation)
+        .from_select(["telegram_id", "event_id", "ticket_id"], event)
+        .on_conflict_do_nothing()
+        .returning(Participation.event_id)
+    )
+
+
+def add_participation(telegram_id: str | int, event_id: int, ticket_id: str | None, session):
+    """Записывает участие пользователя в существующем событии по заявке
+    ticket_id.
+
+    Возвращает False, если событие не найдено или пользователь уже участвовал
+    в нем."""
+
+    return session.execute(add_participation_query(telegram_id, event_id, ticket_id)).first() is not None
+
+
+def claimed_nft_query(telegram_id: str | int, event_id: int):
+    """Данные для минта NFT по уже записанному участию: те же поля, что
+    возвращает reserve_event_nft_query, с номером NFT участника вместо
+    generated_nfts, а также заявка и комбинация слоев участия."""
+
+    return (
+        select(
+            Event.telegram_id,
+            Event.image_name,
+            Event.event_description,
+            Event.generative,
+            Participation.nft_number.label("generated_nfts"),
+            Event.layers_size,
+            Event.layers_version,
+            Author.collection_name,
+            Author._collection_address.label("collection_address"),
+            Author._is_testnet.label("is_testnet"),
+            Participation.ticket_id,
+            Participation.nft_seed,
+        )
+        .join(Event, Event.id == Participation.event_id)
+        .join(Author, Author.telegram_id == Event.telegram_id)
+        .where(Participation.telegram_id == int(telegram_id), Participation.event_id == event_id)
+    )
+
+
+def claimed_nft(telegram_id: str | int, event_id: int, session):
+    """Возвращает данные записанного участия для повторной постановки минта
+    либо None."""
+
+    return session.execute(claimed_nft_query(telegram_id, event_id)).first()
+
+
+def remove_participation_query(telegram_id: str | int, event_id: int):
+    return delete(Participation).where(
+        Participation.telegram_id == int(telegram_id),
+        Participation.event_id == event_id,
+    )
+
+
+def remove_participation(telegram_id: str | int, event_id: int, session):
+    session.execute(remove_participation_query(telegram_id, event_id))
+
+
+def is_participant_query(telegram_id: str | int, event_id: int):
+    return select(Participation.event_id).filter_by(telegram_id=int(telegram_id), event_id=event_id)
+
+
+def is_participant(telegram_id: str | int, event_id: int, session):
+    return session.execute(is_participant_query(telegram_id, event_id)).first() is not None
+
+
+def event_participants_query(event_id: int):
+    return select(Participation.telegram_id).filter_by(event_id=event_id).order_by(Participation.created_at)
+
+
+def event_participants(event_id: int, session):
+    """Возвращает список id участников события."""
+
+    return list(session.execute(event_participants_query(event_id)).scalars())
+
+
+def event_participants_cnt_query(event_id: int):
+    return select(func.count()).select_from(Participation).filter_by(event_id=event_id)
+
+
+def event_participants_cnt(event_id: int, session):
+    return session.execute(event_participants_cnt_query(event_id)).scalar()
+
+
+def record_visited_channel_query(telegram_id: str | int, channel: str):
+    return insert(Channel_Visit).values(telegram_id=int(telegram_id), channel=channel).on_conflict_do_nothing()
+
+
+def record_visited_channel(telegram_id: str | int, channel: str, session):
+    """Записывает посещение канала пользователем, повторы игнорируются."""
+
+    session.execute(record_visited_channel_query(telegram_id, channel))
+
+
+def visited_channels_query(telegram_id: str | int):
+    return select(Channel_Visit.channel).filter_by(telegram_id=int(telegram_id)).order_by(Channel_Visit.created_at)
+
+
+def visited_channels_by_tg_id(telegram_id: str | int, session):
+    """Возвращает список каналов, посещенных пользователем."""
+
+    return list(session.execute(visited_channels_query(telegram_id)).scalars())
+
+
 def event_by_id(event_id: int, session):
     return session.query(Event).filter_by(id=event_id).first()
 
 
+def event_ids_by_tg_id_query(telegram_id: str | int):
+    return select(Event.id).filter_by(telegram_id=int(telegram_id))
+
+
 def event_ids_by_tg_id(telegram_id: str | int, session):
     """Возвращает список id событий, привязанных к id пользователя."""
 
-    events = session.query(Event).filter_by(telegram_id=int(telegram_id)).all()
+    return list(session.execute(event_ids_by_tg_id_query(telegram_id)).scalars())
 
-    if events is None:
-        return []
 
-    return [event.id for event in events]
+def reserve_event_nft_query(event_id: int):
+    return (
+        update(Event)
+        .where(
+            Event.id == event_id,
+            Event.minted_nfts < Event.nfts_cnt,
+            Author.telegram_id == Event.telegram_id,
+        )
+        .values(minted_nfts=Event.minted_nfts + 1, generated_nfts=Event.generated_nfts + 1)
+        .returning(
+            Event.telegram_id,
+            Event.image_name,
+            Event.event_description,
+            Event.generative,
+            Event.generated_nfts,
+            Event.layers_size,
+            Event.layers_version,
+            Author.collection_name,
+            Author._collection_address.label("collection_address"),
+            Author._is_testnet.label("is_testnet"),
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+def reserve_event_nft(event_id: int, session):
+    """Атомарно резервирует один NFT события одним условным UPDATE.
+
+    Возвращает данные события и коллекции автора, необходимые для минта, либо
+    None, если событие не найдено или все NFT уже выданы. generated_nfts -
+    порядковый номер резервирования, он не уменьшается при возврате NFT и
+    поэтому не повторяется."""
+
+    return session.execute(reserve_event_nft_query(event_id)).first()
+
+
+def freeze_event_layers_query(event_id: int, layers_size: int, layers_version: str):
+    return (
+        update(Event)
+        .where(Event.id == event_id)
+        .values(
+            layers_size=func.coalesce(Event.layers_size, layers_size),
+            layers_version=func.coalesce(Event.layers_version, layers_version),
+        )
+        .returning(Event.layers_size, Event.layers_version)
+    )
+
+
+def freeze_event_layers(event_id: int, layers_size: int, layers_version: str, session):
+    """Закрепляет за генеративным событием, созданным до сохранения дерева
+    слоев, текущее дерево. Возвращает закрепленные число комбинаций и
+    версию."""
+
+    return session.execute(freeze_event_layers_query(event_id, layers_size, layers_version)).one()
+
+
+def set_image_variants_query(event_id: int, image_blob: str, image_variants: dict):
+    return (
+        update(Event)
+        .where(Event.id == event_id, Event.image_blob == image_blob)
+        .values(image_variants=image_variants)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def set_image_variants(event_id: int, image_blob: str, image_variants: dict, session):
+    """Записывает варианты изображения события, если изображение не было
+    заменено, пока они создавались."""
+
+    session.execute(set_image_variants_query(event_id, image_blob, image_variants))
+
+
+def image_reference_query(owner: str):
+    return select(Image_Reference.blob_name).where(Image_Reference.owner == owner).with_for_update()
+
+
+def register_blob_query(blob_name: str):
+    query = insert(Image_Blob).values(name=blob_name, refs=0)
+    return query.on_conflict_do_nothing(index_elements=[Image_Blob.name])
+
+
+def acquire_blob_query(blob_name: str):
+    query = insert(Image_Blob).values(name=blob_name, refs=1)
+    return query.on_conflict_do_update(index_elements=[Image_Blob.name], set_={"refs": Image_Blob.refs + 1})
+
+
+def release_blob_query(blob_name: str):
+    return (
+        update(Image_Blob)
+        .where(Image_Blob.name == blob_name)
+        .values(refs=Image_Blob.refs - 1)
+        .returning(Image_Blob.refs)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def upsert_image_reference_query(owner: str, blob_name: str):
+    query = insert(Image_Reference).values(owner=owner, blob_name=blob_name)
+    return query.on_conflict_do_update(index_elements=[Image_Reference.owner], set_={"blob_name": blob_name})
+
+
+def unused_blobs_query():
+    """Файлы хранилища без ссылок. Заблокированные строки пропускаются: на
+    них прямо сейчас записывается новая ссылка."""
+
+    return select(Image_Blob.name).where(Image_Blob.refs <= 0).with_for_update(skip_locked=True)
+
+
+def remove_blob_entry(blob_name: str, session):
+    session.execute(delete(Image_Blob).where(Image_Blob.name == blob_name, Image_Blob.refs <= 0))
+
+
+def save_metadata_query(path: str, document: dict):
+    query = insert(Metadata_Document).values(path=path, document=document, version=1)
+    return query.on_conflict_do_update(
+        index_elements=[Metadata_Document.path],
+        set_={"document": document, "version": Metadata_Document.version + 1, "updated_at": func.now()},
+    )
+
+
+def add_metadata_query(path: str, document: dict):
+    query = insert(Metadata_Document).values(path=path, document=document, version=1)
+    return query.on_conflict_do_nothing(index_elements=[Metadata_Document.path]).returning(Metadata_Document.path)
+
+
+def save_metadata(path: str, document: dict, session):
+    """Записывает документ метаданных или заменяет его новой версией в
+    текущей транзакции."""
+
+    session.execute(save_metadata_query(path, document))
+
+
+def metadata_paths_by_prefix(prefix: str, session):
+    return list(session.scalars(select(Metadata_Document.path).where(Metadata_Document.path.startswith(prefix))))
+
+
+def metadata_by_prefix(prefix: str, session):
+    """Возвращает документы метаданных, пути которых начинаются с prefix, в
+    виде {путь: документ}."""
+
+    query = select(Metadata_Document.path, Metadata_Document.document).where(Metadata_Document.path.startswith(prefix))
+    return dict(session.execute(query).all())
+
+
+def assign_nft_seed_query(telegram_id: str | int, event_id: int, nft_seed: int, nft_number: int):
+    return (
+        update(Participation)
+        .where(Participation.telegram_id == int(telegram_id), Participation.event_id == event_id)
+        .values(nft_seed=nft_seed, nft_number=nft_number)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def assign_nft_seed(telegram_id: str | int, event_id: int, nft_seed: int, nft_number: int, session):
+    """Закрепляет за участником генеративного события комбинацию слоев и
+    номер NFT. Повтор комбинации в событии запрещен уникальным индексом."""
+
+    session.execute(assign_nft_seed_query(telegram_id, event_id, nft_seed, nft_number))
+
+
+def release_event_nft_query(event_id: int):
+    return (
+        update(Event)
+        .where(Event.id == event_id, Event.minted_nfts > 0)
+        .values(minted_nfts=Event.minted_nfts - 1)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def release_event_nft(event_id: int, session):
+    """Возвращает зарезервированный NFT в остаток события."""
+
+    session.execute(release_event_nft_query(event_id))
 
 
 def transaction_by_id(transaction_id: int, session):
@@ -61,6 +397,84 @@ def tg_user_by_id(telegram_id: str | int, session):
     return session.query(Telegram_User).filter_by(id=int(telegram_id)).first()
 
 
+def upsert_tg_user_query(telegram_id: str | int, username: str):
+    """INSERT ... ON CONFLICT DO UPDATE для пользователя телеграма. Существующая
+    запись обновляется только при смене имени пользователя, поэтому строка
+    возвращается только если запись действительно была изменена."""
+
+    query = insert(Telegram_User).values(
+        id=int(telegram_id),
+        username=username,
+        last_enter=datetime.now(timezone.utc),
+    )
+
+    query = query.on_conflict_do_update(
+        index_elements=[Telegram_User.id],
+        set_={
+            "username": query.excluded.username,
+            "last_enter": query.excluded.last_enter,
+        },
+        where=and_(
+            query.excluded.username.isnot(None),
+            Telegram_User.username.is_distinct_from(query.excluded.username),
+        ),
+    )
+
+    return query.returning(Telegram_User.id)
+
+
+def upsert_tg_user(telegram_id: str | int, username: str, session):
+    """Создает пользователя телеграма или обновляет его имя одним запросом.
+
+    Возвращает False, если запись уже была актуальной и не изменялась."""
+
+    return session.execute(upsert_tg_user_query(telegram_id, username)).first() is not None
+
+
+def upsert_subscriber_query(telegram_id: str | int, username: str):
+    """Пользователь телеграма и подписчик записываются в CTE одного запроса.
+    Запрос возвращает количество измененных записей пользователя."""
+
+    tg_user = upsert_tg_user_query(telegram_id, username).cte("tg_user")
+    subscriber = ensure_subscriber_query(telegram_id).returning(Subscriber.telegram_id).cte("subscriber")
+
+    return select(func.count()).select_from(tg_user).add_cte(subscriber)
+
+
+def upsert_subscriber(telegram_id: str | int, username: str, session):
+    """Создает пользователя телеграма и подписчика одним запросом.
+
+    Возвращает False, если запись пользователя уже была актуальной и не
+    изменялась."""
+
+    return session.execute(upsert_subscriber_query(telegram_id, username)).scalar() > 0
+
+
+def update_last_enters_query(last_enters: dict[int, datetime]):
+    rows = values(
+        column("id", BigInteger),
+        column("last_enter", DateTime),
+        name="last_enters",
+    ).data(list(last_enters.items()))
+
+    return (
+        update(Telegram_User)
+        .where(Telegram_User.id == rows.c.id, Telegram_User.last_enter < rows.c.last_enter)
+        .values(last_enter=rows.c.last_enter)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def update_last_enters(last_enters: dict[int, datetime], session):
+    """Записывает время последнего входа пользователей одним UPDATE ... FROM
+    (VALUES ...)."""
+
+    if not last_enters:
+        return
+
+    session.execute(update_last_enters_query(last_enters))
+
+
 def authors_tg_ids(session):
     """Возвращает список id авторов событий."""
 
@@ -107,13 +521,25 @@ class Event(db.Model):
     __tablename__ = "events"
 
     id = db.Column(db.BigInteger, primary_key=True, autoincrement=True)
-    telegram_id = db.Column(db.BigInteger, db.ForeignKey("authors.telegram_id"), nullable=False)
+    telegram_id = db.Column(db.BigInteger, db.ForeignKey("authors.telegram_id"), nullable=False, index=True)
     event_name = db.Column(db.String(64), nullable=False)
     event_description = db.Column(db.Text, nullable=False)
     transaction_id = db.Column("transaction_id", db.BigInteger, db.ForeignKey("transactions.id"), nullable=False)
     minted_nfts = db.Column(db.Integer, nullable=False, default=0)
     nfts_cnt = db.Column(db.Integer, nullable=False)
+    # Генеративное событие: каждый участник получает свою комбинацию слоев
+    generative = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
+    generated_nfts = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    # Число комбинаций и версия дерева слоев генеративного события, закрепленные
+    # при его создании. По ним выбираются и генерируются комбинации участников
+    layers_size = db.Column(db.Integer, nullable=True)
+    layers_version = db.Column(db.Text, nullable=True)
     image_name = db.Column(db.Text, nullable=False)
+    # Файл изображения в хранилище по содержимому. У событий, созданных до его
+    # появления, NULL: изображение лежит в директории коллекции
+    image_blob = db.Column(db.Text, db.ForeignKey("image_blobs.name"), nullable=True)
+    # Уменьшенные варианты изображения: {вариант: {расширение: имя файла}}
+    image_variants = db.Column(JSON, nullable=True)
     start_date = db.Column(db.String(16), nullable=False)
     end_date = db.Column(db.String(16), nullable=False)
     _password = db.Column("password", db.String(64), nullable=False)
@@ -134,20 +560,64 @@ class Subscriber(db.Model):
     __tablename__ = "subscribers"
 
     telegram_id = db.Column(db.BigInteger, db.ForeignKey("telegram_users.id"), primary_key=True)
-    visited_channels = db.Column(JSON, default=[])
-    participated_events = db.Column(JSON, default=[])
+
+
+class Participation(db.Model):
+    __tablename__ = "participations"
+
+    # Список участников события в порядке участия и их количество читаются
+    # только по индексу. Комбинации слоев генеративного события не повторяются
+    __table_args__ = (
+        db.Index("ix_participations_event_id_created_at", "event_id", "created_at"),
+        db.Index(
+            "ux_participations_event_id_nft_seed",
+            "event_id",
+            "nft_seed",
+            unique=True,
+            postgresql_where=db.text("nft_seed IS NOT NULL"),
+        ),
+    )
+
+    telegram_id = db.Column(db.BigInteger, db.ForeignKey("subscribers.telegram_id"), primary_key=True)
+    event_id = db.Column(db.BigInteger, db.ForeignKey("events.id"), primary_key=True)
+    created_at = db.Column(db.DateTime, server_default=func.now(), nullable=False)
+    # Комбинация слоев и номер NFT участника генеративного события
+    nft_seed = db.Column(db.Integer, nullable=True)
+    nft_number = db.Column(db.Integer, nullable=True)
+    # Заявка, по которой записано участие. По ней повторная запись пачки
+    # заявок отличается от повторного участия
+    ticket_id = db.Column(db.Text, nullable=True)
+
+
+class Channel_Visit(db.Model):
+    __tablename__ = "channel_visits"
+
+    telegram_id = db.Column(db.BigInteger, db.ForeignKey("subscribers.telegram_id"), primary_key=True)
+    channel = db.Column(db.Text, primary_key=True)
+    created_at = db.Column(db.DateTime, server_default=func.now(), nullable=False)
 
 
 class Transaction(db.Model):
     __tablename__ = "transactions"
 
+    # Хэш есть только у оплаченных транзакций, а проверка обрабатывает только
+    # незавершенные, поэтому оба индекса частичные
+    __table_args__ = (
+        db.Index("ix_transactions_hash", "hash", postgresql_where=db.text("hash IS NOT NULL")),
+        db.Index(
+            "ix_transactions_unfinished_created_at",
+            "created_at",
+            postgresql_where=db.text(f"status IN ('{tasks_statuses.NEW}', '{tasks_statuses.PENDING}')"),
+        ),
+    )
+
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     hash = db.Column(db.String(64))
     _source_address = db.Column("source_address", db.String(66), nullable=False)
     _destination_address = db.Column("destination_address", db.String(66), nullable=False)
     amount = db.Column(db.Float, nullable=False)
     status = db.Column(db.Text, nullable=False, default=tasks_statuses.NEW)
-    created_at = db.Column(db.DateTime, default=datetime.now(timezone.utc), nullable=False)
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
     _is_testnet = db.Column("is_testnet", db.Boolean, nullable=False)
 
     @property
@@ -194,9 +664,37 @@ class Drop(db.Model):
         self._wallet_address = address_to_friendly(address)
 
 
+class Image_Blob(db.Model):
+    __tablename__ = "image_blobs"
+
+    # Имя файла в хранилище по содержимому и количество ссылок на него
+    name = db.Column(db.Text, primary_key=True)
+    refs = db.Column(db.Integer, nullable=False, default=0)
+
+
+class Image_Reference(db.Model):
+    __tablename__ = "image_references"
+
+    # Владелец ссылки: событие ("event:<id>") или документ метаданных
+    # ("metadata:<путь>"), который указывает на изображение
+    owner = db.Column(db.Text, primary_key=True)
+    blob_name = db.Column(db.Text, db.ForeignKey("image_blobs.name"), nullable=False, index=True)
+
+
+class Metadata_Document(db.Model):
+    __tablename__ = "metadata_documents"
+
+    # Метаданные коллекции или NFT по пути их адреса относительно PROJECT_URL.
+    # version увеличивается при каждой перезаписи
+    path = db.Column(db.Text, primary_key=True)
+    document = db.Column(JSON, nullable=False)
+    version = db.Column(db.Integer, nullable=False, default=1)
+    updated_at = db.Column(db.DateTime, server_default=func.now(), nullable=False)
+
+
 class Telegram_User(db.Model):
     __tablename__ = "telegram_users"
 
     id = db.Column(db.BigInteger, primary_key=True)
     username = db.Column(db.String(32), nullable=False)
-    last_enter = db.Column(db.DateTime, default=datetime.now(timezone.utc), nullable=False)
+    last_enter = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
@@ -1,10 +1,49 @@
+import os
+import re
 import base64
+import asyncio
+import hashlib
 from io import BytesIO
-from os import makedirs
-from os.path import split
+from time import time
+from uuid import uuid4
+from os.path import join, split, basename, splitext
+from tempfile import NamedTemporaryFile
 
 from PIL import Image
 
+from .storage import storage
+from .blobs import get_blob_name
+from ..config import UPLOADS_PATH, UPLOAD_TTL
+from ..config import MAX_UPLOAD_BYTES, MAX_IMAGE_PIXELS
+
+# Сигнатуры поддерживаемых форматов изображений. По ним тело запроса
+# отбрасывается до разбора заголовка изображения в PIL
+IMAGE_SIGNATURES = (
+    (b"\x89PNG\r\n\x1a\n", "PNG"),
+    (b"\xff\xd8\xff", "JPEG"),
+    (b"GIF87a", "GIF"),
+    (b"GIF89a", "GIF"),
+)
+
+UPLOAD_ID_PATTERN = re.compile(r"[0-9a-f]{32}")
+UPLOADS_CLEANUP_KEY = "uploads:cleanup"
+
+# Тело запроса копится в памяти до UPLOAD_WRITE_BUFFER байт и записывается
+# во временный файл в отдельном потоке, чтобы запись не блокировала цикл
+# событий
+UPLOAD_WRITE_BUFFER = 1024 * 1024
+
+# Уменьшенные варианты изображений событий: название и наибольшая сторона.
+# Изображения меньше указанного размера не увеличиваются
+IMAGE_VARIANTS = (("thumb", 256), ("medium", 1024))
+
+# Форматы вариантов: расширение и параметры сохранения PIL. Варианты
+# создаются в фоне, поэтому степень сжатия важнее скорости
+VARIANT_FORMATS = {
+    "webp": {"format": "WEBP", "quality": 80, "method": 4},
+    "png": {"format": "PNG", "optimize": True},
+}
+
 
 def decode_base64_image(image: str):
     """Декодирует изображение, находящее в base64 строке."""
@@ -15,12 +54,195 @@ def decode_base64_image(image: str):
     return image
 
 
-def save_base64_image(image: bytes, image_path: str):
-    """Сохраняет в директории коллекции полученное изображение."""
+def image_format(header: bytes):
+    """Определяет формат изображения по первым байтам либо возвращает None."""
+
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return "WEBP"
+
+    for signature, file_format in IMAGE_SIGNATURES:
+        if header.startswith(signature):
+            return file_format
+
+    return None
+
+
+def check_image(file):
+    """Проверяет изображение по сигнатуре и заголовку без декодирования
+    пикселей. Ограничение MAX_IMAGE_PIXELS защищает от изображений, которые
+    занимают мало места, но огромны после распаковки. Возвращает формат
+    изображения, при ошибке выбрасывает ValueError."""
+
+    file.seek(0)
+    file_format = image_format(file.read(16))
+    file.seek(0)
+
+    if file_format is None:
+        raise ValueError("Unsupported image format")
+
+    try:
+        with Image.open(file, formats=[file_format]) as image:
+            width, height = image.size
+
+    except Exception as e:
+        raise ValueError(f"Invalid image: {e}")
+
+    if width * height > MAX_IMAGE_PIXELS:
+        raise ValueError(f"The image is too large: {width}x{height}")
+
+    return file_format
+
+
+def write_upload_part(file, digest, data: bytes):
+    file.write(data)
+    digest.update(data)
+
+
+async def save_upload(stream):
+    """Записывает тело запроса во временный файл частями, не держа его в
+    памяти, проверяет изображение и переносит его в хранилище файлов.
+    Возвращает id загрузки, либо None, если размер превысил MAX_UPLOAD_BYTES.
+
+    Устаревшие загрузки удаляет фоновая задача clean_uploads."""
+
+    size = 0
+    digest = hashlib.sha256()
+    buffer = bytearray()
+
+    with NamedTemporaryFile(suffix=".part", delete=False) as file:
+        try:
+            async for chunk in stream:
+                size += len(chunk)
+
+                if size > MAX_UPLOAD_BYTES:
+                    os.remove(file.name)
+                    return None
+
+                buffer += chunk
+
+                if len(buffer) >= UPLOAD_WRITE_BUFFER:
+                    await asyncio.to_thread(write_upload_part, file, digest, bytes(buffer))
+                    buffer.clear()
+
+            await asyncio.to_thread(write_upload_part, file, digest, bytes(buffer))
+            file_format = await asyncio.to_thread(check_image, file)
+
+        except Exception:
+            os.remove(file.name)
+            raise
+
+    # Хэш содержимого входит в имя загрузки, поэтому при переносе в хранилище
+    # по содержимому файл не читается повторно
+    upload_id = uuid4().hex
+    upload_key = join(UPLOADS_PATH, f"{upload_id}.{digest.hexdigest()}.{file_format.lower()}")
+
+    try:
+        await asyncio.to_thread(storage.put_file, upload_key, file.name)
+
+    except Exception:
+        if os.path.exists(file.name):
+            os.remove(file.name)
+
+        raise
+
+    return upload_id
+
+
+def find_upload(upload_id: str):
+    """Возвращает ключ загруженного изображения и имя его файла в хранилище
+    по содержимому. Выбрасывает ValueError, если загрузка не найдена или
+    устарела."""
+
+    if not UPLOAD_ID_PATTERN.fullmatch(upload_id):
+        raise ValueError("Invalid upload id")
+
+    for upload_key, _ in storage.list(join(UPLOADS_PATH, f"{upload_id}.")):
+        _, digest, extension = basename(upload_key).split(".")
+
+        return upload_key, get_blob_name(digest, extension)
+
+    raise ValueError(f"Upload {upload_id} was not found")
+
+
+def remove_upload(upload_key: str):
+    """Удаляет загрузку, скопированную в хранилище по содержимому."""
+
+    storage.delete(upload_key)
+
+
+def remove_stale_uploads():
+    """Удаляет загрузки, которые не были использованы за UPLOAD_TTL секунд.
+    Возвращает количество оставшихся загрузок."""
+
+    deadline = time() - UPLOAD_TTL
+    kept = 0
+
+    for upload_key, mtime in storage.list(join(UPLOADS_PATH, "")):
+        if mtime < deadline:
+            storage.delete(upload_key)
+
+        else:
+            kept += 1
+
+    return kept
+
+
+def image_blob_name(image: bytes):
+    """Проверяет изображение и возвращает имя файла для его байтов в
+    хранилище по содержимому."""
+
+    file_format = check_image(BytesIO(image))
+
+    return get_blob_name(hashlib.sha256(image).hexdigest(), file_format)
+
+
+def get_variant_name(image_name: str, variant: str, extension: str):
+    return f"{splitext(image_name)[0]}.{variant}.{extension}"
+
+
+def create_image_variants(image_key: str):
+    """Создает уменьшенные варианты изображения рядом с ним в хранилище
+    файлов. Возвращает имена файлов в виде {вариант: {расширение: имя
+    файла}}."""
+
+    directory, image_name = split(image_key)
+
+    with Image.open(BytesIO(storage.get(image_key))) as image:
+        image = image.convert("RGBA" if image.has_transparency_data else "RGB")
+
+    variants = {}
+
+    for variant, max_side in IMAGE_VARIANTS:
+        resized = image.copy()
+        resized.thumbnail((max_side, max_side), Image.LANCZOS)
+
+        variants[variant] = {}
+
+        for extension, params in VARIANT_FORMATS.items():
+            variant_name = get_variant_name(image_name, variant, extension)
+
+            output = BytesIO()
+            resized.save(output, **params)
+
+            storage.put(join(directory, variant_name), output.getvalue())
+            variants[variant][extension] = variant_name
+
+    return variants
+
+
+def find_image_variants(image_key: str):
+    """Возвращает имена уже созданных вариантов изображения в том же виде,
+    что и create_image_variants, или None, если каких-то вариантов нет."""
+
+    directory, image_name = split(image_key)
+
+    variants = {
+        variant: {extension: get_variant_name(image_name, variant, extension) for extension in VARIANT_FORMATS}
+        for variant, _ in IMAGE_VARIANTS
+    }
 
-    # Создание директории коллекции для изображений
-    makedirs(split(image_path)[0], exist_ok=True)
+    for files in variants.values():
+        if any(storage.stat(join(directory, variant_name)) is None for variant_name in files.values()):
+            return None
 
-    # Сохранение пользовательского изображения
-    image = Image.open(BytesIO(image))
-    image.save(image_path)
+    return variants
@@ -0,0 +1,45 @@
+from datetime import datetime, timezone
+
+from .. import redis_client
+
+LAST_ENTER_KEY = "last_enter"
+LAST_ENTER_FLUSH_KEY = "last_enter:flush"
+
+# Атомарное извлечение всех накопленных отметок
+_pop_last_enters = redis_client.register_script(
+    """
+    local last_enters = redis.call("HGETALL", KEYS[1])
+    redis.call("DEL", KEYS[1])
+
+    return last_enters
+    """
+)
+
+
+def touch_user(telegram_id: str | int):
+    """Запоминает время последнего входа пользователя в Redis.
+
+    Возвращает True, если запись в БД ещё не запланирована и её нужно
+    поставить в очередь."""
+
+    pipe = redis_client.pipeline(transaction=False)
+
+    pipe.hset(LAST_ENTER_KEY, str(telegram_id), datetime.now(timezone.utc).timestamp())
+
+    # Флаг снимается по таймауту, если задача была потеряна брокером
+    pipe.set(LAST_ENTER_FLUSH_KEY, 1, nx=True, ex=3600)
+
+    _, flush_needed = pipe.execute()
+
+    return bool(flush_needed)
+
+
+def pop_last_enters():
+    """Извлекает накопленные отметки в виде {telegram_id: datetime}."""
+
+    items = _pop_last_enters(keys=[LAST_ENTER_KEY])
+
+    return {
+        int(telegram_id): datetime.fromtimestamp(float(timestamp), timezone.utc)
+        for telegram_id, timestamp in zip(items[::2], items[1::2])
+    }
@@ -0,0 +1,457 @@
+import os
+import re
+import json
+import mmap
+import random
+import struct
+import hashlib
+import logging
+import threading
+from os import scandir
+from time import monotonic
+from os.path import join, exists
+
+import numpy as np
+from PIL import Image
+
+# Движок слоев NFT. Дерево слоев (тип/слой/изображение) индексируется один раз,
+# изображения хранятся в памяти уже декодированными в premultiplied RGBA и
+# подготовленными к наложению:
+#
+# - слой обрезается до рамки непрозрачных пикселей;
+# - полностью непрозрачные пиксели копируются целиком как uint32 по маске;
+# - полупрозрачные пиксели (обычно только края) смешиваются отдельно.
+#
+# Так наложение стопки слоев сводится к нескольким векторным операциям NumPy
+# только по тем пикселям, которые слой действительно меняет.
+#
+# Подготовленные слои можно заранее упаковать в атлас (write_atlas) - один
+# несжатый файл с JSON-индексом в начале и выровненными массивами слоев.
+# Процессы отображают атлас в память только для чтения, поэтому данные слоев
+# разделяются между процессами через страничный кэш, а запуск не требует
+# декодирования PNG.
+logger = logging.getLogger("lidum")
+
+ATLAS_MAGIC = b"LIDUMATL"
+ATLAS_ALIGNMENT = 64
+
+# Массивы подготовленного слоя, которые хранятся в атласе
+LAYER_ARRAYS = ("pixels", "opaque", "rows", "cols", "blend", "blend_inv")
+
+
+def natural_key(name: str):
+    """Ключ сортировки, при котором "layer 10" идет после "layer 9"."""
+
+    return [int(part) if part.isdigit() else part for part in re.split(r"(\d+)", name)]
+
+
+def sorted_entries(path: str, is_dir: bool):
+    with scandir(path) as entries:
+        entries = [entry for entry in entries if entry.is_dir() == is_dir and not entry.name.startswith(".")]
+
+    return sorted(entries, key=lambda entry: natural_key(entry.name))
+
+
+class Layer:
+    """Изображение слоя, подготовленное к наложению."""
+
+    __slots__ = ("name", "bounds", "box") + LAYER_ARRAYS
+
+    def __init__(self, name: str, bounds: tuple[int, int, int, int] | None = None, **arrays: np.ndarray):
+        self.name = name
+        self.bounds = bounds
+        self.box = None if bounds is None else (slice(bounds[0], bounds[1]), slice(bounds[2], bounds[3]))
+
+        for array_name in LAYER_ARRAYS:
+            setattr(self, array_name, arrays.get(array_name))
+
+    @classmethod
+    def prepare(cls, name: str, rgba: np.ndarray):
+        """Подготавливает слой из декодированного RGBA-изображения."""
+
+        alpha = rgba[..., 3]
+        ys, xs = np.nonzero(alpha)
+
+        if not len(ys):
+            return cls(name)
+
+        bounds = (int(ys.min()), int(ys.max()) + 1, int(xs.min()), int(xs.max()) + 1)
+        box = (slice(bounds[0], bounds[1]), slice(bounds[2], bounds[3]))
+
+        crop = rgba[box].astype(np.uint16)
+        premultiplied = ((crop * crop[..., 3:4] + 127) // 255).astype(np.uint8)
+        premultiplied[..., 3] = crop[..., 3]
+
+        crop_alpha = alpha[box]
+        opaque = crop_alpha == 255
+        rows, cols = np.nonzero((crop_alpha > 0) & ~opaque)
+        blend = premultiplied[rows, cols].astype(np.uint16)
+
+        return cls(
+            name,
+            bounds,
+            # Пиксель RGBA как одно число uint32 для копирования по маске
+            pixels=np.ascontiguousarray(premultiplied).view(np.uint32)[..., 0],
+            opaque=opaque,
+            rows=rows,
+            cols=cols,
+            blend=blend,
+            blend_inv=255 - blend[:, 3:4],
+        )
+
+    def composite(self, canvas: np.ndarray):
+        """Накладывает слой на холст (premultiplied RGBA) на месте."""
+
+        if self.box is None:
+            return
+
+        region = canvas[self.box]
+
+        np.copyto(region.view(np.uint32)[..., 0], self.pixels, where=self.opaque)
+
+        if len(self.rows):
+            under = region[self.rows, self.cols].astype(np.uint16)
+            region[self.rows, self.cols] = self.blend + (under * self.blend_inv + 127) // 255
+
+
+class NftType:
+    """Тип NFT: размер холста и варианты изображений каждого слоя снизу вверх."""
+
+    __slots__ = ("name", "size", "layers", "layer_names")
+
+    def __init__(self, name: str, size: tuple[int, int], layers: list[list[Layer]], layer_names: list[str]):
+        self.name = name
+        self.size = size
+        self.layers = layers
+        self.layer_names = layer_names
+
+
+def load_rgba(path: str):
+    with Image.open(path) as image:
+        return image.size, np.asarray(image.convert("RGBA"))
+
+
+def unpremultiply(canvas: np.ndarray):
+    """Переводит холст из premultiplied в обычный RGBA на месте. Меняются
+    только полупрозрачные пиксели."""
+
+    alpha = canvas[..., 3]
+    rows, cols = np.nonzero((alpha > 0) & (alpha < 255))
+
+    if len(rows):
+        pixels = canvas[rows, cols].astype(np.uint16)
+        pixel_alpha = pixels[:, 3:4]
+        pixels[:, :3] = np.minimum((pixels[:, :3] * 255 + pixel_alpha // 2) // pixel_alpha, 255)
+        canvas[rows, cols] = pixels
+
+    return canvas
+
+
+class LayerTree:
+    """Загруженное дерево слоев.
+
+    Каждая комбинация слоев имеет номер (seed) от 0 до size - 1: типы идут
+    по порядку, внутри типа номер составляется из номеров изображений слоев
+    как число в смешанной системе счисления. Номера зависят от состава
+    дерева, поэтому вместе с ними используется version - отпечаток дерева."""
+
+    __slots__ = ("version", "types", "offsets", "size")
+
+    def __init__(self, version: str, types: dict[str, NftType]):
+        self.version = version
+        self.types = types
+        self.offsets = {}
+        self.size = 0
+
+        for name, nft_type in types.items():
+            self.offsets[name] = self.size
+            self.size += combinations_cnt(nft_type)
+
+    def random_traits(self, rng: random.Random = random):
+        """Возвращает случайный тип и номера изображений каждого слоя."""
+
+        nft_type = rng.choice(list(self.types.values()))
+
+        return nft_type.name, tuple(rng.randrange(len(layer)) for layer in nft_type.layers)
+
+    def seed(self, type_name: str, choices: tuple[int, ...]):
+        """Номер комбинации по типу и номерам изображений слоев."""
+
+        nft_type = self.check_traits(type_name, choices)
+        index = 0
+
+        for layer, choice in zip(nft_type.layers, choices):
+            index = index * len(layer) + choice
+
+        return self.offsets[type_name] + index
+
+    def traits(self, seed: int):
+        """Тип и номера изображений слоев по номеру комбинации."""
+
+        if not 0 <= seed < self.size:
+            raise ValueError(f"Seed {seed} is out of range, layers have {self.size} combinations")
+
+        for name, nft_type in reversed(self.types.items()):
+            if seed >= self.offsets[name]:
+                break
+
+        index = seed - self.offsets[name]
+        choices = []
+
+        for layer in reversed(nft_type.layers):
+            index, choice = divmod(index, len(layer))
+            choices.append(choice)
+
+        return name, tuple(reversed(choices))
+
+    def trait_names(self, seed: int):
+        """Тип и имена файлов изображений каждого слоя комбинации seed."""
+
+        type_name, choices = self.traits(seed)
+        nft_type = self.types[type_name]
+
+        traits = {
+            layer_name: layer[choice].name
+            for layer_name, layer, choice in zip(nft_type.layer_names, nft_type.layers, choices)
+        }
+
+        return type_name, traits
+
+    def check_traits(self, type_name: str, choices: tuple[int, ...]):
+        nft_type = self.types.get(type_name)
+
+        if nft_type is None:
+            raise ValueError(f"Unknown NFT type {type_name}")
+
+        if len(choices) != len(nft_type.layers):
+            raise ValueError(f"Expected {len(nft_type.layers)} layers for the type {type_name}")
+
+        if any(not 0 <= choice < len(layer) for layer, choice in zip(nft_type.layers, choices)):
+            raise ValueError(f"Layer choices {choices} are out of range for the type {type_name}")
+
+        return nft_type
+
+    def render(self, type_name: str, choices: tuple[int, ...]):
+        """Накладывает выбранные изображения слоев и возвращает RGBA-изображение."""
+
+        nft_type = self.check_traits(type_name, choices)
+
+        width, height = nft_type.size
+        canvas = np.zeros((height, width, 4), dtype=np.uint8)
+
+        for layer, choice in zip(nft_type.layers, choices):
+            layer[choice].composite(canvas)
+
+        return Image.fromarray(unpremultiply(canvas), "RGBA")
+
+
+def combinations_cnt(nft_type: NftType):
+    cnt = 1
+
+    for layer in nft_type.layers:
+        cnt *= len(layer)
+
+    return cnt
+
+
+class LayerEngine:
+    """Индекс слоев из layers_path с наложением в NumPy.
+
+    Не чаще раза в reload_interval секунд проверяет, изменилось ли дерево
+    слоев (состав файлов, время изменения и размер), и при изменении
+    перечитывает его. Версия дерева считается по содержимому файлов."""
+
+    def __init__(self, layers_path: str, reload_interval: float = 5, atlas_path: str | None = None):
+        self.layers_path = layers_path
+        self.reload_interval = reload_interval
+        self.atlas_path = atlas_path
+
+        self._tree: LayerTree | None = None
+        self._signature = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def signature(self):
+        """Отпечаток дерева слоев: пути, время изменения и размеры файлов."""
+
+        files = []
+
+        for type_dir in sorted_entries(self.layers_path, is_dir=True):
+            for layer_dir in sorted_entries(type_dir.path, is_dir=True):
+                for image in sorted_entries(layer_dir.path, is_dir=False):
+                    stat = image.stat()
+                    files.append((type_dir.name, layer_dir.name, image.name, stat.st_mtime_ns, stat.st_size))
+
+        return tuple(files)
+
+    def content_version(self, signature):
+        """Версия дерева: хэш путей и содержимого файлов слоев. В отличие от
+        отпечатка, не зависит от времени изменения файлов, поэтому одинакова
+        на всех узлах и после повторного развертывания тех же слоев."""
+
+        version = hashlib.blake2b(digest_size=4)
+
+        for type_name, layer_name, image_name, *_ in signature:
+            with open(join(self.layers_path, type_name, layer_name, image_name), "rb") as file:
+                content_hash = hashlib.sha256(file.read()).hexdigest()
+
+            version.update(repr((type_name, layer_name, image_name, content_hash)).encode())
+
+        return version.hexdigest()
+
+    def load(self, signature):
+        """Загружает слои из атласа, если он собран по текущему дереву, иначе
+        декодирует их из PNG."""
+
+        version = self.content_version(signature)
+
+        if self.atlas_path and exists(self.atlas_path):
+            tree = read_atlas(self.atlas_path)
+
+            if tree.version == version:
+                return tree
+
+            logger.warning(f"Layer atlas {self.atlas_path} is stale, decoding layers from {self.layers_path}")
+
+        return self.decode(signature, version)
+
+    def decode(self, signature, version: str):
+        """Декодирует и подготавливает все слои по отпечатку дерева."""
+
+        types = {}
+
+        for type_name, layer_name, image_name, *_ in signature:
+            size, rgba = load_rgba(join(self.layers_path, type_name, layer_name, image_name))
+
+            if type_name not in types:
+                types[type_name] = (size, {})
+
+            types[type_name][1].setdefault(layer_name, []).append(Layer.prepare(image_name, rgba))
+
+        return LayerTree(
+            version,
+            {
+                name: NftType(name, size, list(layers.values()), list(layers))
+                for name, (size, layers) in types.items()
+            },
+        )
+
+    @property
+    def tree(self) -> LayerTree:
+        """Дерево слоев, перечитанное при изменении файлов."""
+
+        if self._tree is not None and monotonic() - self._checked_at < self.reload_interval:
+            return self._tree
+
+        with self._lock:
+            if self._tree is None or monotonic() - self._checked_at >= self.reload_interval:
+                signature = self.signature()
+
+                if signature != self._signature:
+                    self._tree = self.load(signature)
+                    self._signature = signature
+
+                self._checked_at = monotonic()
+
+        return self._tree
+
+    @property
+    def types(self) -> dict[str, NftType]:
+        return self.tree.types
+
+    def random_traits(self, rng: random.Random = random):
+        return self.tree.random_traits(rng)
+
+    def render(self, type_name: str, choices: tuple[int, ...]):
+        return self.tree.render(type_name, choices)
+
+
+def align(offset: int):
+    return -(-offset // ATLAS_ALIGNMENT) * ATLAS_ALIGNMENT
+
+
+def write_atlas(atlas_path: str, tree: LayerTree):
+    """Упаковывает подготовленные слои дерева в атлас.
+
+    Формат: ATLAS_MAGIC, длина индекса (uint64, little-endian), JSON-индекс и
+    данные массивов. Смещения массивов в индексе отсчитываются от начала
+    данных, которое выровнено, как и каждый массив, по ATLAS_ALIGNMENT байт."""
+
+    arrays = []
+    offset = 0
+    types = []
+
+    for nft_type in tree.types.values():
+        layers = []
+
+        for layer_name, layer in zip(nft_type.layer_names, nft_type.layers):
+            images = []
+
+            for image in layer:
+                index = {}
+
+                for array_name in LAYER_ARRAYS if image.box is not None else ():
+                    array = np.ascontiguousarray(getattr(image, array_name))
+                    index[array_name] = [offset, array.dtype.str, list(array.shape)]
+                    arrays.append((offset, array))
+                    offset = align(offset + array.nbytes)
+
+                images.append({"name": image.name, "bounds": image.bounds, "arrays": index})
+
+            layers.append({"name": layer_name, "images": images})
+
+        types.append({"name": nft_type.name, "size": list(nft_type.size), "layers": layers})
+
+    header = json.dumps({"version": tree.version, "types": types}).encode()
+    data_start = align(len(ATLAS_MAGIC) + 8 + len(header))
+
+    with open(f"{atlas_path}.tmp", "wb") as file:
+        file.write(ATLAS_MAGIC + struct.pack("<Q", len(header)) + header)
+
+        for array_offset, array in arrays:
+            file.seek(data_start + array_offset)
+            file.write(array.tobytes())
+
+        file.truncate(data_start + offset)
+
+    os.replace(f"{atlas_path}.tmp", atlas_path)
+
+
+def read_atlas(atlas_path: str):
+    """Отображает атлас в память только для чтения и возвращает дерево слоев,
+    массивы которого указывают прямо в отображение."""
+
+    with open(atlas_path, "rb") as file:
+        atlas = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    if atlas[: len(ATLAS_MAGIC)] != ATLAS_MAGIC:
+        raise ValueError(f"{atlas_path} is not a layer atlas")
+
+    (header_size,) = struct.unpack_from("<Q", atlas, len(ATLAS_MAGIC))
+    header_start = len(ATLAS_MAGIC) + 8
+    header = json.loads(atlas[header_start : header_start + header_size])
+    data_start = align(header_start + header_size)
+
+    def view(offset: int, dtype: str, shape: list[int]):
+        return np.frombuffer(atlas, dtype=dtype, count=int(np.prod(shape)), offset=data_start + offset).reshape(shape)
+
+    types = {}
+
+    for nft_type in header["types"]:
+        layers = [
+            [
+                Layer(
+                    image["name"],
+                    tuple(image["bounds"]) if image["bounds"] else None,
+                    **{array_name: view(*array) for array_name, array in image["arrays"].items()},
+                )
+                for image in layer["images"]
+            ]
+            for layer in nft_type["layers"]
+        ]
+
+        types[nft_type["name"]] = NftType(
+            nft_type["name"], tuple(nft_type["size"]), layers, [layer["name"] for layer in nft_type["layers"]]
+        )
+
+    return LayerTree(header["version"], types)
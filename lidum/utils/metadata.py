@@ -1,89 +1,93 @@
-import json
-from os import makedirs
-from os.path import join, isfile
+import asyncio
+from os.path import join, dirname, relpath
 
-from .path import get_nft_image_path, get_collection_path
 from .path import get_nft_metadata_path
 from .path import get_collection_metadata_path
-from ..config import IMAGES_PATH, METADATA_PATH
+from .storage import storage
+from .async_db import add_metadata, save_metadata
+from ..config import PROJECT_ROOT
 
+# Метаданные коллекций и NFT хранятся в БД (metadata_documents) и отдаются
+# обработчиком по тем же адресам, по которым раньше лежали JSON-файлы: эти
+# адреса уже записаны в контракты коллекций. Документ хранится под путем
+# адреса относительно PROJECT_URL. Файлы, записанные до переноса метаданных
+# в БД, отдаются, пока для их пути нет документа.
 
-def create_metadata(
-    telegram_id: str | int,
-    collection_name: str,
-    collection_description: str,
-    image_name: str,
-):
-    """Создает метадату для нового изображения и коллекции."""
 
-    telegram_id = str(telegram_id)
+def metadata_key(metadata_path: str):
+    """Возвращает путь документа метаданных по абсолютному пути из
+    get_nft_metadata_path или get_collection_metadata_path."""
 
-    collection_dir = get_collection_path(collection_name, telegram_id, False)
-    collection_meta_path = get_collection_metadata_path(collection_name, telegram_id)
+    return relpath(metadata_path, PROJECT_ROOT)
 
-    # Создание директории коллекции для метадаты
-    makedirs(join(collection_dir, METADATA_PATH), exist_ok=True)
 
-    # Создать метадату для коллекции, если коллекция новая
-    if not isfile(collection_meta_path):
-        create_collection_metadata(
-            telegram_id=telegram_id,
-            collection_name=collection_name,
-            logo_name=image_name,
-        )
+def collection_metadata_prefix(collection_name: str, telegram_id: str | int):
+    """Возвращает общее начало путей документов метаданных коллекции."""
 
-    # Создать метадату для загруженного изображения
-    create_nft_metadata(
-        telegram_id=telegram_id,
-        collection_name=collection_name,
-        image_name=image_name,
-        nft_name=f"NFT from {collection_name}",
-        description=collection_description,
-    )
+    return join(dirname(metadata_key(get_collection_metadata_path(collection_name, telegram_id))), "")
 
-    return None
 
+def read_metadata_file(key: str):
+    """Возвращает JSON метаданных, записанных в файл до переноса в БД, или
+    None."""
 
-def create_collection_metadata(telegram_id: str | int, collection_name: str, logo_name: str):
-    """Создает .json файл с данными для коллекции."""
+    try:
+        return storage.get(key)
 
-    telegram_id = str(telegram_id)
+    except FileNotFoundError:
+        return None
 
-    collection_url = get_collection_path(collection_name, telegram_id, True)
-    collection_meta_path = get_collection_metadata_path(collection_name, telegram_id)
 
-    metadata = {
-        "image": join(collection_url, IMAGES_PATH, logo_name),
+def collection_metadata(collection_name: str, logo_url: str):
+    """Возвращает метаданные коллекции."""
+
+    return {
+        "image": logo_url,
         "name": collection_name,
         "description": "Created by @lidum_bot",
         "social_links": [],
         "marketplace": "getgems.io",
     }
 
-    # Сохранить метадату в директории коллекции
-    with open(collection_meta_path, "w") as file:
-        json.dump(metadata, file)
+
+def nft_metadata(nft_name: str, description: str, image_url: str, attributes: list[dict] | None = None):
+    """Возвращает метаданные NFT. attributes - характеристики NFT в виде
+    {"trait_type": ..., "value": ...}."""
+
+    return {
+        "name": nft_name,
+        "description": description + "\n\nCreated by @lidum_bot",
+        "image": image_url,
+        "attributes": attributes or [],
+    }
 
 
-def create_nft_metadata(
+async def create_metadata(
     telegram_id: str | int,
     collection_name: str,
+    collection_description: str,
     image_name: str,
-    nft_name: str,
-    description: str,
+    image_url: str,
+    session,
 ):
-    """Создает .json файл с данными для указанного изображения."""
+    """Записывает в текущую транзакцию метаданные нового изображения и, если
+    коллекция новая, коллекции. image_url - адрес изображения. Возвращает
+    пути записанных документов."""
+
+    collection_meta_path = get_collection_metadata_path(collection_name, telegram_id)
+    collection_key = metadata_key(collection_meta_path)
+    nft_key = metadata_key(get_nft_metadata_path(collection_name, telegram_id, image_name))
 
-    nft_image_path = get_nft_image_path(collection_name, telegram_id, image_name, True)
-    nft_meta_path = get_nft_metadata_path(collection_name, telegram_id, image_name)
+    written = []
 
-    metadata = {
-        "name": nft_name,
-        "description": description + "\n\nCreated by @lidum_bot",
-        "image": nft_image_path,
-        "attributes": [],
-    }
+    # Метаданные коллекции не перезаписываются: логотип - изображение первого
+    # события. У коллекций, созданных до переноса в БД, остается файл
+    if await asyncio.to_thread(storage.stat, collection_key) is None:
+        if await add_metadata(collection_key, collection_metadata(collection_name, image_url), session):
+            written.append(collection_key)
+
+    document = nft_metadata(f"NFT from {collection_name}", collection_description, image_url)
+    await save_metadata(nft_key, document, session)
+    written.append(nft_key)
 
-    # Сохранить метадату в директории коллекции
-    with open(nft_meta_path, "w") as file:
-        json.dump(metadata, file)
+    return written
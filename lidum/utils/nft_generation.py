@@ -1,29 +1,141 @@
-import random
-from os import listdir
-from os.path import join
+import math
+import hashlib
+from io import BytesIO
+from os.path import splitext
 
 from PIL import Image
 
-from ..config import NFT_LAYERS_PATH
+from .layers import LayerTree, LayerEngine
+from .path import get_blob_url, get_nft_metadata_path
+from .blobs import get_blob_name, put_blob_bytes
+from .metadata import metadata_key, nft_metadata
+from .render_cache import EncodedCache
+from ..config import NFT_LAYERS_PATH, LAYERS_RELOAD_INTERVAL
+from ..config import NFT_LAYERS_ATLAS_PATH
+from ..config import NFT_CACHE_PATH, NFT_CACHE_DISK_BYTES
+from ..config import NFT_CACHE_MEMORY_BYTES, NFT_PNG_COMPRESS_LEVEL
+from ..config import NFT_WEBP_QUALITY
+
+layer_engine = LayerEngine(NFT_LAYERS_PATH, reload_interval=LAYERS_RELOAD_INTERVAL, atlas_path=NFT_LAYERS_ATLAS_PATH)
+nft_cache = EncodedCache(NFT_CACHE_PATH, NFT_CACHE_MEMORY_BYTES, NFT_CACHE_DISK_BYTES)
+
+# Поддерживаемые форматы: формат -> (MIME-тип, параметры сохранения PIL)
+NFT_FORMATS = {
+    "png": ("image/png", {"format": "PNG", "compress_level": NFT_PNG_COMPRESS_LEVEL}),
+    "webp": ("image/webp", {"format": "WEBP", "quality": NFT_WEBP_QUALITY, "method": 0}),
+}
 
 
 def get_random_nft():
     """Смешивает случайные слои и возвращает NFT."""
 
-    nft_type_dir = join(NFT_LAYERS_PATH, random.choice(listdir(NFT_LAYERS_PATH)))
-    layers_dir = sorted([join(nft_type_dir, layer_dir) for layer_dir in listdir(nft_type_dir)])
+    return layer_engine.render(*layer_engine.random_traits())
+
+
+def render_nft(
+    seed: int | None = None,
+    traits: tuple[str, tuple[int, ...]] | None = None,
+    tree: LayerTree | None = None,
+):
+    """Смешивает слои по номеру комбинации seed или по traits - типу и
+    номерам изображений слоев - и возвращает NFT."""
+
+    tree = tree or layer_engine.tree
+
+    if traits is None:
+        traits = tree.traits(seed)
+
+    return tree.render(*traits)
+
 
-    nft = None
+def encode_nft(nft: Image.Image, nft_format: str):
+    """Кодирует NFT в один из форматов NFT_FORMATS."""
 
-    for layer_dir in layers_dir:
+    nft_io = BytesIO()
+    nft.save(nft_io, **NFT_FORMATS[nft_format][1])
 
-        images = [join(layer_dir, image) for image in listdir(layer_dir)]
-        layer = Image.open(random.choice(images)).convert("RGBA")
+    return nft_io.getvalue()
 
-        if nft is None:
-            nft = layer
 
-        else:
-            nft = Image.alpha_composite(nft, layer)
+def get_nft_bytes(tree: LayerTree, seed: int, nft_format: str):
+    """Возвращает закодированный NFT из кэша, при промахе генерирует его и
+    сохраняет в кэш. Ключ включает версию дерева слоев."""
+
+    key = f"{tree.version}-{seed}.{nft_format}"
+    nft = nft_cache.get(key)
+
+    if nft is None:
+        nft = encode_nft(render_nft(seed, tree=tree), nft_format)
+        nft_cache.put(key, nft)
 
     return nft
+
+
+def shuffled_seed(event_id: int, index: int, size: int):
+    """Номер комбинации слоев для index-го NFT генеративного события.
+
+    Перестановка (a * index + b) mod size с a, взаимно простым с size, не дает
+    повторов при разных index < size, а a и b, выведенные из id события,
+    перемешивают комбинации по-разному в разных событиях."""
+
+    digest = hashlib.blake2b(str(event_id).encode(), digest_size=16, person=b"lidum-nft-seed").digest()
+
+    a = int.from_bytes(digest[:8], "big") % size or 1
+    b = int.from_bytes(digest[8:], "big") % size
+
+    while math.gcd(a, size) != 1:
+        a += 1
+
+    return (a * index + b) % size
+
+
+def create_generated_nft(
+    telegram_id: str | int,
+    collection_name: str,
+    description: str,
+    event_id: int,
+    number: int,
+    seed: int,
+    layers_version: str | None = None,
+):
+    """Генерирует NFT комбинации seed дерева слоев версии layers_version для
+    участника генеративного события и сохраняет изображение в хранилище по
+    содержимому. Возвращает имя изображения, путь документа метаданных и сам
+    документ.
+
+    Номер комбинации дает тот же набор слоев только в своем дереве, поэтому
+    при другой версии загруженного дерева возбуждается ValueError. Без
+    layers_version (задачи, поставленные до закрепления дерева за событием)
+    используется загруженное дерево.
+
+    На изображение ссылается метадата выпущенного NFT, поэтому для него не
+    ведется учет ссылок и очистка его не удаляет."""
+
+    tree = layer_engine.tree
+
+    if layers_version is not None and tree.version != layers_version:
+        raise ValueError(f"Layers version {tree.version} does not match the event layers version {layers_version}")
+
+    type_name, traits = tree.trait_names(seed)
+
+    image_name = f"{event_id}_{seed}.png"
+
+    nft_io = BytesIO()
+    render_nft(seed, tree=tree).save(nft_io, "PNG")
+
+    nft = nft_io.getvalue()
+    blob_name = get_blob_name(hashlib.sha256(nft).hexdigest(), "png")
+
+    put_blob_bytes(nft, blob_name)
+
+    attributes = [{"trait_type": "type", "value": type_name}]
+    attributes += [{"trait_type": layer_name, "value": splitext(image)[0]} for layer_name, image in traits.items()]
+
+    document = nft_metadata(
+        nft_name=f"NFT from {collection_name} #{number}",
+        description=description,
+        image_url=get_blob_url(blob_name),
+        attributes=attributes,
+    )
+
+    return image_name, metadata_key(get_nft_metadata_path(collection_name, telegram_id, image_name)), document
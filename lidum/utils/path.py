@@ -1,7 +1,8 @@
 from os.path import join
 
 from ..config import IMAGES_PATH, PROJECT_URL, PROJECT_ROOT
-from ..config import METADATA_PATH
+from ..config import METADATA_PATH, BLOBS_PATH
+from .storage import storage
 from .convert import to_json_ext
 
 
@@ -26,6 +27,47 @@ def get_nft_image_path(collection_name: str, telegram_id: int | str, image_name:
     return join(collection_path, IMAGES_PATH, image_name)
 
 
+def get_blob_key(blob_name: str):
+    """Возвращает ключ файла хранилища изображений по содержимому в
+    хранилище файлов. Файлы разложены по директориям из первых двух символов
+    хэша."""
+
+    return join(BLOBS_PATH, blob_name[:2], blob_name)
+
+
+def get_blob_url(blob_name: str):
+    return storage.url(get_blob_key(blob_name))
+
+
+def get_event_image_url(collection_name: str, telegram_id: int | str, image_name: str, image_blob: str | None):
+    """Возвращает адрес изображения события: файла в хранилище по содержимому
+    или, для событий, созданных до его появления, файла в директории
+    коллекции."""
+
+    if image_blob is None:
+        return get_nft_image_path(collection_name, telegram_id, image_name, True)
+
+    return get_blob_url(image_blob)
+
+
+def get_image_variant_urls(
+    collection_name: str,
+    telegram_id: int | str,
+    image_blob: str | None,
+    image_variants: dict | None,
+):
+    """Возвращает адреса вариантов изображения события в виде {вариант:
+    {расширение: адрес}}. Варианты лежат рядом с изображением."""
+
+    return {
+        variant: {
+            extension: get_event_image_url(collection_name, telegram_id, variant_name, image_blob and variant_name)
+            for extension, variant_name in files.items()
+        }
+        for variant, files in (image_variants or {}).items()
+    }
+
+
 def get_nft_metadata_path(collection_name: str, telegram_id: int | str, image_name: str, return_url: bool = False):
     """Возвращает абсолютный путь до файла метаданных указанного изображения в
     директории коллекции пользователя."""
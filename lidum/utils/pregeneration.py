@@ -0,0 +1,241 @@
+import os
+import json
+import hashlib
+import threading
+from time import monotonic
+from os.path import join, exists
+from concurrent.futures import ProcessPoolExecutor
+
+from .layers import LayerTree
+from .nft_generation import encode_nft, layer_engine
+from .nft_generation import render_nft, get_nft_bytes
+from ..config import NFT_LAYERS_PATH, LAYERS_RELOAD_INTERVAL
+from ..config import NFT_PREGENERATED_PATH
+
+# Заранее сгенерированные NFT всех комбинаций слоев.
+#
+# Файлы изображений лежат в images/ и называются по SHA-256 содержимого.
+# manifest.json хранит версию дерева слоев и записи комбинаций по порядку seed:
+#
+#   {"version": ..., "entries": [{"seed", "key", "type", "traits", "files"}]}
+#
+# Ключ комбинации - хэш содержимого выбранных изображений слоев, поэтому
+# при добавлении слоев или изображений повторный запуск генерирует только
+# новые комбинации, а после прерывания продолжает с последней сохраненной
+# записи. Номер seed пересчитывается под текущую версию дерева.
+MANIFEST_NAME = "manifest.json"
+IMAGES_DIR = "images"
+
+# Сохранение манифеста каждые CHECKPOINT_EVERY новых комбинаций
+CHECKPOINT_EVERY = 200
+
+
+def image_fingerprints(layers_path: str, tree: LayerTree):
+    """SHA-256 содержимого каждого изображения слоев по (тип, слой, файл)."""
+
+    fingerprints = {}
+
+    for type_name, nft_type in tree.types.items():
+        for layer_name, layer in zip(nft_type.layer_names, nft_type.layers):
+            for image in layer:
+                with open(join(layers_path, type_name, layer_name, image.name), "rb") as file:
+                    fingerprints[type_name, layer_name, image.name] = hashlib.sha256(file.read()).hexdigest()
+
+    return fingerprints
+
+
+def combination_key(type_name: str, traits: dict[str, str], fingerprints: dict):
+    parts = [fingerprints[type_name, layer_name, image] for layer_name, image in traits.items()]
+    return hashlib.sha256("/".join(parts).encode()).hexdigest()
+
+
+def read_manifest(output_path: str):
+    try:
+        with open(join(output_path, MANIFEST_NAME), "rb") as file:
+            return json.load(file)
+
+    except FileNotFoundError:
+        return {"version": None, "entries": []}
+
+
+def write_manifest(output_path: str, version: str, formats: list[str], entries: dict[int, dict]):
+    """Атомарно записывает манифест."""
+
+    manifest_path = join(output_path, MANIFEST_NAME)
+    manifest = {"version": version, "formats": formats, "entries": [entries[seed] for seed in sorted(entries)]}
+
+    with open(f"{manifest_path}.tmp", "w") as file:
+        json.dump(manifest, file)
+
+    os.replace(f"{manifest_path}.tmp", manifest_path)
+
+
+def write_image(images_path: str, nft: bytes, nft_format: str):
+    """Сохраняет изображение под именем по SHA-256 содержимого и возвращает
+    имя файла. Одинаковые изображения хранятся один раз."""
+
+    file_name = f"{hashlib.sha256(nft).hexdigest()}.{nft_format}"
+    file_path = join(images_path, file_name)
+
+    if not exists(file_path):
+        with open(f"{file_path}.{os.getpid()}.tmp", "wb") as file:
+            file.write(nft)
+
+        os.replace(f"{file_path}.{os.getpid()}.tmp", file_path)
+
+    return file_name
+
+
+def render_combination(version: str, seed: int, images_path: str, formats: list[str]):
+    """Генерирует комбинацию seed во всех форматах. Выполняется в процессе
+    пула, который использует дерево слоев, загруженное до его создания."""
+
+    tree = layer_engine.tree
+
+    if tree.version != version:
+        raise RuntimeError(f"Layers changed during generation: {version} -> {tree.version}")
+
+    nft = render_nft(seed, tree=tree)
+    files = {nft_format: write_image(images_path, encode_nft(nft, nft_format), nft_format) for nft_format in formats}
+
+    return seed, files
+
+
+def pregenerate(output_path: str, formats: list[str], workers: int | None = None):
+    """Генерирует все комбинации слоев, которых еще нет в манифесте.
+    Возвращает количество сгенерированных комбинаций."""
+
+    images_path = join(output_path, IMAGES_DIR)
+    os.makedirs(images_path, exist_ok=True)
+
+    # Дерево загружается до создания пула, дочерние процессы получают его готовым
+    tree = layer_engine.tree
+    fingerprints = image_fingerprints(NFT_LAYERS_PATH, tree)
+
+    # Файлы уже сгенерированных комбинаций по ключу содержимого
+    previous = {entry["key"]: entry["files"] for entry in read_manifest(output_path)["entries"]}
+    entries = {}
+    pending = {}
+
+    for seed in range(tree.size):
+        type_name, traits = tree.trait_names(seed)
+        key = combination_key(type_name, traits, fingerprints)
+        entry = {"seed": seed, "key": key, "type": type_name, "traits": traits}
+
+        files = previous.get(key, {})
+
+        if all(nft_format in files and exists(join(images_path, files[nft_format])) for nft_format in formats):
+            entries[seed] = entry | {"files": files}
+
+        else:
+            pending[seed] = entry
+
+    write_manifest(output_path, tree.version, formats, entries)
+
+    if not pending:
+        return 0
+
+    with ProcessPoolExecutor(workers) as pool:
+        results = pool.map(
+            render_combination,
+            *zip(*[(tree.version, seed, images_path, formats) for seed in pending]),
+            chunksize=16,
+        )
+
+        for done, (seed, files) in enumerate(results, 1):
+            entries[seed] = pending[seed] | {"files": files}
+
+            if done % CHECKPOINT_EVERY == 0:
+                write_manifest(output_path, tree.version, formats, entries)
+                print(f"{done}/{len(pending)} combinations rendered")
+
+    write_manifest(output_path, tree.version, formats, entries)
+
+    return len(pending)
+
+
+def prune_images(output_path: str):
+    """Удаляет изображения, на которые не ссылается манифест. Возвращает
+    количество удаленных файлов."""
+
+    images_path = join(output_path, IMAGES_DIR)
+    used = {file_name for entry in read_manifest(output_path)["entries"] for file_name in entry["files"].values()}
+    removed = 0
+
+    for file_name in os.listdir(images_path):
+        if file_name not in used:
+            os.remove(join(images_path, file_name))
+            removed += 1
+
+    return removed
+
+
+class Pregenerated:
+    """Манифест заранее сгенерированных NFT для веб-процесса. Перечитывается
+    при изменении файла не чаще раза в reload_interval секунд."""
+
+    def __init__(self, output_path: str, reload_interval: float = 5):
+        self.output_path = output_path
+        self.reload_interval = reload_interval
+
+        self._files = {}
+        self._version = None
+        self._mtime = None
+        self._checked_at = None
+        self._lock = threading.Lock()
+
+    def files(self, version: str):
+        """Файлы комбинаций по номеру seed для версии дерева слоев version."""
+
+        with self._lock:
+            if self._checked_at is None or monotonic() - self._checked_at >= self.reload_interval:
+                self._checked_at = monotonic()
+                self._reload()
+
+            return self._files if version == self._version else {}
+
+    def _reload(self):
+        try:
+            mtime = os.stat(join(self.output_path, MANIFEST_NAME)).st_mtime_ns
+
+        except FileNotFoundError:
+            self._files, self._version, self._mtime = {}, None, None
+            return
+
+        if mtime != self._mtime:
+            manifest = read_manifest(self.output_path)
+
+            self._files = {entry["seed"]: entry["files"] for entry in manifest["entries"]}
+            self._version = manifest["version"]
+            self._mtime = mtime
+
+    def read(self, version: str, seed: int, nft_format: str):
+        """Возвращает заранее сгенерированный NFT или None."""
+
+        file_name = self.files(version).get(seed, {}).get(nft_format)
+
+        if file_name is None:
+            return None
+
+        try:
+            with open(join(self.output_path, IMAGES_DIR, file_name), "rb") as file:
+                return file.read()
+
+        except FileNotFoundError:
+            return None
+
+
+pregenerated = Pregenerated(NFT_PREGENERATED_PATH, reload_interval=LAYERS_RELOAD_INTERVAL)
+
+
+def load_nft_bytes(tree: LayerTree, seed: int, nft_format: str):
+    """Возвращает заранее сгенерированный NFT, а если его нет - NFT из кэша
+    или сгенерированный по запросу."""
+
+    nft = pregenerated.read(tree.version, seed, nft_format)
+
+    if nft is None:
+        nft = get_nft_bytes(tree, seed, nft_format)
+
+    return nft
+
@@ -0,0 +1,136 @@
+import os
+import threading
+from os.path import join
+from collections import OrderedDict
+
+# Кэш закодированных изображений из двух уровней:
+#
+# - память процесса: LRU, ограниченный суммарным размером в байтах;
+# - диск: каталог, общий для всех процессов, ограниченный суммарным размером.
+#   Файл записывается атомарно (временный файл и os.replace), при чтении
+#   обновляется время доступа, при переполнении удаляются давно не читавшиеся.
+#
+# Содержимое по ключу не меняется, поэтому кэш не требует инвалидации: при
+# изменении источника меняется сам ключ.
+
+
+class EncodedCache:
+    def __init__(self, path: str | None, memory_bytes: int, disk_bytes: int):
+        self.path = path
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+
+        self._memory: OrderedDict[str, bytes] = OrderedDict()
+        self._memory_size = 0
+        self._disk_size = None
+        self._lock = threading.Lock()
+
+        if path:
+            os.makedirs(path, exist_ok=True)
+
+    def get(self, key: str):
+        """Возвращает байты по ключу или None."""
+
+        with self._lock:
+            data = self._memory.get(key)
+
+            if data is not None:
+                self._memory.move_to_end(key)
+                return data
+
+        data = self._read_disk(key)
+
+        if data is not None:
+            self._remember(key, data)
+
+        return data
+
+    def put(self, key: str, data: bytes):
+        self._remember(key, data)
+        self._write_disk(key, data)
+
+    def _remember(self, key: str, data: bytes):
+        if len(data) > self.memory_bytes:
+            return
+
+        with self._lock:
+            previous = self._memory.pop(key, None)
+
+            if previous is not None:
+                self._memory_size -= len(previous)
+
+            self._memory[key] = data
+            self._memory_size += len(data)
+
+            while self._memory_size > self.memory_bytes:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_size -= len(evicted)
+
+    def _read_disk(self, key: str):
+        if not self.path:
+            return None
+
+        file_path = join(self.path, key)
+
+        try:
+            with open(file_path, "rb") as file:
+                data = file.read()
+
+            os.utime(file_path)
+
+        except FileNotFoundError:
+            return None
+
+        return data
+
+    def _write_disk(self, key: str, data: bytes):
+        if not self.path:
+            return
+
+        file_path = join(self.path, key)
+        tmp_path = f"{file_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+        with open(tmp_path, "wb") as file:
+            file.write(data)
+
+        os.replace(tmp_path, file_path)
+
+        with self._lock:
+            if self._disk_size is None:
+                self._disk_size = self._scan_disk()[1]
+
+            else:
+                self._disk_size += len(data)
+
+            if self._disk_size > self.disk_bytes:
+                self._evict_disk()
+
+    def _scan_disk(self):
+        files = []
+
+        with os.scandir(self.path) as entries:
+            for entry in entries:
+                if entry.is_file() and not entry.name.endswith(".tmp"):
+                    stat = entry.stat()
+                    files.append((stat.st_mtime, stat.st_size, entry.path))
+
+        return files, sum(size for _, size, _ in files)
+
+    def _evict_disk(self):
+        """Удаляет давно не читавшиеся файлы, пока каталог не уменьшится до
+        трех четвертей предела. Размер пересчитывается по каталогу, так как
+        в него пишут и другие процессы."""
+
+        files, self._disk_size = self._scan_disk()
+
+        for _, size, file_path in sorted(files):
+            if self._disk_size <= self.disk_bytes * 3 // 4:
+                break
+
+            try:
+                os.remove(file_path)
+
+            except FileNotFoundError:
+                pass
+
+            self._disk_size -= size
@@ -0,0 +1,367 @@
+import os
+import shutil
+import mimetypes
+import threading
+from os import makedirs
+from os.path import join, split, dirname
+from collections.abc import Iterable, Iterator
+
+from ..config import PROJECT_URL, PROJECT_ROOT
+from ..config import STORAGE_BACKEND, S3_BUCKET
+from ..config import S3_ENDPOINT_URL, S3_REGION
+from ..config import S3_PUBLIC_URL, S3_PRESIGNED_TTL
+from ..config import S3_MULTIPART_CHUNK_SIZE
+
+# Хранилище файлов, общее для всех веб-узлов и воркеров.
+#
+# Файл адресуется ключом - путем относительно корня хранилища через "/",
+# например blobs/ab/<хэш>.png. Драйверы:
+#
+# - LocalStorage: директория PROJECT_ROOT, адреса файлов от PROJECT_URL;
+# - S3Storage: бакет S3-совместимого хранилища (S3, MinIO). Большие файлы
+#   записываются составной загрузкой, а закрытые файлы отдаются по временным
+#   подписанным адресам.
+#
+# Драйвер выбирается параметром STORAGE_BACKEND.
+
+READ_CHUNK_SIZE = 1024 * 1024
+
+
+class Storage:
+    """Интерфейс хранилища. Отсутствие файла обозначается FileNotFoundError."""
+
+    def put(self, key: str, data: bytes):
+        raise NotImplementedError
+
+    def put_stream(self, key: str, chunks: Iterable[bytes]):
+        """Записывает файл по частям, не собирая его в памяти."""
+
+        raise NotImplementedError
+
+    def put_file(self, key: str, file_path: str):
+        """Переносит локальный файл в хранилище. Исходный файл удаляется."""
+
+        raise NotImplementedError
+
+    def get(self, key: str):
+        raise NotImplementedError
+
+    def stream(self, key: str, chunk_size: int = READ_CHUNK_SIZE) -> Iterator[bytes]:
+        raise NotImplementedError
+
+    def stat(self, key: str):
+        """Возвращает время последней записи файла или None, если его нет."""
+
+        raise NotImplementedError
+
+    def touch(self, key: str):
+        """Обновляет время последней записи файла. Возвращает False, если
+        файла нет."""
+
+        raise NotImplementedError
+
+    def copy(self, key: str, new_key: str):
+        """Копирует файл. Выбрасывает FileNotFoundError, если файла нет."""
+
+        raise NotImplementedError
+
+    def move(self, key: str, new_key: str):
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        """Удаляет файл. Отсутствие файла не считается ошибкой."""
+
+        raise NotImplementedError
+
+    def list(self, prefix: str):
+        """Возвращает ключи и время записи файлов, ключи которых начинаются с
+        prefix."""
+
+        raise NotImplementedError
+
+    def url(self, key: str):
+        """Постоянный публичный адрес файла."""
+
+        raise NotImplementedError
+
+    def presigned_url(self, key: str, expires: int = S3_PRESIGNED_TTL):
+        """Временный адрес для чтения закрытого файла. None, если файл
+        отдается самим приложением."""
+
+        raise NotImplementedError
+
+
+class LocalStorage(Storage):
+    def __init__(self, root: str, base_url: str):
+        self.root = root
+        self.base_url = base_url
+
+    def _path(self, key: str):
+        return join(self.root, key)
+
+    def put(self, key: str, data: bytes):
+        self.put_stream(key, [data])
+
+    def put_stream(self, key: str, chunks: Iterable[bytes]):
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+        makedirs(dirname(path), exist_ok=True)
+
+        try:
+            with open(tmp_path, "wb") as file:
+                for chunk in chunks:
+                    file.write(chunk)
+
+        except Exception:
+            os.remove(tmp_path)
+            raise
+
+        os.replace(tmp_path, path)
+
+    def put_file(self, key: str, file_path: str):
+        path = self._path(key)
+
+        makedirs(dirname(path), exist_ok=True)
+        shutil.move(file_path, path)
+
+    def get(self, key: str):
+        with open(self._path(key), "rb") as file:
+            return file.read()
+
+    def stream(self, key: str, chunk_size: int = READ_CHUNK_SIZE):
+        with open(self._path(key), "rb") as file:
+            while chunk := file.read(chunk_size):
+                yield chunk
+
+    def stat(self, key: str):
+        try:
+            return os.stat(self._path(key)).st_mtime
+
+        except FileNotFoundError:
+            return None
+
+    def touch(self, key: str):
+        try:
+            os.utime(self._path(key))
+            return True
+
+        except FileNotFoundError:
+            return False
+
+    def copy(self, key: str, new_key: str):
+        self.put_stream(new_key, self.stream(key))
+
+    def move(self, key: str, new_key: str):
+        makedirs(dirname(self._path(new_key)), exist_ok=True)
+        os.replace(self._path(key), self._path(new_key))
+
+    def delete(self, key: str):
+        try:
+            os.remove(self._path(key))
+
+        except FileNotFoundError:
+            pass
+
+    def list(self, prefix: str):
+        files = []
+        directory = split(self._path(prefix))[0]
+
+        for dir_path, _, file_names in os.walk(directory):
+            for file_name in file_names:
+                key = os.path.relpath(join(dir_path, file_name), self.root)
+
+                if key.startswith(prefix) and not file_name.endswith(".tmp"):
+                    try:
+                        files.append((key, os.stat(join(dir_path, file_name)).st_mtime))
+
+                    except FileNotFoundError:
+                        pass
+
+        return files
+
+    def url(self, key: str):
+        return join(self.base_url, key)
+
+    def presigned_url(self, key: str, expires: int = S3_PRESIGNED_TTL):
+        return None
+
+
+class S3Storage(Storage):
+    def __init__(
+        self,
+        bucket: str,
+        base_url: str,
+        endpoint_url: str | None = None,
+        region: str | None = None,
+        part_size: int = S3_MULTIPART_CHUNK_SIZE,
+    ):
+        # boto3 нужен только этому драйверу
+        import boto3
+        from botocore.exceptions import ClientError
+
+        self.bucket = bucket
+        self.base_url = base_url
+        self.part_size = part_size
+
+        # Ключи доступа берутся из стандартных переменных окружения AWS_*
+        self.client = boto3.client("s3", endpoint_url=endpoint_url, region_name=region)
+        self._client_error = ClientError
+
+    def _is_missing(self, error):
+        return error.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound")
+
+    def _content_type(self, key: str):
+        return mimetypes.guess_type(key)[0] or "application/octet-stream"
+
+    def put(self, key: str, data: bytes):
+        self.client.put_object(Bucket=self.bucket, Key=key, Body=data, ContentType=self._content_type(key))
+
+    def put_stream(self, key: str, chunks: Iterable[bytes]):
+        """Файл меньше одной части записывается одним запросом, иначе
+        составной загрузкой частями по part_size байт. Незавершенная
+        загрузка отменяется, чтобы части не занимали место в бакете."""
+
+        buffer = bytearray()
+        upload_id = None
+        parts = []
+
+        try:
+            for chunk in chunks:
+                buffer += chunk
+
+                if len(buffer) < self.part_size:
+                    continue
+
+                if upload_id is None:
+                    upload_id = self.client.create_multipart_upload(
+                        Bucket=self.bucket, Key=key, ContentType=self._content_type(key)
+                    )["UploadId"]
+
+                parts.append(self._upload_part(key, upload_id, len(parts) + 1, bytes(buffer)))
+                buffer.clear()
+
+            if upload_id is None:
+                self.put(key, bytes(buffer))
+                return
+
+            if buffer:
+                parts.append(self._upload_part(key, upload_id, len(parts) + 1, bytes(buffer)))
+
+            self.client.complete_multipart_upload(
+                Bucket=self.bucket, Key=key, UploadId=upload_id, MultipartUpload={"Parts": parts}
+            )
+
+        except Exception:
+            if upload_id is not None:
+                self.client.abort_multipart_upload(Bucket=self.bucket, Key=key, UploadId=upload_id)
+
+            raise
+
+    def _upload_part(self, key: str, upload_id: str, number: int, data: bytes):
+        response = self.client.upload_part(
+            Bucket=self.bucket, Key=key, UploadId=upload_id, PartNumber=number, Body=data
+        )
+
+        return {"ETag": response["ETag"], "PartNumber": number}
+
+    def put_file(self, key: str, file_path: str):
+        with open(file_path, "rb") as file:
+            self.put_stream(key, iter(lambda: file.read(self.part_size), b""))
+
+        os.remove(file_path)
+
+    def _get_body(self, key: str):
+        try:
+            return self.client.get_object(Bucket=self.bucket, Key=key)["Body"]
+
+        except self._client_error as e:
+            if self._is_missing(e):
+                raise FileNotFoundError(key) from e
+
+            raise
+
+    def get(self, key: str):
+        return self._get_body(key).read()
+
+    def stream(self, key: str, chunk_size: int = READ_CHUNK_SIZE):
+        yield from self._get_body(key).iter_chunks(chunk_size)
+
+    def stat(self, key: str):
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=key)["LastModified"].timestamp()
+
+        except self._client_error as e:
+            if self._is_missing(e):
+                return None
+
+            raise
+
+    def touch(self, key: str):
+        """Время записи объекта меняется только перезаписью, поэтому объект
+        копируется сам в себя с заменой метаданных."""
+
+        try:
+            self.client.copy_object(
+                Bucket=self.bucket,
+                Key=key,
+                CopySource={"Bucket": self.bucket, "Key": key},
+                MetadataDirective="REPLACE",
+                ContentType=self._content_type(key),
+            )
+            return True
+
+        except self._client_error as e:
+            if self._is_missing(e):
+                return False
+
+            raise
+
+    def copy(self, key: str, new_key: str):
+        try:
+            self.client.copy_object(Bucket=self.bucket, Key=new_key, CopySource={"Bucket": self.bucket, "Key": key})
+
+        except self._client_error as e:
+            if self._is_missing(e):
+                raise FileNotFoundError(key) from e
+
+            raise
+
+    def move(self, key: str, new_key: str):
+        self.copy(key, new_key)
+        self.delete(key)
+
+    def delete(self, key: str):
+        self.client.delete_object(Bucket=self.bucket, Key=key)
+
+    def list(self, prefix: str):
+        files = []
+
+        for page in self.client.get_paginator("list_objects_v2").paginate(Bucket=self.bucket, Prefix=prefix):
+            files += [(item["Key"], item["LastModified"].timestamp()) for item in page.get("Contents", [])]
+
+        return files
+
+    def url(self, key: str):
+        return join(self.base_url, key)
+
+    def presigned_url(self, key: str, expires: int = S3_PRESIGNED_TTL):
+        return self.client.generate_presigned_url(
+            "get_object", Params={"Bucket": self.bucket, "Key": key}, ExpiresIn=expires
+        )
+
+
+def create_storage():
+    """Создает драйвер хранилища по STORAGE_BACKEND. Без S3_PUBLIC_URL файлы
+    бакета отдаются через API по адресам от PROJECT_URL."""
+
+    if STORAGE_BACKEND == "local":
+        return LocalStorage(PROJECT_ROOT, PROJECT_URL)
+
+    if STORAGE_BACKEND == "s3":
+        return S3Storage(S3_BUCKET, S3_PUBLIC_URL or PROJECT_URL, endpoint_url=S3_ENDPOINT_URL, region=S3_REGION)
+
+    raise ValueError(f"Unknown storage backend {STORAGE_BACKEND}")
+
+
+storage = create_storage()
@@ -6,3 +6,9 @@ NEW = "new"
 SUCCESS = "success"
 CRUSHED = "crushed"
 CANCELED = "canceled"
+
+QUEUED = "queued"
+TRANSFERRED = "transferred"
+
+# Статусы транзакции, после которых она больше не обрабатывается
+FINAL_TRANSACTION_STATES = (SUCCESS, FAILED, CRUSHED, CANCELED)
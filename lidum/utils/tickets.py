@@ -0,0 +1,94 @@
+import json
+from time import monotonic
+
+from redis.asyncio import Redis as AsyncRedis
+
+from . import tasks_statuses
+from .. import redis_client
+from ..config import TICKET_TTL, REDIS_ADDRESS, TICKET_HEARTBEAT
+
+# Состояния, после которых тикет больше не меняется
+FINAL_STATES = {
+    tasks_statuses.TRANSFERRED,
+    tasks_statuses.FAILED,
+    tasks_statuses.SUCCESS,
+    tasks_statuses.CRUSHED,
+}
+
+
+def ticket_key(ticket_id: str):
+    return f"tickets:{ticket_id}"
+
+
+def set_ticket_state(ticket_id: str | None, state: str, **fields):
+    """Сохраняет состояние тикета и публикует его подписчикам."""
+
+    if ticket_id is None:
+        return
+
+    update = {"state": state, **{key: str(value) for key, value in fields.items()}}
+
+    pipe = redis_client.pipeline()
+
+    pipe.hset(ticket_key(ticket_id), mapping=update)
+    pipe.expire(ticket_key(ticket_id), TICKET_TTL)
+    pipe.publish(ticket_key(ticket_id), json.dumps(update))
+
+    pipe.execute()
+
+
+def ticket_state(ticket_id: str):
+    """Возвращает текущее состояние тикета, либо None, если тикет не найден."""
+
+    return redis_client.hgetall(ticket_key(ticket_id)) or None
+
+
+def ticket_states(ticket_ids: list[str]):
+    """Возвращает состояния тикетов одним запросом: словарь ticket_id ->
+    состояние (None, если тикет не найден)."""
+
+    pipe = redis_client.pipeline(transaction=False)
+
+    for ticket_id in ticket_ids:
+        pipe.hget(ticket_key(ticket_id), "state")
+
+    return dict(zip(ticket_ids, pipe.execute()))
+
+
+async def listen_ticket(ticket_id: str, timeout: float):
+    """Асинхронный генератор состояний тикета: сначала текущее, затем каждое
+    изменение до финального состояния или таймаута. Если за TICKET_HEARTBEAT
+    секунд изменений не было, возвращает None.
+
+    Использует собственное асинхронное соединение с Redis, чтобы ожидание
+    сообщений не блокировало цикл событий."""
+
+    client = AsyncRedis.from_url(REDIS_ADDRESS, decode_responses=True)
+    pubsub = client.pubsub(ignore_subscribe_messages=True)
+
+    # Подписка до чтения текущего состояния, чтобы не пропустить изменение
+    await pubsub.subscribe(ticket_key(ticket_id))
+
+    try:
+        ticket = await client.hgetall(ticket_key(ticket_id))
+
+        if not ticket:
+            return
+
+        yield ticket
+
+        deadline = monotonic() + timeout
+
+        while ticket["state"] not in FINAL_STATES and monotonic() < deadline:
+            message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=TICKET_HEARTBEAT)
+
+            if message is None:
+                yield None
+                continue
+
+            ticket = {**ticket, **json.loads(message["data"])}
+            yield ticket
+
+    finally:
+        await pubsub.aclose()
+        await client.aclose()
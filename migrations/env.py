@@ -0,0 +1,48 @@
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import pool, create_engine
+
+from lidum import db
+from lidum.config import Flask_Config
+from lidum.utils import db as models  # noqa: F401 (регистрация моделей)
+
+config = context.config
+
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+target_metadata = db.metadata
+
+
+def run_migrations_offline():
+    """Генерирует SQL миграций без подключения к базе данных (alembic upgrade --sql)."""
+
+    context.configure(
+        url=Flask_Config.SQLALCHEMY_DATABASE_URI,
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+    )
+
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online():
+    """Применяет миграции к базе данных."""
+
+    engine = create_engine(Flask_Config.SQLALCHEMY_DATABASE_URI, poolclass=pool.NullPool)
+
+    with engine.connect() as connection:
+        context.configure(connection=connection, target_metadata=target_metadata)
+
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+
+else:
+    run_migrations_online()
@@ -0,0 +1,92 @@
+"""baseline
+
+Схема, которую создавал db.create_all() до появления миграций. Для уже
+развернутой базы достаточно отметить её: alembic stamp 0001.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+"""
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects.postgresql import JSON
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "telegram_users",
+        sa.Column("id", sa.BigInteger(), primary_key=True),
+        sa.Column("username", sa.String(32), nullable=False),
+        sa.Column("last_enter", sa.DateTime(), nullable=False),
+    )
+
+    op.create_table(
+        "transactions",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("hash", sa.String(64)),
+        sa.Column("source_address", sa.String(66), nullable=False),
+        sa.Column("destination_address", sa.String(66), nullable=False),
+        sa.Column("amount", sa.Float(), nullable=False),
+        sa.Column("status", sa.Text(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("is_testnet", sa.Boolean(), nullable=False),
+    )
+
+    op.create_table(
+        "authors",
+        sa.Column("telegram_id", sa.BigInteger(), sa.ForeignKey("telegram_users.id"), primary_key=True),
+        sa.Column("collection_name", sa.String(64), nullable=False),
+        sa.Column("collection_address", sa.String(66), nullable=False),
+        sa.Column("collection_status", sa.Text(), nullable=False),
+        sa.Column("is_testnet", sa.Boolean(), nullable=False),
+    )
+
+    op.create_table(
+        "events",
+        sa.Column("id", sa.BigInteger(), primary_key=True, autoincrement=True),
+        sa.Column("telegram_id", sa.BigInteger(), sa.ForeignKey("authors.telegram_id"), nullable=False),
+        sa.Column("event_name", sa.String(64), nullable=False),
+        sa.Column("event_description", sa.Text(), nullable=False),
+        sa.Column("transaction_id", sa.BigInteger(), sa.ForeignKey("transactions.id"), nullable=False),
+        sa.Column("minted_nfts", sa.Integer(), nullable=False),
+        sa.Column("nfts_cnt", sa.Integer(), nullable=False),
+        sa.Column("image_name", sa.Text(), nullable=False),
+        sa.Column("start_date", sa.String(16), nullable=False),
+        sa.Column("end_date", sa.String(16), nullable=False),
+        sa.Column("password", sa.String(64), nullable=False),
+        sa.Column("invites", sa.Integer(), nullable=False),
+        sa.Column("user_timezone", sa.SmallInteger(), nullable=False),
+        sa.Column("subscriptions", JSON(), nullable=False),
+    )
+
+    op.create_table(
+        "subscribers",
+        sa.Column("telegram_id", sa.BigInteger(), sa.ForeignKey("telegram_users.id"), primary_key=True),
+        sa.Column("visited_channels", JSON()),
+        sa.Column("participated_events", JSON()),
+    )
+
+    op.create_table(
+        "drops",
+        sa.Column("id", sa.BigInteger(), primary_key=True, autoincrement=True),
+        sa.Column("telegram_id", sa.BigInteger(), sa.ForeignKey("authors.telegram_id"), nullable=False),
+        sa.Column("start_date", sa.String(16), nullable=False),
+        sa.Column("end_date", sa.String(16), nullable=False),
+        sa.Column("price", sa.Float(), nullable=False),
+        sa.Column("prizes", JSON(), nullable=False),
+    )
+
+
+def downgrade():
+    op.drop_table("drops")
+    op.drop_table("subscribers")
+    op.drop_table("events")
+    op.drop_table("authors")
+    op.drop_table("transactions")
+    op.drop_table("telegram_users")
@@ -0,0 +1,103 @@
+"""participations and channel visits
+
+Переносит участия в событиях и посещенные каналы из JSON-полей subscribers
+в отдельные таблицы. Таблицы могли быть уже созданы db.create_all(), поэтому
+создаются только при отсутствии; перенос данных не создает дубликатов.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects.postgresql import JSON
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+# Элементы списка исторически записывались и числами, и строками, поэтому
+# значения читаются как текст. Участия в удаленных событиях пропускаются.
+PARTICIPATIONS_MIGRATION = """
+    INSERT INTO participations (telegram_id, event_id)
+    SELECT subscribers.telegram_id, events.id
+    FROM subscribers
+    CROSS JOIN LATERAL json_array_elements_text(subscribers.participated_events) AS item(value)
+    JOIN events ON events.id::text = item.value
+    ON CONFLICT DO NOTHING
+"""
+
+CHANNEL_VISITS_MIGRATION = """
+    INSERT INTO channel_visits (telegram_id, channel)
+    SELECT subscribers.telegram_id, item.value
+    FROM subscribers
+    CROSS JOIN LATERAL json_array_elements_text(subscribers.visited_channels) AS item(value)
+    ON CONFLICT DO NOTHING
+"""
+
+# Обратный перенос в JSON-поля в порядке участия
+PARTICIPATIONS_ROLLBACK = """
+    UPDATE subscribers
+    SET participated_events = rows.events
+    FROM (
+        SELECT telegram_id, json_agg(event_id ORDER BY created_at) AS events
+        FROM participations
+        GROUP BY telegram_id
+    ) AS rows
+    WHERE subscribers.telegram_id = rows.telegram_id
+"""
+
+CHANNEL_VISITS_ROLLBACK = """
+    UPDATE subscribers
+    SET visited_channels = rows.channels
+    FROM (
+        SELECT telegram_id, json_agg(channel ORDER BY created_at) AS channels
+        FROM channel_visits
+        GROUP BY telegram_id
+    ) AS rows
+    WHERE subscribers.telegram_id = rows.telegram_id
+"""
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+
+    if not inspector.has_table("participations"):
+        op.create_table(
+            "participations",
+            sa.Column("telegram_id", sa.BigInteger(), sa.ForeignKey("subscribers.telegram_id"), primary_key=True),
+            sa.Column("event_id", sa.BigInteger(), sa.ForeignKey("events.id"), primary_key=True),
+            sa.Column("created_at", sa.DateTime(), server_default=sa.func.now(), nullable=False),
+        )
+        op.create_index("ix_participations_event_id", "participations", ["event_id"])
+
+    if not inspector.has_table("channel_visits"):
+        op.create_table(
+            "channel_visits",
+            sa.Column("telegram_id", sa.BigInteger(), sa.ForeignKey("subscribers.telegram_id"), primary_key=True),
+            sa.Column("channel", sa.Text(), primary_key=True),
+            sa.Column("created_at", sa.DateTime(), server_default=sa.func.now(), nullable=False),
+        )
+
+    columns = {column["name"] for column in inspector.get_columns("subscribers")}
+
+    if "participated_events" in columns:
+        op.execute(PARTICIPATIONS_MIGRATION)
+        op.drop_column("subscribers", "participated_events")
+
+    if "visited_channels" in columns:
+        op.execute(CHANNEL_VISITS_MIGRATION)
+        op.drop_column("subscribers", "visited_channels")
+
+
+def downgrade():
+    op.add_column("subscribers", sa.Column("visited_channels", JSON(), server_default="[]"))
+    op.add_column("subscribers", sa.Column("participated_events", JSON(), server_default="[]"))
+
+    op.execute(CHANNEL_VISITS_ROLLBACK)
+    op.execute(PARTICIPATIONS_ROLLBACK)
+
+    op.drop_table("channel_visits")
+    op.drop_table("participations")
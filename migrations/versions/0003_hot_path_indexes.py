@@ -0,0 +1,88 @@
+"""hot path indexes
+
+Индексы под запросы из utils/db.py и tasks.py:
+
+- events(telegram_id): event_ids_by_tg_id и события автора;
+- transactions(hash) WHERE hash IS NOT NULL: поиск транзакции по хэшу при
+  проверке оплаты, у неоплаченных транзакций хэша нет;
+- transactions(created_at) WHERE status IN ('new', 'pending'): выборка
+  незавершенных транзакций для фоновой проверки, завершенные не индексируются;
+- participations(event_id, created_at): event_participants и
+  event_participants_cnt по индексу, заменяет индекс по event_id.
+
+Индекса по telegram_users(last_enter) нет: запросов по нему нет, а индекс
+сделал бы каждое обновление last_enter не-HOT.
+
+Индексы создаются CONCURRENTLY, чтобы не блокировать запись в таблицы.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_events_telegram_id",
+            "events",
+            ["telegram_id"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            "ix_transactions_hash",
+            "transactions",
+            ["hash"],
+            postgresql_where=sa.text("hash IS NOT NULL"),
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            "ix_transactions_unfinished_created_at",
+            "transactions",
+            ["created_at"],
+            postgresql_where=sa.text("status IN ('new', 'pending')"),
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            "ix_participations_event_id_created_at",
+            "participations",
+            ["event_id", "created_at"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.drop_index(
+            "ix_participations_event_id",
+            table_name="participations",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_participations_event_id",
+            "participations",
+            ["event_id"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+        for index_name, table_name in (
+            ("ix_participations_event_id_created_at", "participations"),
+            ("ix_transactions_unfinished_created_at", "transactions"),
+            ("ix_transactions_hash", "transactions"),
+            ("ix_events_telegram_id", "events"),
+        ):
+            op.drop_index(index_name, table_name=table_name, postgresql_concurrently=True, if_exists=True)
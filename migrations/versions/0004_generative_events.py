@@ -0,0 +1,57 @@
+"""generative events
+
+Генеративные события, в которых каждый участник получает NFT из своей
+комбинации слоев:
+
+- events.generative: режим события;
+- events.generated_nfts: порядковый номер последнего резервирования NFT, по
+  нему выбирается комбинация слоев. В отличие от minted_nfts не уменьшается
+  при возврате NFT, поэтому номера не повторяются;
+- participations.nft_seed: комбинация слоев участника;
+- participations(event_id, nft_seed) WHERE nft_seed IS NOT NULL: уникальный
+  индекс, запрещающий выдачу одной комбинации дважды. Создается
+  CONCURRENTLY, чтобы не блокировать запись участий.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("events", sa.Column("generative", sa.Boolean(), server_default=sa.false(), nullable=False))
+    op.add_column("events", sa.Column("generated_nfts", sa.Integer(), server_default="0", nullable=False))
+    op.add_column("participations", sa.Column("nft_seed", sa.Integer(), nullable=True))
+
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ux_participations_event_id_nft_seed",
+            "participations",
+            ["event_id", "nft_seed"],
+            unique=True,
+            postgresql_where=sa.text("nft_seed IS NOT NULL"),
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ux_participations_event_id_nft_seed",
+            table_name="participations",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+
+    op.drop_column("participations", "nft_seed")
+    op.drop_column("events", "generated_nfts")
+    op.drop_column("events", "generative")
@@ -0,0 +1,29 @@
+"""event image variants
+
+Уменьшенные варианты изображения события, которые создаются в фоне после
+загрузки:
+
+- events.image_variants: {вариант: {расширение: имя файла}}. Пока варианты
+  не созданы, значение NULL и отдается исходное изображение.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18
+"""
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("events", sa.Column("image_variants", postgresql.JSON(), nullable=True))
+
+
+def downgrade():
+    op.drop_column("events", "image_variants")
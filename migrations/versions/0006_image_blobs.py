@@ -0,0 +1,51 @@
+"""image blobs
+
+Хранилище изображений по SHA-256 содержимого вместо директорий коллекций:
+
+- image_blobs: файлы хранилища и количество ссылок на них;
+- image_references: ссылки событий и файлов метаданных на файлы хранилища;
+- events.image_blob: файл изображения события. У существующих событий
+  остается NULL, их изображения по-прежнему лежат в директориях коллекций.
+
+Варианты изображения (0005) у новых событий лежат рядом с файлом хранилища,
+поэтому условие их записи проверяет events.image_blob.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+
+    if not inspector.has_table("image_blobs"):
+        op.create_table(
+            "image_blobs",
+            sa.Column("name", sa.Text(), primary_key=True),
+            sa.Column("refs", sa.Integer(), nullable=False),
+        )
+
+    if not inspector.has_table("image_references"):
+        op.create_table(
+            "image_references",
+            sa.Column("owner", sa.Text(), primary_key=True),
+            sa.Column("blob_name", sa.Text(), sa.ForeignKey("image_blobs.name"), nullable=False),
+        )
+        op.create_index("ix_image_references_blob_name", "image_references", ["blob_name"])
+
+    op.add_column("events", sa.Column("image_blob", sa.Text(), sa.ForeignKey("image_blobs.name"), nullable=True))
+
+
+def downgrade():
+    op.drop_column("events", "image_blob")
+    op.drop_table("image_references")
+    op.drop_table("image_blobs")
@@ -0,0 +1,41 @@
+"""metadata documents
+
+Метаданные коллекций и NFT хранятся в БД вместо JSON-файлов в директориях
+коллекций и отдаются API по прежним адресам:
+
+- metadata_documents: документ по пути адреса относительно PROJECT_URL и
+  номер его версии, который увеличивается при каждой перезаписи.
+
+Существующие файлы не переносятся: API отдает их, пока для пути нет
+документа.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18
+"""
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects.postgresql import JSON
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+
+    if not inspector.has_table("metadata_documents"):
+        op.create_table(
+            "metadata_documents",
+            sa.Column("path", sa.Text(), primary_key=True),
+            sa.Column("document", JSON(), nullable=False),
+            sa.Column("version", sa.Integer(), nullable=False),
+            sa.Column("updated_at", sa.DateTime(), server_default=sa.func.now(), nullable=False),
+        )
+
+
+def downgrade():
+    op.drop_table("metadata_documents")
@@ -0,0 +1,31 @@
+"""participation tickets
+
+Данные участия для повторной записи пачки заявок после падения flush_claims:
+
+- participations.ticket_id: заявка, по которой записано участие. Участие с
+  той же заявкой при повторе считается принятым, а не повторным;
+- participations.nft_number: номер NFT участника генеративного события,
+  нужен для повторной постановки рендера.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-19
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("participations", sa.Column("ticket_id", sa.Text(), nullable=True))
+    op.add_column("participations", sa.Column("nft_number", sa.Integer(), nullable=True))
+
+
+def downgrade():
+    op.drop_column("participations", "nft_number")
+    op.drop_column("participations", "ticket_id")
@@ -0,0 +1,35 @@
+"""event layers
+
+Дерево слоев, по которому генеративное событие выдает комбинации:
+
+- events.layers_size: число комбинаций дерева. По нему считаются номера
+  комбинаций участников, поэтому изменение дерева во время события не
+  приводит к повторам;
+- events.layers_version: версия дерева. NFT события генерируются только
+  деревом этой версии, чтобы номер комбинации давал тот же набор слоев.
+
+Существующие генеративные события закрепляют текущее дерево при первой
+записи заявки.
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-19
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0009"
+down_revision = "0008"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("events", sa.Column("layers_size", sa.Integer(), nullable=True))
+    op.add_column("events", sa.Column("layers_version", sa.Text(), nullable=True))
+
+
+def downgrade():
+    op.drop_column("events", "layers_version")
+    op.drop_column("events", "layers_size")
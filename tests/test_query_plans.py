@@ -0,0 +1,42 @@
+import pytest
+
+pytest.importorskip("sqlalchemy")
+
+from sqlalchemy import text, create_engine  # noqa: E402
+from sqlalchemy.exc import OperationalError  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+
+from lidum.config import Flask_Config  # noqa: E402
+from lidum.check_plans import PLAN_CHECKS, explain, plan_indexes  # noqa: E402
+
+# Регрессионный тест планов запросов горячего пути. Нужна локальная база из
+# конфигурации с примененными миграциями (alembic upgrade head), без нее
+# тест пропускается.
+
+
+@pytest.fixture(scope="module")
+def session():
+    engine = create_engine(Flask_Config.SQLALCHEMY_DATABASE_URI)
+
+    try:
+        connection = engine.connect()
+
+    except OperationalError as e:
+        pytest.skip(f"Local PostgreSQL is not available: {e}")
+
+    session = Session(bind=connection)
+    session.execute(text("SET LOCAL enable_seqscan = off"))
+
+    yield session
+
+    session.rollback()
+    session.close()
+    connection.close()
+    engine.dispose()
+
+
+@pytest.mark.parametrize("name, statement, expected_index", PLAN_CHECKS, ids=[check[0] for check in PLAN_CHECKS])
+def test_query_uses_index(session, name, statement, expected_index):
+    indexes = plan_indexes(explain(session, statement))
+
+    assert expected_index in indexes, f"{name}: expected {expected_index}, got {sorted(indexes) or 'no index'}"
@@ -0,0 +1,143 @@
+import os
+
+import pytest
+
+pytest.importorskip("boto3")
+moto = pytest.importorskip("moto")
+
+from lidum.utils.storage import S3Storage  # noqa: E402
+
+# Драйвер S3Storage проверяется на S3 в памяти (moto), без сети и ключей.
+# Тест пропускается, если moto не установлен (pip install "moto[s3]").
+
+BUCKET = "lidum-test"
+
+# Наименьший размер части составной загрузки в S3
+PART_SIZE = 5 * 1024 * 1024
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+
+    with moto.mock_aws():
+        storage = S3Storage(BUCKET, "https://cdn.example.com", region="us-east-1", part_size=PART_SIZE)
+        storage.client.create_bucket(Bucket=BUCKET)
+
+        yield storage
+
+
+def etag(storage: S3Storage, key: str):
+    return storage.client.head_object(Bucket=BUCKET, Key=key)["ETag"].strip('"')
+
+
+def pending_uploads(storage: S3Storage):
+    return storage.client.list_multipart_uploads(Bucket=BUCKET).get("Uploads", [])
+
+
+def chunks(data: bytes, size: int = 64 * 1024):
+    for i in range(0, len(data), size):
+        yield data[i : i + size]
+
+
+def test_put_stream_small_file(s3):
+    data = os.urandom(PART_SIZE - 1)
+
+    s3.put_stream("blobs/ab/small.png", chunks(data))
+
+    assert s3.get("blobs/ab/small.png") == data
+    assert "-" not in etag(s3, "blobs/ab/small.png")
+    assert s3.client.head_object(Bucket=BUCKET, Key="blobs/ab/small.png")["ContentType"] == "image/png"
+
+
+def test_put_stream_multipart(s3):
+    data = os.urandom(2 * PART_SIZE + 1024)
+
+    s3.put_stream("blobs/ab/large.png", chunks(data))
+
+    assert s3.get("blobs/ab/large.png") == data
+    assert b"".join(s3.stream("blobs/ab/large.png")) == data
+    assert etag(s3, "blobs/ab/large.png").endswith("-3")
+    assert pending_uploads(s3) == []
+
+
+def test_put_stream_aborts_on_error(s3):
+    def broken():
+        yield os.urandom(PART_SIZE + 1)
+        raise RuntimeError("client disconnected")
+
+    with pytest.raises(RuntimeError):
+        s3.put_stream("uploads/broken.png", broken())
+
+    assert pending_uploads(s3) == []
+    assert s3.stat("uploads/broken.png") is None
+
+
+def test_put_file_removes_source(s3, tmp_path):
+    path = tmp_path / "upload.part"
+    path.write_bytes(b"image")
+
+    s3.put_file("uploads/upload.png", str(path))
+
+    assert s3.get("uploads/upload.png") == b"image"
+    assert not path.exists()
+
+
+def test_missing_key(s3):
+    with pytest.raises(FileNotFoundError):
+        s3.get("blobs/ab/missing.png")
+
+    with pytest.raises(FileNotFoundError):
+        b"".join(s3.stream("blobs/ab/missing.png"))
+
+    with pytest.raises(FileNotFoundError):
+        s3.copy("blobs/ab/missing.png", "blobs/ab/other.png")
+
+    with pytest.raises(FileNotFoundError):
+        s3.move("blobs/ab/missing.png", "blobs/ab/other.png")
+
+    assert s3.stat("blobs/ab/missing.png") is None
+    assert s3.touch("blobs/ab/missing.png") is False
+
+    s3.delete("blobs/ab/missing.png")
+
+
+def test_touch_rewrites_object_in_place(s3):
+    s3.put("blobs/ab/image.webp", b"image")
+
+    assert s3.touch("blobs/ab/image.webp") is True
+    assert s3.get("blobs/ab/image.webp") == b"image"
+    assert s3.stat("blobs/ab/image.webp") is not None
+    assert s3.client.head_object(Bucket=BUCKET, Key="blobs/ab/image.webp")["ContentType"] == "image/webp"
+
+
+def test_copy_keeps_source(s3):
+    s3.put("uploads/1.digest.png", b"image")
+
+    s3.copy("uploads/1.digest.png", "blobs/ab/digest.png")
+
+    assert s3.get("uploads/1.digest.png") == b"image"
+    assert s3.get("blobs/ab/digest.png") == b"image"
+
+
+def test_move_and_list(s3):
+    s3.put("uploads/1.digest.png", b"first")
+    s3.put("uploads/2.digest.png", b"second")
+    s3.put("blobs/ab/digest.png", b"blob")
+
+    s3.move("uploads/1.digest.png", "blobs/ab/moved.png")
+
+    assert s3.stat("uploads/1.digest.png") is None
+    assert s3.get("blobs/ab/moved.png") == b"first"
+    assert [key for key, _ in s3.list("uploads/")] == ["uploads/2.digest.png"]
+    assert sorted(key for key, _ in s3.list("blobs/ab/")) == ["blobs/ab/digest.png", "blobs/ab/moved.png"]
+    assert all(isinstance(mtime, float) for _, mtime in s3.list("blobs/"))
+
+
+def test_urls(s3):
+    assert s3.url("blobs/ab/digest.png") == "https://cdn.example.com/blobs/ab/digest.png"
+    presigned_url = s3.presigned_url("blobs/ab/digest.png", expires=60)
+
+    assert "/blobs/ab/digest.png?" in presigned_url
+    assert "Signature=" in presigned_url